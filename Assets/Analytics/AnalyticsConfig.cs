@@ -0,0 +1,46 @@
+using System;
+
+// Base URL of the analytics database, shared by every script that writes to it.
+// Defaults to the production Firebase Realtime Database. To send a build's writes
+// elsewhere (e.g. the local ingest service), start the player with
+// -analyticsUrl http://127.0.0.1:9100/ or set MORPHRUNNER_ANALYTICS_URL; code may
+// also assign BaseURL before the first write.
+public static class AnalyticsConfig
+{
+    public const string DefaultBaseURL = "https://morphrunneranalytics3107-default-rtdb.firebaseio.com/";
+    public const string CommandLineArgument = "-analyticsUrl";
+    public const string EnvironmentVariable = "MORPHRUNNER_ANALYTICS_URL";
+
+    private static string baseURL;
+
+    public static string BaseURL
+    {
+        get
+        {
+            if (baseURL == null)
+                baseURL = Normalize(ReadCommandLine() ?? Environment.GetEnvironmentVariable(EnvironmentVariable));
+            return baseURL;
+        }
+        set { baseURL = Normalize(value); }
+    }
+
+    private static string ReadCommandLine()
+    {
+        string[] args = Environment.GetCommandLineArgs();
+        for (int i = 0; i < args.Length - 1; i++)
+        {
+            if (args[i] == CommandLineArgument)
+                return args[i + 1];
+        }
+        return null;
+    }
+
+    // Paths are appended directly, so the URL always ends in a slash
+    private static string Normalize(string url)
+    {
+        if (string.IsNullOrWhiteSpace(url))
+            return DefaultBaseURL;
+        url = url.Trim();
+        return url.EndsWith("/") ? url : url + "/";
+    }
+}
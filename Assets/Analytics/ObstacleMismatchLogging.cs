@@ -1,18 +1,42 @@
 using System.Collections;
+using System.Collections.Generic;
+using System.Globalization;
+using System.IO;
 using UnityEngine;
 using UnityEngine.Networking;
 using UnityEngine.SceneManagement;
 using System.Text;
 
+// Events are buffered and sent as one multi-location PATCH of users/{userId} per flush.
+// Counters are written as server-side increments ({".sv": {"increment": n}}), so the
+// database adds to the stored value atomically: no GET before each write, and no
+// increments lost when two writes race. The same requests work against Firebase and
+// against the local ingest service (Assets/Analytics/ingest_service.py); the target is
+// set by AnalyticsConfig.BaseURL.
+// Coroutines do not run after OnApplicationQuit and a backgrounded app may be killed,
+// so unsent writes are saved to persistentDataPath on pause/quit and after each flush,
+// and reloaded in Awake. A batch whose request was in flight when the app died is
+// sent again on the next launch, so a counter may be counted twice but is not lost.
 public class ObstacleMismatchLogging : MonoBehaviour
 {
-    private const string firebaseURL = "https://morphrunneranalytics3107-default-rtdb.firebaseio.com/";
+    [SerializeField] private float flushInterval = 2f;
+    [SerializeField] private int maxBufferedWrites = 200;
+
     private string userId;
 
     private int sessionMatchCount = 0;
     private int sessionMismatchCount = 0;
     private float sessionHealth = 0f;
 
+    // Writes of the next flush, keyed by path below users/{userId}
+    private Dictionary<string, int> pendingIncrements = new Dictionary<string, int>();
+    private Dictionary<string, string> pendingValues = new Dictionary<string, string>();
+    // The batch of the flush in progress, until the server acknowledges it
+    private Dictionary<string, int> inFlightIncrements = new Dictionary<string, int>();
+    private Dictionary<string, string> inFlightValues = new Dictionary<string, string>();
+    private bool flushInProgress = false;
+    private int pushSequence = 0;
+
 
     void Awake()
     {
@@ -26,23 +50,43 @@ public class ObstacleMismatchLogging : MonoBehaviour
             PlayerPrefs.SetString("user_id", userId);
         }
 
-        DontDestroyOnLoad(this.gameObject); 
+        DontDestroyOnLoad(this.gameObject);
+        LoadUnsentWrites();
         Debug.Log("[Analytics] Initialized with userId: " + userId);
     }
 
- 
+    void Start()
+    {
+        StartCoroutine(FlushPeriodically());
+    }
+
+    void OnApplicationPause(bool paused)
+    {
+        if (paused)
+        {
+            // Saved first: the app may be killed in the background before the flush completes
+            SaveUnsentWrites();
+            StartCoroutine(Flush());
+        }
+    }
+
+    void OnApplicationQuit()
+    {
+        // A flush started now would not complete; the writes are sent on the next launch
+        SaveUnsentWrites();
+    }
+
+
     public void LogDeathLevel()
     {
         string levelName = SceneManager.GetActiveScene().name;
-        string url = $"{firebaseURL}users/{userId}/{levelName}_death_times.json";
-        StartCoroutine(GetAndIncrement(url));
+        Increment($"{levelName}_death_times");
     }
 
     public void LogCorrectMatch()
     {
         string levelName = SceneManager.GetActiveScene().name;
-        string url = $"{firebaseURL}users/{userId}/match_stats/{levelName}/obstacle_match_count.json";
-        StartCoroutine(GetAndIncrement(url));
+        Increment($"match_stats/{levelName}/obstacle_match_count");
         sessionMatchCount++;
 
     }
@@ -50,11 +94,8 @@ public class ObstacleMismatchLogging : MonoBehaviour
     public void LogMismatch(float yPosition)
     {
         string levelName = SceneManager.GetActiveScene().name;
-        string countUrl = $"{firebaseURL}users/{userId}/match_stats/{levelName}/obstacle_mismatch_count.json";
-        string yPosListUrl = $"{firebaseURL}users/{userId}/match_stats/{levelName}/obstacle_mismatch_positions.json";
-
-        StartCoroutine(GetAndIncrement(countUrl));              
-        StartCoroutine(AppendFloatToArray(yPosListUrl, yPosition));
+        Increment($"match_stats/{levelName}/obstacle_mismatch_count");
+        Push($"match_stats/{levelName}/obstacle_mismatch_positions", FormatFloat(yPosition));
         sessionMismatchCount++;
 
         Debug.Log($"[Analytics] Mismatch triggered. y={yPosition}, sessionMismatchCount={sessionMismatchCount}");
@@ -65,50 +106,38 @@ public class ObstacleMismatchLogging : MonoBehaviour
     public void LogLevelCompletion(float healthRemaining)
     {
         string levelName = SceneManager.GetActiveScene().name;
-        string completionCountUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/completion_count.json";
-        
-        sessionHealth = healthRemaining;
-        StartCoroutine(GetAndIncrement(completionCountUrl));
-        
-        StartCoroutine(CopyMatchStatsToCompletionStats(levelName));
-
-        Debug.Log($"[Analytics] Final counts before write → match: {sessionMatchCount}, mismatch: {sessionMismatchCount}");
-
+        LogLevelCompletionByName(levelName, healthRemaining);
     }
 
     public void LogLevelCompletionByName(string levelName, float healthRemaining)
     {
-        string completionCountUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/completion_count.json";
-        
         sessionHealth = healthRemaining;
-        StartCoroutine(GetAndIncrement(completionCountUrl));
+        Increment($"completion_stats/{levelName}/completion_count");
+
+        CopyMatchStatsToCompletionStats(levelName);
+        StartCoroutine(Flush());
 
-        StartCoroutine(CopyMatchStatsToCompletionStats(levelName));
-        
         Debug.Log($"[Analytics] Level {levelName} completed with {healthRemaining} health remaining");
     }
 
     public void LogHealthProgression(float level1Health, float level2Health, float level3Health, float level4Health)
     {
         string sessionId = System.DateTime.Now.ToString("yyyyMMdd_HHmmss");
-        string progressionUrl = $"{firebaseURL}users/{userId}/health_progression/{sessionId}.json";
-        
-        
-        string healthProgressionData = $"{{\"level1\":{level1Health:F2},\"level2\":{level2Health:F2},\"level3\":{level3Health:F2},\"level4\":{level4Health:F2}}}";
-        
-        StartCoroutine(SendJsonToFirebase(progressionUrl, healthProgressionData));
-        
+
+        string healthProgressionData = $"{{\"level1\":{FormatFloat(level1Health)},\"level2\":{FormatFloat(level2Health)},\"level3\":{FormatFloat(level3Health)},\"level4\":{FormatFloat(level4Health)}}}";
+
+        SetValue($"health_progression/{sessionId}", healthProgressionData);
+
         Debug.Log($"[Analytics] Health progression logged: L1:{level1Health}, L2:{level2Health}, L3:{level3Health}, L4:{level4Health}");
     }
 
-    // Logs the latest health for each level 
+    // Logs the latest health for each level
     public void LogCurrentLevelHealth(float healthRemaining)
     {
         string levelName = SceneManager.GetActiveScene().name;
-        string latestHealthUrl = $"{firebaseURL}users/{userId}/current_level_health/{levelName}.json";
-        
-        StartCoroutine(SendFloatToFirebase(latestHealthUrl, healthRemaining));
-        
+
+        SetValue($"current_level_health/{levelName}", FormatFloat(healthRemaining));
+
         Debug.Log($"[Analytics] Current health for {levelName}: {healthRemaining}");
     }
 
@@ -126,143 +155,217 @@ public class ObstacleMismatchLogging : MonoBehaviour
         for (int i = 0; i < 4; i++)
         {
             string levelName = levelsToUse[i];
-            string healthUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/health_remaining_values.json";
-            string countUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/completion_count.json";
-            
-            StartCoroutine(GetAndIncrement(countUrl));
-            StartCoroutine(AppendFloatToArray(healthUrl, healthValues[i]));
+            Increment($"completion_stats/{levelName}/completion_count");
+            Push($"completion_stats/{levelName}/health_remaining_values", FormatFloat(healthValues[i]));
         }
-        
+
         Debug.Log($"[Analytics] Logged health for all 4 levels: {string.Join(", ", healthValues)}");
     }
 
-    private IEnumerator SendStringToFirebase(string url, string data)
+    private void CopyMatchStatsToCompletionStats(string levelName)
     {
-        string jsonData = $"\"{data}\""; 
-        UnityWebRequest request = UnityWebRequest.Put(url, jsonData);
-        request.SetRequestHeader("Content-Type", "application/json");
-        yield return request.SendWebRequest();
+        // Calculate score
+        int score = (sessionMatchCount * 10) - (sessionMismatchCount * 20);
 
-        if (request.result == UnityWebRequest.Result.Success)
-            Debug.Log($"[Analytics] Logged string: {data} to {url}");
-        else
-            Debug.LogError($"[Analytics] Failed to log string: {request.error}");
+        SetValue($"completion_stats/{levelName}/obstacle_match_count", sessionMatchCount.ToString());
+        SetValue($"completion_stats/{levelName}/obstacle_mismatch_count", sessionMismatchCount.ToString());
+        SetValue($"completion_stats/{levelName}/score", score.ToString());
+        // Appended like LogAllLevelsHealth does; analytics reads health_remaining_values as a map of values
+        Push($"completion_stats/{levelName}/health_remaining_values", FormatFloat(sessionHealth));
+
+        Debug.Log($"[Analytics] WRITING to completion_stats - match: {sessionMatchCount}, mismatch: {sessionMismatchCount}, score: {score}");
+
+        // RESET session counts, they are part of the next flush
+        sessionMatchCount = 0;
+        sessionMismatchCount = 0;
+        sessionHealth = 0f;
     }
 
-    private IEnumerator SendFloatToFirebase(string url, float value)
+    // Buffered writes
+
+    private void Increment(string path, int amount = 1)
     {
-        string jsonData = value.ToString("F2");
-        UnityWebRequest request = UnityWebRequest.Put(url, jsonData);
-        request.SetRequestHeader("Content-Type", "application/json");
-        yield return request.SendWebRequest();
+        pendingIncrements.TryGetValue(path, out int current);
+        pendingIncrements[path] = current + amount;
+        FlushIfFull();
+    }
 
-        if (request.result == UnityWebRequest.Result.Success)
-            Debug.Log($"[Analytics] Logged float: {value} to {url}");
-        else
-            Debug.LogError($"[Analytics] Failed to log float: {request.error}");
+    private void SetValue(string path, string json)
+    {
+        pendingValues[path] = json;
+        FlushIfFull();
+    }
+
+    // Adds a value under a new, time-ordered key, like a POST to path
+    private void Push(string path, string json)
+    {
+        string key = $"-{System.DateTime.UtcNow.Ticks:x15}{pushSequence++ & 0xFFFF:x4}";
+        SetValue($"{path}/{key}", json);
+    }
+
+    private void FlushIfFull()
+    {
+        if (pendingIncrements.Count + pendingValues.Count >= maxBufferedWrites)
+            StartCoroutine(Flush());
     }
-    private IEnumerator SendJsonToFirebase(string url, string jsonData)
+
+    private IEnumerator FlushPeriodically()
     {
-        UnityWebRequest request = UnityWebRequest.Put(url, jsonData);
+        while (true)
+        {
+            yield return new WaitForSecondsRealtime(flushInterval);
+            yield return Flush();
+        }
+    }
+
+    private IEnumerator Flush()
+    {
+        if (flushInProgress || (pendingIncrements.Count == 0 && pendingValues.Count == 0))
+            yield break;
+
+        flushInProgress = true;
+        Dictionary<string, int> increments = inFlightIncrements = pendingIncrements;
+        Dictionary<string, string> values = inFlightValues = pendingValues;
+        pendingIncrements = new Dictionary<string, int>();
+        pendingValues = new Dictionary<string, string>();
+
+        string url = $"{AnalyticsConfig.BaseURL}users/{userId}.json";
+        UnityWebRequest request = new UnityWebRequest(url, "PATCH");
+        request.uploadHandler = new UploadHandlerRaw(Encoding.UTF8.GetBytes(BuildUpdateJson(increments, values)));
+        request.downloadHandler = new DownloadHandlerBuffer();
         request.SetRequestHeader("Content-Type", "application/json");
         yield return request.SendWebRequest();
 
         if (request.result == UnityWebRequest.Result.Success)
-            Debug.Log($"[Analytics] Logged JSON data to {url}");
+        {
+            Debug.Log($"[Analytics] Flushed {increments.Count} counters and {values.Count} values to {url}");
+        }
         else
-            Debug.LogError($"[Analytics] Failed to log JSON: {request.error}");
+        {
+            Debug.LogError($"[Analytics] Failed to flush analytics, retrying with the next flush: {request.error}");
+            Requeue(increments, values);
+        }
+        inFlightIncrements = new Dictionary<string, int>();
+        inFlightValues = new Dictionary<string, string>();
+        flushInProgress = false;
+
+        // Keep saved writes in step with the buffers once the batch is settled
+        if (File.Exists(UnsentWritesPath))
+            SaveUnsentWrites();
     }
 
-    private IEnumerator GetAndIncrement(string url)
+    // Adds a batch back to the buffers; writes buffered since take precedence over requeued values
+    private void Requeue(Dictionary<string, int> increments, Dictionary<string, string> values)
     {
-        UnityWebRequest getRequest = UnityWebRequest.Get(url);
-        yield return getRequest.SendWebRequest();
-
-        int current = 0;
-        if (getRequest.result == UnityWebRequest.Result.Success && !string.IsNullOrEmpty(getRequest.downloadHandler.text))
+        foreach (KeyValuePair<string, int> increment in increments)
+        {
+            pendingIncrements.TryGetValue(increment.Key, out int current);
+            pendingIncrements[increment.Key] = current + increment.Value;
+        }
+        foreach (KeyValuePair<string, string> value in values)
         {
-            int.TryParse(getRequest.downloadHandler.text, out current);
+            if (!pendingValues.ContainsKey(value.Key))
+                pendingValues[value.Key] = value.Value;
         }
+    }
 
-        int updated = current + 1;
-        string jsonData = updated.ToString();
+    // Unsent writes on disk
 
-        UnityWebRequest putRequest = UnityWebRequest.Put(url, jsonData);
-        putRequest.SetRequestHeader("Content-Type", "application/json");
-        yield return putRequest.SendWebRequest();
+    private string UnsentWritesPath => Path.Combine(Application.persistentDataPath, "analytics_unsent_writes.txt");
 
-        if (putRequest.result == UnityWebRequest.Result.Success)
-            Debug.Log($"[Analytics] Updated count at {url} to {updated}");
-        else
-            Debug.LogError($"[Analytics] Failed to update count: {putRequest.error}");
+    // One tab-separated line per write: "i", path, amount for increments; "v", path, JSON for values
+    private void SaveUnsentWrites()
+    {
+        string path = UnsentWritesPath;
+        try
+        {
+            if (pendingIncrements.Count + pendingValues.Count + inFlightIncrements.Count + inFlightValues.Count == 0)
+            {
+                if (File.Exists(path))
+                    File.Delete(path);
+                return;
+            }
+
+            StringBuilder lines = new StringBuilder();
+            foreach (Dictionary<string, int> increments in new[] { inFlightIncrements, pendingIncrements })
+                foreach (KeyValuePair<string, int> increment in increments)
+                    lines.Append($"i\t{increment.Key}\t{increment.Value.ToString(CultureInfo.InvariantCulture)}\n");
+            foreach (Dictionary<string, string> values in new[] { inFlightValues, pendingValues })
+                foreach (KeyValuePair<string, string> value in values)
+                    lines.Append($"v\t{value.Key}\t{value.Value}\n");
+
+            // Written next to the file and swapped in, so a kill mid-write leaves the previous copy
+            string tmpPath = path + ".tmp";
+            File.WriteAllText(tmpPath, lines.ToString(), Encoding.UTF8);
+            if (File.Exists(path))
+                File.Replace(tmpPath, path, null);
+            else
+                File.Move(tmpPath, path);
+        }
+        catch (System.Exception e)
+        {
+            Debug.LogError($"[Analytics] Failed to save unsent analytics: {e.Message}");
+        }
     }
 
-    // Appends a float (e.g., y-position) to a Firebase array using POST.
-    private IEnumerator AppendFloatToArray(string url, float value)
+    private void LoadUnsentWrites()
     {
-        string jsonData = value.ToString("F2");
-
-        UnityWebRequest request = new UnityWebRequest(url, "POST");
-        byte[] bodyRaw = Encoding.UTF8.GetBytes(jsonData);
-        request.uploadHandler = new UploadHandlerRaw(bodyRaw);
-        request.downloadHandler = new DownloadHandlerBuffer();
-        request.SetRequestHeader("Content-Type", "application/json");
+        string path = UnsentWritesPath;
+        if (!File.Exists(path))
+            return;
 
-        yield return request.SendWebRequest();
+        Dictionary<string, int> increments = new Dictionary<string, int>();
+        Dictionary<string, string> values = new Dictionary<string, string>();
+        try
+        {
+            foreach (string line in File.ReadAllLines(path, Encoding.UTF8))
+            {
+                string[] fields = line.Split(new[] { '\t' }, 3);
+                if (fields.Length != 3)
+                    continue;
+                if (fields[0] == "i" && int.TryParse(fields[2], NumberStyles.Integer, CultureInfo.InvariantCulture, out int amount))
+                {
+                    increments.TryGetValue(fields[1], out int current);
+                    increments[fields[1]] = current + amount;
+                }
+                else if (fields[0] == "v")
+                {
+                    values[fields[1]] = fields[2];
+                }
+            }
+        }
+        catch (System.Exception e)
+        {
+            Debug.LogError($"[Analytics] Failed to load unsent analytics: {e.Message}");
+            return;
+        }
 
-        if (request.result == UnityWebRequest.Result.Success)
-            Debug.Log($"[Analytics] Appended value {value} to {url}");
-        else
-            Debug.LogError($"[Analytics] Failed to append value: {request.error}");
+        // The file stays until the next save, so the writes survive another crash before they are sent
+        Requeue(increments, values);
+        Debug.Log($"[Analytics] Restored {increments.Count} counters and {values.Count} values from the last session");
     }
 
-    private IEnumerator CopyMatchStatsToCompletionStats(string levelName)
+    private static string BuildUpdateJson(Dictionary<string, int> increments, Dictionary<string, string> values)
     {
-    string targetMatchUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/obstacle_match_count.json";
-    string targetMismatchUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/obstacle_mismatch_count.json";
-    string scoreUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/score.json";
-    string healthUrl = $"{firebaseURL}users/{userId}/completion_stats/{levelName}/health_remaining_values.json";
-
-    // Calculate score
-    int score = (sessionMatchCount * 10) - (sessionMismatchCount * 20);
-
-    // Upload match count
-    UnityWebRequest putMatch = UnityWebRequest.Put(targetMatchUrl, sessionMatchCount.ToString());
-    putMatch.SetRequestHeader("Content-Type", "application/json");
-    yield return putMatch.SendWebRequest();
-
-    // Upload mismatch count
-    UnityWebRequest putMismatch = UnityWebRequest.Put(targetMismatchUrl, sessionMismatchCount.ToString());
-    putMismatch.SetRequestHeader("Content-Type", "application/json");
-    yield return putMismatch.SendWebRequest();
-
-    // Upload score
-    UnityWebRequest putScore = UnityWebRequest.Put(scoreUrl, score.ToString());
-    putScore.SetRequestHeader("Content-Type", "application/json");
-    yield return putScore.SendWebRequest();
-
-    // Upload health
-    UnityWebRequest putHealth = UnityWebRequest.Put(healthUrl, sessionHealth.ToString("F2"));
-    putHealth.SetRequestHeader("Content-Type", "application/json");
-    yield return putHealth.SendWebRequest();
-
-    if (putHealth.result == UnityWebRequest.Result.Success)
-        Debug.Log($"[Analytics] Health {sessionHealth} logged for {levelName}");
-    else
-        Debug.LogError($"[Analytics] Failed to log health for {levelName}: {putHealth.error}");
-
-    if (putScore.result == UnityWebRequest.Result.Success)
-        Debug.Log($"[Analytics] Score {score} logged for {levelName}");
-    else
-        Debug.LogError($"[Analytics] Failed to log score for {levelName}: {putScore.error}");
-
-    Debug.Log($"[Analytics] WRITING to completion_stats - match: {sessionMatchCount}, mismatch: {sessionMismatchCount}");
-
-    // RESET session counts after upload
-    sessionMatchCount = 0;
-    sessionMismatchCount = 0;
-    sessionHealth = 0f;
+        StringBuilder json = new StringBuilder("{");
+        foreach (KeyValuePair<string, int> increment in increments)
+        {
+            if (json.Length > 1)
+                json.Append(',');
+            json.Append($"\"{increment.Key}\":{{\".sv\":{{\"increment\":{increment.Value}}}}}");
+        }
+        foreach (KeyValuePair<string, string> value in values)
+        {
+            if (json.Length > 1)
+                json.Append(',');
+            json.Append($"\"{value.Key}\":{value.Value}");
+        }
+        return json.Append('}').ToString();
+    }
 
+    private static string FormatFloat(float value)
+    {
+        return value.ToString("F2", CultureInfo.InvariantCulture);
     }
 
-}
\ No newline at end of file
+}
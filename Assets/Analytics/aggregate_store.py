@@ -0,0 +1,352 @@
+"""
+Running aggregates over the analytics tables.
+
+Every user's contribution is added to or retracted from per-level and
+per-player totals, so replacing one user's data costs the size of that user's
+data rather than a recomputation over every player. Value distributions
+(mismatch y-positions, health at completion) are kept per level as exact value
+counts, plus a fixed-bin histogram of y-positions for the dashboard, so the
+store's size does not grow with the number of logged events. The dashboard and
+the console summary both read from an AggregateStore.
+"""
+from collections import namedtuple
+
+from leaderboard import Leaderboard
+from sketches import MISMATCH_Y_BINS, FixedBinHistogram, ValueCounts
+
+PlayerSummary = namedtuple('PlayerSummary', [
+    'user_id', 'username', 'total_deaths', 'total_correct_matches', 'total_mismatches',
+    'total_attempts', 'overall_accuracy', 'levels_played', 'score',
+])
+
+
+class LevelAggregate:
+    """Summed statistics of one level across all players"""
+
+    __slots__ = ('deaths', 'correct_matches', 'mismatches', 'total_attempts', 'accuracy_sum', 'players',
+                 'health_sum', 'health_count', 'mismatch_count', 'mismatch_y_sum',
+                 'health_values', 'mismatch_y_values', 'mismatch_y_histogram')
+
+    def __init__(self):
+        for name in self.__slots__[:-3]:
+            setattr(self, name, 0)
+        self.health_values = ValueCounts()
+        self.mismatch_y_values = ValueCounts()
+        self.mismatch_y_histogram = FixedBinHistogram(*MISMATCH_Y_BINS)
+
+    @property
+    def accuracy(self):
+        """Share of correct matches over all attempts on this level"""
+        return self.correct_matches / self.total_attempts if self.total_attempts else 0.0
+
+    @property
+    def mean_accuracy(self):
+        """Mean of the per-player accuracies on this level"""
+        return self.accuracy_sum / self.players if self.players else 0.0
+
+    @property
+    def mean_health(self):
+        return self.health_sum / self.health_count if self.health_count else 0.0
+
+    @property
+    def mean_mismatch_y(self):
+        return self.mismatch_y_sum / self.mismatch_count if self.mismatch_count else 0.0
+
+    def is_empty(self):
+        return not (self.players or self.health_count or self.mismatch_count)
+
+
+class AggregateStore:
+    """
+    Incrementally maintained analytics aggregates
+
+    Users can be fed either as UserRecords with replace_user(), which keeps the
+    record so a later call for the same user retracts it first, or in bulk as
+    DataFrames with add_frames(), where sign=-1 retracts previously added rows.
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.players = {}
+        self.levels = {}
+        self.total_deaths = 0
+        self.accuracy_sum = 0.0
+        self.attempts_sum = 0
+        self.levels_played_sum = 0
+        self._leaderboard = None
+
+    @classmethod
+    def from_frames(cls, user_df, level_df, mismatch_df, health_df):
+        """Build a store from the four DataFrames returned by process_user_data"""
+        store = cls()
+        store.add_frames(user_df, level_df, mismatch_df, health_df)
+        return store
+
+    # Updates
+
+    @classmethod
+    def from_totals(cls, players, level_totals):
+        """
+        Build a store from totals computed elsewhere, e.g. SQL aggregations
+
+        Args:
+            players (iterable): PlayerSummary per player
+            level_totals (dict): {level_name: {attribute: value}} with the
+                LevelAggregate attributes; `health_values` and
+                `mismatch_y_values` hold (distinct values, counts) arrays and
+                `mismatch_y_histogram` a count array laid out like
+                FixedBinHistogram.counts
+        """
+        store = cls()
+        for player in players:
+            store._apply_player(player, 1)
+        for level_name, totals in level_totals.items():
+            level = store._level(level_name)
+            for name, value in totals.items():
+                if name.endswith('_histogram'):
+                    getattr(level, name).counts += value
+                elif name.endswith('_values'):
+                    getattr(level, name).add(value[0], weights=value[1])
+                else:
+                    setattr(level, name, value)
+        store._drop_empty_levels(level_totals)
+        return store
+
+    def replace_user(self, user_id, record):
+        """
+        Set a user's current flattened data, retracting any previous version
+
+        Args:
+            user_id (str): User id
+            record (UserRecord): Flattened user, or None to remove the user
+        """
+        previous = self.records.pop(user_id, None)
+        if previous is not None:
+            self._apply_record(previous, -1)
+        if record is not None:
+            self.records[user_id] = record
+            self._apply_record(record, 1)
+
+    def remove_user(self, user_id):
+        self.replace_user(user_id, None)
+
+    def _level(self, level_name):
+        level = self.levels.get(level_name)
+        if level is None:
+            level = self.levels[level_name] = LevelAggregate()
+        return level
+
+    def _drop_empty_levels(self, level_names):
+        for level_name in level_names:
+            level = self.levels.get(level_name)
+            if level is not None and level.is_empty():
+                del self.levels[level_name]
+
+    def _apply_record(self, record, sign):
+        for level_name, values, _ in record.health:
+            level = self._level(level_name)
+            level.health_sum += sign * sum(values)
+            level.health_count += sign * len(values)
+            level.health_values.add(values, sign)
+
+        for level_name, _, y_positions in record.mismatches:
+            level = self._level(level_name)
+            level.mismatch_y_sum += sign * sum(y_positions)
+            level.mismatch_count += sign * len(y_positions)
+            level.mismatch_y_values.add(y_positions, sign)
+            level.mismatch_y_histogram.add(y_positions, sign)
+
+        total_deaths = total_matches = total_mismatches = 0
+        for level_name, deaths, match_count, mismatch_count in record.levels:
+            deaths, match_count, mismatch_count = int(deaths), int(match_count), int(mismatch_count)
+            attempts = match_count + mismatch_count
+            level = self._level(level_name)
+            level.deaths += sign * deaths
+            level.correct_matches += sign * match_count
+            level.mismatches += sign * mismatch_count
+            level.total_attempts += sign * attempts
+            level.accuracy_sum += sign * (match_count / attempts if attempts > 0 else 0.0)
+            level.players += sign
+            total_deaths += deaths
+            total_matches += match_count
+            total_mismatches += mismatch_count
+
+        self._drop_empty_levels({entry[0] for group in (record.levels, record.health, record.mismatches)
+                                 for entry in group})
+
+        if record.levels:
+            total_attempts = total_matches + total_mismatches
+            self._apply_player(PlayerSummary(
+                record.user_id, record.username, total_deaths, total_matches, total_mismatches,
+                total_attempts, total_matches / total_attempts if total_attempts > 0 else 0.0,
+                len(record.levels), total_matches * 10 - total_mismatches * 10), sign)
+
+    def _apply_player(self, player, sign):
+        if sign > 0:
+            self.players[player.user_id] = player
+            if self._leaderboard is not None:
+                self._leaderboard.update(player.user_id, player.score, player.overall_accuracy, player)
+        else:
+            del self.players[player.user_id]
+            if self._leaderboard is not None:
+                self._leaderboard.remove(player.user_id)
+        self.total_deaths += sign * player.total_deaths
+        self.accuracy_sum += sign * player.overall_accuracy
+        self.attempts_sum += sign * player.total_attempts
+        self.levels_played_sum += sign * player.levels_played
+
+    def add_frames(self, user_df, level_df, mismatch_df, health_df, sign=1):
+        """
+        Add (or with sign=-1 retract) rows of the four analytics DataFrames
+
+        Per-level totals are computed with one vectorized groupby per table.
+        """
+        touched = set()
+
+        if not level_df.empty:
+            by_level = level_df.groupby('level_name', observed=True).agg(
+                deaths=('deaths', 'sum'), correct_matches=('correct_matches', 'sum'),
+                mismatches=('mismatches', 'sum'), total_attempts=('total_attempts', 'sum'),
+                accuracy_sum=('accuracy', 'sum'), players=('accuracy', 'size'))
+            for level_name, row in by_level.iterrows():
+                level = self._level(level_name)
+                level.deaths += sign * int(row['deaths'])
+                level.correct_matches += sign * int(row['correct_matches'])
+                level.mismatches += sign * int(row['mismatches'])
+                level.total_attempts += sign * int(row['total_attempts'])
+                level.accuracy_sum += sign * float(row['accuracy_sum'])
+                level.players += sign * int(row['players'])
+                touched.add(level_name)
+
+        if not health_df.empty:
+            for level_name, values in health_df.groupby('level_name', observed=True)['health_remaining']:
+                level = self._level(level_name)
+                level.health_sum += sign * float(values.sum())
+                level.health_count += sign * len(values)
+                level.health_values.add(values.to_numpy(), sign)
+                touched.add(level_name)
+
+        if not mismatch_df.empty:
+            for level_name, values in mismatch_df.groupby('level_name', observed=True)['y_position']:
+                level = self._level(level_name)
+                level.mismatch_y_sum += sign * float(values.sum())
+                level.mismatch_count += sign * len(values)
+                level.mismatch_y_values.add(values.to_numpy(), sign)
+                level.mismatch_y_histogram.add(values.to_numpy(), sign)
+                touched.add(level_name)
+
+        self._drop_empty_levels(touched)
+
+        if not user_df.empty:
+            columns = list(PlayerSummary._fields)
+            for player in user_df[columns].itertuples(index=False, name=None):
+                self._apply_player(PlayerSummary._make(player), sign)
+
+    # Reads
+
+    @property
+    def player_count(self):
+        return len(self.players)
+
+    @property
+    def mean_accuracy(self):
+        """Mean overall accuracy across players"""
+        return self.accuracy_sum / len(self.players) if self.players else 0.0
+
+    @property
+    def mean_deaths(self):
+        return self.total_deaths / len(self.players) if self.players else 0.0
+
+    @property
+    def mean_attempts(self):
+        return self.attempts_sum / len(self.players) if self.players else 0.0
+
+    @property
+    def mean_levels_played(self):
+        return self.levels_played_sum / len(self.players) if self.players else 0.0
+
+    def level_names(self):
+        """Every level with any data, sorted"""
+        return sorted(self.levels)
+
+    def played_levels(self):
+        """{level_name: LevelAggregate} for levels with match statistics, sorted by name"""
+        return {name: self.levels[name] for name in self.level_names() if self.levels[name].players}
+
+    @property
+    def level_row_accuracy(self):
+        """Mean accuracy over every (player, level) row"""
+        rows = sum(level.players for level in self.levels.values())
+        return sum(level.accuracy_sum for level in self.levels.values()) / rows if rows else 0.0
+
+    @property
+    def health_count(self):
+        return sum(level.health_count for level in self.levels.values())
+
+    @property
+    def mean_health(self):
+        count = self.health_count
+        return sum(level.health_sum for level in self.levels.values()) / count if count else 0.0
+
+    def _merged(self, attribute, empty, level_name=None):
+        if level_name is None:
+            levels = self.levels.values()
+        else:
+            levels = [self.levels[level_name]] if level_name in self.levels else []
+        for level in levels:
+            empty.merge(getattr(level, attribute))
+        return empty
+
+    def health_values(self, level_name=None):
+        """Health-at-completion value counts of one level, or merged over all levels"""
+        return self._merged('health_values', ValueCounts(), level_name)
+
+    def mismatch_y_values(self, level_name=None):
+        """Mismatch y-position value counts of one level, or merged over all levels"""
+        return self._merged('mismatch_y_values', ValueCounts(), level_name)
+
+    def mismatch_y_histogram(self, level_name=None):
+        """Mismatch y-position histogram of one level, or merged over all levels"""
+        return self._merged('mismatch_y_histogram', FixedBinHistogram(*MISMATCH_Y_BINS), level_name)
+
+    def health_range(self):
+        """(lowest, highest) health at completion, or (0, 0) without completions"""
+        values = self.health_values()
+        if not values.count:
+            return 0.0, 0.0
+        return values.min(), values.max()
+
+    @property
+    def mismatch_count(self):
+        return sum(level.mismatch_count for level in self.levels.values())
+
+    @property
+    def mean_mismatch_y(self):
+        count = self.mismatch_count
+        return sum(level.mismatch_y_sum for level in self.levels.values()) / count if count else 0.0
+
+    def most_common_mismatch_y(self):
+        """Most frequently logged mismatch y-position, or None"""
+        return self.mismatch_y_values().mode()
+
+    @property
+    def leaderboard(self):
+        """
+        Leaderboard of the current players, ordered by score then accuracy
+
+        Built with one sort on first access and kept up to date by every
+        later update of the store.
+        """
+        if self._leaderboard is None:
+            self._leaderboard = Leaderboard()
+            self._leaderboard.load((player.user_id, player.score, player.overall_accuracy, player)
+                                   for player in self.players.values())
+        return self._leaderboard
+
+    def top_players(self, k=10):
+        """Highest scoring players, best first (ties broken by accuracy)"""
+        return self.leaderboard.top(k)
+
+    def player_rank(self, user_id):
+        """1-based leaderboard position of a player, or None"""
+        return self.leaderboard.rank(user_id)
@@ -1,24 +1,86 @@
 import requests
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime
 import json
-from collections import defaultdict
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
 import warnings
-warnings.filterwarnings('ignore')
+from aggregate_store import AggregateStore
+from columnar import ColumnarBuilder, parse_user
+from instrumentation import ByteCounter, PipelineMetrics, frame_rows
+from json_stream import iter_users_file_pages
+from level_layouts import DEFAULT_RESOURCES_DIR, level_sort_key, load_layouts, mismatch_hotspots
+from live import (CONTROL_EVENTS, TERMINAL_EVENTS, affected_users, apply_event, iter_sse_events,
+                  iter_stream_lines)
+
+# pandas, plotly, pyarrow and the optional processing paths (snapshot cache,
+# process pool, offline dataset) are imported inside the methods that use
+# them, so console-only commands do not pay for loading them.
+
+def _firebase_key_order(key):
+    """Sort key matching Realtime Database orderBy="$key" (32-bit integer keys first, then strings)"""
+    # isdigit() alone also accepts non-ASCII digits such as '²', which int() rejects
+    digits = key[1:] if key[:1] == '-' else key
+    if digits.isascii() and digits.isdigit() and -2**31 <= int(key) < 2**31:
+        return (0, int(key), '')
+    return (1, 0, key)
+
+def _write_text_atomic(path, text):
+    """Write a text file through a temporary file so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
 class MorphRunnerRealtimeAnalytics:
-    def __init__(self, firebase_url="https://morphrunneranalytics3107-default-rtdb.firebaseio.com/"):
+    def __init__(self, firebase_url="https://morphrunneranalytics3107-default-rtdb.firebaseio.com/",
+                 timeout=30, max_retries=3, backoff_factor=0.5, pool_size=16, resources_dir=DEFAULT_RESOURCES_DIR):
         """
         Initialize Firebase Realtime Database connection
         
         Args:
-            firebase_url (str): Firebase Realtime Database URL
+            firebase_url (str): Firebase Realtime Database URL, or the URL of a local
+                ingest_service.IngestService the game writes to instead
+            timeout (float): Per-request connect/read timeout in seconds
+            max_retries (int): Retries for failed connections and 429/5xx responses
+            backoff_factor (float): Exponential backoff base between retries, in seconds
+            pool_size (int): Keep-alive connections kept open to the database
+            resources_dir (str): Unity Resources folder holding the `<Level> data`
+                obstacle layouts
         """
         self.firebase_url = firebase_url.rstrip('/') + '/'
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self.resources_dir = resources_dir
+        self._level_layouts = None
+        self._session = None
+        self._snapshot_cache = None
+        self._store = None
+        self.aggregates = None
+        self._aggregates_source = None
+        self.live_aggregates = None
+        self.byte_counter = ByteCounter()
+        self.last_run_metrics = None
+    
+    @property
+    def session(self):
+        """Pooled HTTP session shared by all fetches (keep-alive, retries with backoff)"""
+        if self._session is None:
+            retry = Retry(total=self.max_retries, backoff_factor=self.backoff_factor,
+                          status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.hooks['response'].append(self.byte_counter.response_hook)
+            self._session = session
+        return self._session
         
     def fetch_all_users_data(self):
         """
@@ -28,7 +90,7 @@ class MorphRunnerRealtimeAnalytics:
             dict: Complete user data structure
         """
         try:
-            response = requests.get(f"{self.firebase_url}users.json")
+            response = self.session.get(f"{self.firebase_url}users.json", timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
                 if data:
@@ -44,16 +106,326 @@ class MorphRunnerRealtimeAnalytics:
             print(f"Error connecting to Firebase: {e}")
             return {}
     
-    def process_user_data(self, raw_data):
+    def fetch_users_pages(self, page_size=1000):
+        """
+        Fetch user data page by page, ordered by user key
+        
+        Uses the Realtime Database REST query parameters orderBy="$key",
+        startAt and limitToFirst so only one page is held in memory at a time.
+        (shallow=true cannot be combined with these parameters.)
+        
+        Args:
+            page_size (int): Number of users requested per page
+            
+        Yields:
+            dict: {user_id: user_data} for each page
+            
+        Raises:
+            RuntimeError: If a page after the first cannot be fetched, so a
+                partial user set is never taken for the complete one
+        """
+        url = f"{self.firebase_url}users.json"
+        params = {'orderBy': '"$key"', 'limitToFirst': page_size}
+        last_key = None
+        total_users = 0
+        pages = 0
+        
+        while True:
+            if last_key is not None:
+                # startAt is inclusive, so ask for one extra user and drop the repeat
+                params['startAt'] = json.dumps(last_key)
+                params['limitToFirst'] = page_size + 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.raise_for_status()
+            except Exception as e:
+                if pages == 0:
+                    print(f"Error fetching page 1: {e}")
+                    return
+                # Ending the generator here would pass the pages so far off as all users
+                raise RuntimeError(f"Error fetching page {pages + 1} after {total_users} users: {e}") from e
+            
+            page = response.json() or {}
+            if last_key is not None:
+                page.pop(last_key, None)
+            if not page:
+                break
+            
+            # REST results are unordered JSON objects; find the cursor client-side
+            last_key = max(page, key=_firebase_key_order)
+            pages += 1
+            total_users += len(page)
+            yield page
+            
+            if len(page) < page_size:
+                break
+        
+        print(f"Fetched data for {total_users} users in {pages} pages")
+    
+    def list_user_keys(self):
+        """
+        List user ids without downloading their data (shallow=true)
+        
+        Returns:
+            list: User ids, or None if the listing failed
+        """
+        try:
+            response = self.session.get(f"{self.firebase_url}users.json",
+                                        params={'shallow': 'true'}, timeout=self.timeout)
+            if response.status_code == 200:
+                return list(response.json() or {})
+            print(f"Error listing users: {response.status_code}")
+        except Exception as e:
+            print(f"Error connecting to Firebase: {e}")
+        return None
+    
+    def fetch_user_data(self, user_id):
+        """
+        Fetch a single user's subtree
+        
+        Args:
+            user_id (str): User id
+            
+        Returns:
+            The user's data (None if the user does not exist)
+        """
+        response = self.session.get(f"{self.firebase_url}users/{quote(user_id, safe='')}.json",
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def fetch_user_snapshot(self, user_id):
+        """
+        Fetch a single user's subtree as raw JSON together with a content hash
+        
+        The hash is the Realtime Database ETag for the location when the server
+        provides one, otherwise a BLAKE2 digest of the response body.
+        
+        Args:
+            user_id (str): User id
+            
+        Returns:
+            tuple: (content_hash, raw JSON bytes)
+        """
+        response = self.session.get(f"{self.firebase_url}users/{quote(user_id, safe='')}.json",
+                                    headers={'X-Firebase-ETag': 'true'}, timeout=self.timeout)
+        response.raise_for_status()
+        content_hash = response.headers.get('ETag') or hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        return content_hash, response.content
+    
+    def _fetch_each_user(self, fetch, user_ids, max_workers=None):
+        """
+        Run `fetch(user_id)` for every user on a thread pool
+        
+        Yields:
+            tuple: (user_id, result) for each user that did not fail after retries
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+            futures = {executor.submit(fetch, user_id): user_id for user_id in user_ids}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error fetching user {futures[future]}: {e}")
+                    continue
+                yield futures[future], result
+    
+    def fetch_users_concurrent(self, max_workers=None):
+        """
+        Fetch all users by listing keys with shallow=true and then pulling each
+        user's subtree in parallel over the pooled session
+        
+        Args:
+            max_workers (int): Concurrent requests, defaults to the session pool size
+            
+        Returns:
+            dict: Complete user data structure (users that failed after retries are skipped)
+        """
+        user_ids = self.list_user_keys()
+        if not user_ids:
+            print("No data found in Firebase")
+            return {}
+        
+        data = {}
+        fetched = 0
+        for user_id, user_data in self._fetch_each_user(self.fetch_user_data, user_ids, max_workers):
+            fetched += 1
+            if user_data is not None:
+                data[user_id] = user_data
+        
+        failed = len(user_ids) - fetched
+        print(f"Fetched data for {len(data)} users" + (f" ({failed} failed)" if failed else ""))
+        return data
+    
+    def refresh_incremental(self, cache_path='morphrunner_snapshot.db', max_workers=None):
+        """
+        Refresh the analytics tables from a local snapshot cache, reprocessing
+        only users that are new or whose subtree changed since the last refresh
+        
+        Users are listed with shallow=true and fetched concurrently; each
+        subtree's ETag/content hash is compared with the cached one and only
+        changed subtrees are parsed. Users deleted from Firebase are dropped.
+        Users that fail to download keep their cached rows.
+        
+        Args:
+            cache_path (str): SQLite snapshot file, reused across runs
+            max_workers (int): Concurrent requests, defaults to the session pool size
+            
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        from snapshot_cache import SnapshotCache
+        
+        if self._snapshot_cache is None or self._snapshot_cache.path != cache_path:
+            self._snapshot_cache = SnapshotCache(cache_path)
+        cache = self._snapshot_cache
+        
+        user_ids = self.list_user_keys()
+        if user_ids is None:
+            print("⚠️  Could not list users, using cached snapshot")
+            return cache.frames()
+        
+        cached_hashes = cache.content_hashes()
+        changed_hashes = {}
+        builder = ColumnarBuilder()
+        for user_id, (content_hash, content) in self._fetch_each_user(self.fetch_user_snapshot, user_ids,
+                                                                      max_workers):
+            if cached_hashes.get(user_id) == content_hash:
+                continue
+            changed_hashes[user_id] = content_hash
+            builder.add(parse_user(user_id, json.loads(content)))
+        
+        removed_ids = cached_hashes.keys() - set(user_ids)
+        new_users = len(changed_hashes.keys() - cached_hashes.keys())
+        print(f"Snapshot refresh: {new_users} new, {len(changed_hashes) - new_users} changed, "
+              f"{len(removed_ids)} removed, {len(user_ids) - len(changed_hashes)} unchanged users")
+        
+        # Retract the stale rows from the running aggregates and add the fresh ones
+        changed_frames = builder.to_frames()
+        if self.aggregates is None or self._aggregates_source is not cache:
+            self.aggregates = AggregateStore.from_frames(*cache.frames())
+            self._aggregates_source = cache
+        self.aggregates.add_frames(*cache.user_frames(changed_hashes.keys() | removed_ids), sign=-1)
+        self.aggregates.add_frames(*changed_frames)
+        return cache.apply(changed_hashes, changed_frames, removed_ids)
+    
+    def stream_user_events(self, reconnect=True):
+        """
+        Subscribe to the Realtime Database streaming endpoint for `users`
+        
+        The first event after every (re)connect is a `put` of the whole tree at
+        path "/"; later events carry paths relative to `users`.
+        
+        Args:
+            reconnect (bool): Reconnect with exponential backoff when the stream drops
+            
+        Yields:
+            tuple: (event, path, data) for every `put`/`patch` event
+        """
+        url = f"{self.firebase_url}users.json"
+        delay = max(self.backoff_factor, 0.5)
+        while True:
+            try:
+                # Firebase sends keep-alive events every 30 seconds, so a silent minute means a dead stream
+                with self.session.get(url, headers={'Accept': 'text/event-stream'}, stream=True,
+                                      timeout=(self.timeout, 60)) as response:
+                    if response.status_code != 200:
+                        print(f"Error opening event stream: {response.status_code}")
+                    else:
+                        delay = max(self.backoff_factor, 0.5)
+                        lines = iter_stream_lines(response.raw.read1)
+                        for event, payload in iter_sse_events(lines):
+                            if event in TERMINAL_EVENTS:
+                                print(f"Event stream closed by server: {event} {payload}")
+                                return
+                            if event in CONTROL_EVENTS or not isinstance(payload, dict):
+                                continue
+                            yield event, payload.get('path', '/'), payload.get('data')
+            except requests.RequestException as e:
+                print(f"Event stream interrupted: {e}")
+            
+            if not reconnect:
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+    
+    def process_user_data(self, raw_data, engine='columnar', processes=None, compact=False):
         """
         Process raw Firebase data into structured DataFrames
         
         Args:
-            raw_data (dict): Raw data from Firebase
+            raw_data (dict or iterable): Raw data from Firebase, or an iterable of
+                {user_id: user_data} pages such as fetch_users_pages()
+            engine (str): 'columnar' writes typed column buffers with categorical
+                user/level columns; 'rows' is the original dict-per-row path
+            processes (int): If set above 1, flatten a raw data dict on this many
+                worker processes (columnar engine only)
+            compact (bool): Share one categorical dtype per key column between the
+                tables, downcast numeric columns to 32 bits and leave out the
+                derived health_percentage column (columnar engine only)
             
         Returns:
             tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
         """
+        pages = [raw_data] if isinstance(raw_data, dict) else raw_data
+        
+        if engine == 'rows':
+            merged = {}
+            for page in pages:
+                merged.update(page)
+            return self._process_user_data_rows(merged)
+        if engine != 'columnar':
+            raise ValueError(f"Unknown processing engine: {engine}")
+        if processes and processes > 1 and isinstance(raw_data, dict):
+            from parallel import process_users_parallel
+            return process_users_parallel(raw_data, processes, compact=compact)
+        
+        builder = ColumnarBuilder()
+        for page in pages:
+            for user_id, user_data in page.items():
+                builder.add(parse_user(user_id, user_data))
+        return builder.to_frames(compact)
+    
+    def process_users_file(self, path, page_size=1000, root_key=None, compact=False):
+        """
+        Process a users.json dump on disk without loading it whole
+        
+        The dump is stream-parsed one user at a time and handed to the columnar
+        engine in pages, so peak memory is the processed tables plus one page.
+        
+        Args:
+            path (str): JSON file holding {user_id: user_data}
+            page_size (int): Users decoded before they are flattened
+            root_key (str): Top-level key of the users object when the file is
+                a full database export, e.g. 'users'
+            compact (bool): Build compact frames, see process_user_data
+            
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        return self.process_user_data(iter_users_file_pages(path, page_size, root_key), compact=compact)
+    
+    def process_export_files(self, paths, processes=None, compact=False):
+        """
+        Process exported users JSON files (e.g. shards of a users.json dump)
+        
+        Args:
+            paths (list): JSON files holding {user_id: user_data}, or full
+                database exports with a top-level `users` key
+            processes (int): Worker processes, defaults to the CPU count
+            compact (bool): Build compact frames, see process_user_data
+            
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        from parallel import process_files_parallel
+        
+        return process_files_parallel(paths, processes, compact)
+    
+    def _process_user_data_rows(self, raw_data):
+        """Original row-based processing, one dict per output row"""
+        import pandas as pd
+        
         user_summaries = []
         level_details = []
         mismatch_positions = []
@@ -100,6 +472,12 @@ class MorphRunnerRealtimeAnalytics:
                                 })
             
             # Process match statistics
+            # Per-user totals are accumulated here so the summary below does not
+            # have to rescan every level row collected so far.
+            levels_played = 0
+            total_deaths = 0
+            total_matches = 0
+            total_mismatches = 0
             for level_name, level_stats in match_stats.items():
                 if isinstance(level_stats, dict):
                     match_count = level_stats.get('obstacle_match_count', 0)
@@ -124,6 +502,11 @@ class MorphRunnerRealtimeAnalytics:
                     }
                     level_details.append(level_detail)
                     
+                    levels_played += 1
+                    total_deaths += deaths
+                    total_matches += match_count
+                    total_mismatches += mismatch_count
+                    
                     # Process mismatch positions
                     if isinstance(mismatch_positions_data, dict):
                         for pos_id, y_position in mismatch_positions_data.items():
@@ -137,11 +520,7 @@ class MorphRunnerRealtimeAnalytics:
                                 })
             
             # Create user summary
-            user_levels = [detail for detail in level_details if detail['user_id'] == user_id]
-            if user_levels:
-                total_deaths = sum(detail['deaths'] for detail in user_levels)
-                total_matches = sum(detail['correct_matches'] for detail in user_levels)
-                total_mismatches = sum(detail['mismatches'] for detail in user_levels)
+            if levels_played:
                 total_attempts = total_matches + total_mismatches
                 overall_accuracy = total_matches / total_attempts if total_attempts > 0 else 0
                 
@@ -157,7 +536,7 @@ class MorphRunnerRealtimeAnalytics:
                     'total_mismatches': total_mismatches,
                     'total_attempts': total_attempts,
                     'overall_accuracy': overall_accuracy,
-                    'levels_played': len(user_levels),
+                    'levels_played': levels_played,
                     'score': score
                 })
         
@@ -166,62 +545,241 @@ class MorphRunnerRealtimeAnalytics:
                 pd.DataFrame(mismatch_positions),
                 pd.DataFrame(health_completions))  # NEW: Return health data
     
-    def create_complete_dashboard(self, user_df, level_df, mismatch_df, health_df):
-        """Create a focused dashboard with key metrics, health graph, leaderboard and summary"""
+    def process_player_activity(self, raw_data):
+        """
+        Build the time-indexed session table behind the activity reports
+        
+        Reads the `registration_time`, `health_progression` and
+        `current_level_health` nodes that process_user_data ignores.
+        
+        Args:
+            raw_data (dict or iterable): Raw data from Firebase, or an iterable of
+                {user_id: user_data} pages
+            
+        Returns:
+            PlayerActivity: Players and their time-sorted sessions
+        """
+        from cohorts import build_player_activity
+        
+        return build_player_activity(raw_data)
+    
+    def load_player_activity(self, page_size=None, max_workers=None, users_file=None):
+        """
+        Build the session table from Firebase or a users.json dump
+        
+        Takes the raw-data source arguments of generate_full_report; cached
+        snapshots and offline datasets do not keep the session nodes.
+        
+        Returns:
+            PlayerActivity: Players and their time-sorted sessions
+        """
+        if users_file:
+            raw_data = iter_users_file_pages(users_file)
+        elif page_size:
+            raw_data = self.fetch_users_pages(page_size)
+        elif max_workers:
+            raw_data = self.fetch_users_concurrent(max_workers)
+        else:
+            raw_data = self.fetch_all_users_data()
+        return self.process_player_activity(raw_data)
+    
+    def build_aggregates(self, user_df, level_df, mismatch_df, health_df):
+        """
+        Build the aggregate store read by the dashboard and the console summary
+        
+        Returns:
+            AggregateStore: Per-level and per-player aggregates of the four tables
+        """
+        self.aggregates = AggregateStore.from_frames(user_df, level_df, mismatch_df, health_df)
+        self._aggregates_source = None
+        return self.aggregates
+
+    def build_aggregates_from_users(self, raw_data):
+        """
+        Build the aggregate store straight from raw users, without DataFrames
+        
+        Used by the console reports, which only read aggregates and so never
+        need to load pandas.
+        
+        Args:
+            raw_data (dict or iterable): Raw data from Firebase, or an iterable of
+                {user_id: user_data} pages
+            
+        Returns:
+            AggregateStore: Per-level and per-player aggregates of the users
+        """
+        store = AggregateStore()
+        for page in [raw_data] if isinstance(raw_data, dict) else raw_data:
+            for user_id, user_data in page.items():
+                store.replace_user(user_id, parse_user(user_id, user_data))
+        self.aggregates = store
+        self._aggregates_source = None
+        return store
+    
+    def load_aggregates(self, page_size=None, max_workers=None, cache_path=None, dataset_path=None,
+                        ingest_date=None, users_file=None, store_path=None):
+        """
+        Build the aggregate store from any report source
+        
+        Takes the source arguments of generate_full_report. Firebase downloads
+        and users.json dumps are aggregated without building DataFrames, an
+        analytics store with SQL aggregations.
+        
+        Returns:
+            AggregateStore: Aggregates of the selected source
+        """
+        if store_path:
+            return self.load_store_aggregates(store_path)
+        if dataset_path:
+            return self.build_aggregates(*self.load_dataset(dataset_path, ingest_date))
+        if cache_path:
+            self.refresh_incremental(cache_path, max_workers)
+            return self.aggregates
+        if users_file:
+            raw_data = iter_users_file_pages(users_file)
+        elif page_size:
+            raw_data = self.fetch_users_pages(page_size)
+        elif max_workers:
+            raw_data = self.fetch_users_concurrent(max_workers)
+        else:
+            raw_data = self.fetch_all_users_data()
+        return self.build_aggregates_from_users(raw_data)
+
+    @property
+    def level_layouts(self):
+        """{level_name: LevelLayout} of the level files found in resources_dir, loaded once"""
+        if self._level_layouts is None:
+            self._level_layouts = load_layouts(self.resources_dir)
+        return self._level_layouts
+
+    def mismatch_hotspots(self, aggregates):
+        """
+        Attribute each level's logged mismatches to the obstacle rows of its layout
+        
+        Args:
+            aggregates (AggregateStore): Aggregated telemetry
+            
+        Returns:
+            dict: {level_name: [Hotspot, ...]}, most mismatches first
+        """
+        return mismatch_hotspots(aggregates, self.level_layouts)
+
+    @property
+    def leaderboard(self):
+        """
+        Score-ordered index of the players in the latest aggregates, or None
+        before any data was processed. The live store takes precedence while
+        the live dashboard is running.
+        """
+        store = self.live_aggregates if self.live_aggregates is not None else self.aggregates
+        return store.leaderboard if store is not None else None
+
+    def player_rank(self, user_id):
+        """
+        Look up a player's leaderboard position
+
+        Args:
+            user_id (str): Firebase user id
+
+        Returns:
+            int: 1-based rank, or None if the player is not on the leaderboard
+        """
+        leaderboard = self.leaderboard
+        return leaderboard.rank(user_id) if leaderboard is not None else None
+
+    def create_complete_dashboard(self, user_df, level_df, mismatch_df, health_df, aggregates=None):
+        """
+        Create a focused dashboard with key metrics, health graph, leaderboard and summary
+        
+        Args:
+            aggregates (AggregateStore): Precomputed aggregates of the four tables;
+                built from the DataFrames when omitted
+        """
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
         
-        # Create extended dashboard layout (3 rows x 3 columns)
+        if aggregates is None:
+            aggregates = self.build_aggregates(user_df, level_df, mismatch_df, health_df)
+        played_levels = aggregates.played_levels()
+        layouts = self.level_layouts
+        # One mismatch panel per level with a layout file or logged data, at least three
+        levels = sorted(set(layouts) | set(aggregates.level_names()), key=level_sort_key)
+        if not levels:
+            levels = ['Level1', 'Level2', 'Level3']
+        cols = max(3, len(levels))
+        
+        # Create extended dashboard layout (3 rows x `cols` columns)
         fig = make_subplots(
-            rows=3, cols=3,
+            rows=3, cols=cols,
             subplot_titles=(
-                'Level 1: Mismatch Positions', 'Level 2: Mismatch Positions', 'Level 3: Mismatch Positions',
+                *[f'{level}: Mismatches per Obstacle Row' if level in layouts else f'{level}: Mismatch Positions'
+                  for level in levels],
+                *[''] * (cols - len(levels)),
                 'Total Deaths per Level', 'Obstacle Match Accuracy', 'Health Remaining at Completion',
-                '🏆 Top Players Leaderboard', '', '📊 Summary Statistics'
+                '🏆 Top Players Leaderboard', '📊 Summary Statistics'
             ),
             specs=[
-                [{"type": "histogram"}, {"type": "histogram"}, {"type": "histogram"}],
-                [{"type": "bar"}, {"type": "bar"}, {"type": "scatter"}],  # Changed last to scatter for health graph
-                [{"type": "bar", "colspan": 2}, None, {"type": "table"}]  # Leaderboard spans 2 cols, summary in col 3
+                [{"type": "bar"}] * cols,
+                # Health graph takes the remaining columns
+                [{"type": "bar"}, {"type": "bar"}, {"type": "scatter", "colspan": cols - 2}] + [None] * (cols - 3),
+                # Leaderboard spans all but the last column, summary in the last one
+                [{"type": "bar", "colspan": cols - 1}] + [None] * (cols - 2) + [{"type": "table"}]
             ],
             vertical_spacing=0.12,
-            horizontal_spacing=0.10
+            horizontal_spacing=0.10 * 3 / cols
         )
         
-        # Row 1: Mismatch Position Histograms for each level
-        levels = ['Level1', 'Level2', 'Level3']
-        colors = ['#9C27B0', '#E91E63', '#FF5722']
+        # Row 1: Mismatches per obstacle row for each level
+        palette = ['#9C27B0', '#E91E63', '#FF5722', '#3F51B5', '#009688', '#795548']
+        colors = [palette[i % len(palette)] for i in range(len(levels))]
         
         for i, level in enumerate(levels):
-            if not mismatch_df.empty:
-                level_mismatches = mismatch_df[mismatch_df['level_name'] == level]
-                if not level_mismatches.empty:
-                    fig.add_trace(
-                        go.Histogram(
-                            x=level_mismatches['y_position'],
-                            nbinsx=12,
-                            name=f'{level} Mismatches',
-                            marker_color=colors[i],
-                            showlegend=False
-                        ),
-                        row=1, col=i+1
-                    )
-                else:
-                    fig.add_trace(
-                        go.Histogram(x=[], name='No Data', marker_color=colors[i], showlegend=False),
-                        row=1, col=i+1
-                    )
+            histogram = aggregates.mismatch_y_histogram(level)
+            layout = layouts.get(level)
+            if layout is not None and histogram.count:
+                # Logged positions attributed to the nearest obstacle row of the level file
+                counts = layout.histogram_row_counts(histogram)
+                players = aggregates.levels[level].players if level in aggregates.levels else 0
+                fig.add_trace(
+                    go.Bar(
+                        x=layout.rows,
+                        y=counts,
+                        name=f'{level} Mismatches',
+                        marker_color=colors[i],
+                        hovertext=[f"Obstacles (prefab, lane): {', '.join(map(str, obstacles))}<br>"
+                                   f"Mismatches per player: {count / players if players else 0:.3f}"
+                                   for obstacles, count in zip(layout.obstacles, counts)],
+                        showlegend=False
+                    ),
+                    row=1, col=i+1
+                )
+                continue
+            # Without a layout, bars are read from the level's y-position sketch, 20 sketch bins per bar
+            left_edges, counts, width = histogram.coarsen(20)
+            if counts.any():
+                fig.add_trace(
+                    go.Bar(
+                        x=left_edges + width / 2,
+                        y=counts,
+                        width=width,
+                        name=f'{level} Mismatches',
+                        marker_color=colors[i],
+                        showlegend=False
+                    ),
+                    row=1, col=i+1
+                )
             else:
                 fig.add_trace(
-                    go.Histogram(x=[], name='No Data', marker_color=colors[i], showlegend=False),
+                    go.Bar(x=[], y=[], name='No Data', marker_color=colors[i], showlegend=False),
                     row=1, col=i+1
                 )
         
         # Row 2, Col 1: Total Deaths per Level
-        if not level_df.empty:
-            deaths_by_level = level_df.groupby('level_name')['deaths'].sum().sort_index()
+        if played_levels:
             fig.add_trace(
                 go.Bar(
-                    x=deaths_by_level.index,
-                    y=deaths_by_level.values,
+                    x=list(played_levels),
+                    y=[level.deaths for level in played_levels.values()],
                     name='Total Deaths per Level',
                     marker_color='#FF6B6B',
                     showlegend=False
@@ -235,24 +793,17 @@ class MorphRunnerRealtimeAnalytics:
             )
         
         # Row 2, Col 2: Obstacle Match Accuracy (Stacked Bar Chart)
-        if not level_df.empty:
-            # Calculate accuracy data by level
-            accuracy_data = level_df.groupby('level_name').agg({
-                'correct_matches': 'sum',
-                'mismatches': 'sum',
-                'total_attempts': 'sum'
-            }).sort_index()
-            
+        if played_levels:
             # Calculate percentages for stacked bar
             correct_percentages = []
             incorrect_percentages = []
             level_names = []
             
-            for level in accuracy_data.index:
-                total = accuracy_data.loc[level, 'total_attempts']
+            for level, totals in played_levels.items():
+                total = totals.total_attempts
                 if total > 0:
-                    correct_pct = (accuracy_data.loc[level, 'correct_matches'] / total) * 100
-                    incorrect_pct = (accuracy_data.loc[level, 'mismatches'] / total) * 100
+                    correct_pct = (totals.correct_matches / total) * 100
+                    incorrect_pct = (totals.mismatches / total) * 100
                 else:
                     correct_pct = 0
                     incorrect_pct = 0
@@ -296,17 +847,15 @@ class MorphRunnerRealtimeAnalytics:
             )
         
         # Row 2, Col 3: Health Remaining at Level Completion
-        if not health_df.empty:
-            # Calculate average health percentage by level
-            health_by_level = health_df.groupby('level_name')['health_percentage'].mean().sort_index()
+        if aggregates.health_count:
+            # Average health percentage by level (max health is 100)
+            health_by_level = {name: level.mean_health for name, level in aggregates.levels.items()
+                               if level.health_count}
             
             fig.add_trace(
                 go.Scatter(
-                    x=[1, 2, 3, 4],  # Level numbers
-                    y=[health_by_level.get('Level1', 0), 
-                       health_by_level.get('Level2', 0),
-                       health_by_level.get('Level3', 0), 
-                       health_by_level.get('Level4', 0)],
+                    x=levels,
+                    y=[health_by_level.get(level, 0) for level in levels],
                     mode='lines+markers',
                     name='Average Health Remaining (%)',
                     line=dict(color='#2196F3', width=3),
@@ -324,26 +873,24 @@ class MorphRunnerRealtimeAnalytics:
         else:
             # Empty health graph
             fig.add_trace(
-                go.Scatter(x=[1, 2, 3, 4], y=[0, 0, 0, 0], mode='lines+markers',
+                go.Scatter(x=levels, y=[0] * len(levels), mode='lines+markers',
                           name='No Health Data', line=dict(color='#CCCCCC'), showlegend=False),
                 row=2, col=3
             )
         
         # Row 3, Col 1-2: Leaderboard (spans 2 columns)
-        if not user_df.empty:
+        if aggregates.player_count:
             # Sort by score and take top 10
-            top_players = user_df.nlargest(10, 'score')
+            top_players = aggregates.top_players(10)
             
             fig.add_trace(
                 go.Bar(
-                    x=top_players['username'],
-                    y=top_players['score'],
+                    x=[player.username for player in top_players],
+                    y=[player.score for player in top_players],
                     name='Player Scores',
                     marker_color='#4CAF50',
-                    text=[f"Score: {score}<br>Accuracy: {acc:.1%}<br>Mismatches: {mismatches}" 
-                          for score, acc, mismatches in zip(top_players['score'], 
-                                                       top_players['overall_accuracy'], 
-                                                       top_players['total_mismatches'])],
+                    text=[f"Score: {player.score}<br>Accuracy: {player.overall_accuracy:.1%}<br>"
+                          f"Mismatches: {player.total_mismatches}" for player in top_players],
                     textposition='outside',
                     showlegend=False
                 ),
@@ -356,21 +903,21 @@ class MorphRunnerRealtimeAnalytics:
             )
         
         # Row 3, Col 3: Summary Statistics Table
-        if not user_df.empty and not level_df.empty:
-            top_player = user_df.loc[user_df['score'].idxmax(), 'username'] if not user_df.empty else 'N/A'
+        if aggregates.player_count and played_levels:
+            top_player = aggregates.top_players(1)[0].username
             
             # Add health statistics if available
-            avg_health_completion = health_df['health_percentage'].mean() if not health_df.empty else 0
+            avg_health_completion = aggregates.mean_health
             
             summary_data = [
-                ['Total Players', len(user_df)],
+                ['Total Players', aggregates.player_count],
                 ['🏆 Top Player', top_player],
-                ['Total Deaths', level_df['deaths'].sum()],
-                ['Overall Accuracy', f"{level_df['accuracy'].mean():.1%}"],
-                ['Avg Accuracy', f"{user_df['overall_accuracy'].mean():.1%}"],
+                ['Total Deaths', sum(level.deaths for level in played_levels.values())],
+                ['Overall Accuracy', f"{aggregates.level_row_accuracy:.1%}"],
+                ['Avg Accuracy', f"{aggregates.mean_accuracy:.1%}"],
                 ['Avg Health at Completion', f"{avg_health_completion:.1f}%"],
-                ['Hardest Level', level_df.groupby('level_name')['deaths'].sum().idxmax() if not level_df.empty else 'N/A'],
-                ['Highest Accuracy Level', level_df.groupby('level_name')['accuracy'].mean().idxmax() if not level_df.empty else 'N/A']
+                ['Hardest Level', max(played_levels, key=lambda name: played_levels[name].deaths)],
+                ['Highest Accuracy Level', max(played_levels, key=lambda name: played_levels[name].mean_accuracy)]
             ]
             
             fig.add_trace(
@@ -383,7 +930,7 @@ class MorphRunnerRealtimeAnalytics:
                              fill_color='#F5F5F5',
                              font=dict(size=11))
                 ),
-                row=3, col=3
+                row=3, col=cols
             )
         else:
             # Empty table for no data
@@ -396,7 +943,7 @@ class MorphRunnerRealtimeAnalytics:
                              fill_color='#F5F5F5',
                              font=dict(size=11))
                 ),
-                row=3, col=3
+                row=3, col=cols
             )
         
         # Update layout
@@ -410,15 +957,10 @@ class MorphRunnerRealtimeAnalytics:
         )
         
         # Add proper axis labels
-        # Row 1 (Histograms)
-        fig.update_xaxes(title_text="Y-Position", row=1, col=1)
-        fig.update_yaxes(title_text="Mismatch Count", row=1, col=1)
-        
-        fig.update_xaxes(title_text="Y-Position", row=1, col=2)
-        fig.update_yaxes(title_text="Mismatch Count", row=1, col=2)
-        
-        fig.update_xaxes(title_text="Y-Position", row=1, col=3)
-        fig.update_yaxes(title_text="Mismatch Count", row=1, col=3)
+        # Row 1 (Mismatches per level)
+        for col in range(1, len(levels) + 1):
+            fig.update_xaxes(title_text="Y-Position", row=1, col=col)
+            fig.update_yaxes(title_text="Mismatch Count", row=1, col=col)
         
         # Row 2
         fig.update_xaxes(title_text="Level", row=2, col=1)
@@ -429,7 +971,7 @@ class MorphRunnerRealtimeAnalytics:
         fig.update_yaxes(range=[0, 100], row=2, col=2)  # Set Y-axis to 0-100%
         
         # NEW: Health graph
-        fig.update_xaxes(title_text="Level Number", row=2, col=3)
+        fig.update_xaxes(title_text="Level", row=2, col=3)
         fig.update_yaxes(title_text="Average Health Remaining (%)", row=2, col=3)
         fig.update_yaxes(range=[0, 100], row=2, col=3)  # Set Y-axis to 0-100%
         
@@ -439,83 +981,445 @@ class MorphRunnerRealtimeAnalytics:
         
         return fig
     
-    def print_summary_stats(self, user_df, level_df, mismatch_df, health_df):
-        """Print comprehensive summary statistics including health data"""
+    def print_summary_stats(self, user_df, level_df, mismatch_df, health_df, aggregates=None):
+        """
+        Print comprehensive summary statistics including health data
+        
+        Args:
+            aggregates (AggregateStore): Precomputed aggregates of the four tables;
+                built from the DataFrames when omitted
+        """
+        if aggregates is None:
+            aggregates = self.build_aggregates(user_df, level_df, mismatch_df, health_df)
+        self.print_aggregate_summary(aggregates)
+    
+    def print_aggregate_summary(self, aggregates):
+        """Print the summary statistics of an AggregateStore"""
         print("=" * 60)
         print("🎮 MORPH RUNNER ANALYTICS SUMMARY")
         print("=" * 60)
         
-        if not user_df.empty:
+        if aggregates.player_count:
             print(f"📊 PLAYER OVERVIEW:")
-            print(f"   Total Players: {len(user_df)}")
-            print(f"   Average Deaths per Player: {user_df['total_deaths'].mean():.2f}")
-            print(f"   Average Accuracy: {user_df['overall_accuracy'].mean():.2%}")
-            print(f"   Average Attempts per Player: {user_df['total_attempts'].mean():.1f}")
-            print(f"   Average Levels Played: {user_df['levels_played'].mean():.1f}")
+            print(f"   Total Players: {aggregates.player_count}")
+            print(f"   Average Deaths per Player: {aggregates.mean_deaths:.2f}")
+            print(f"   Average Accuracy: {aggregates.mean_accuracy:.2%}")
+            print(f"   Average Attempts per Player: {aggregates.mean_attempts:.1f}")
+            print(f"   Average Levels Played: {aggregates.mean_levels_played:.1f}")
             print()
         
-        if not level_df.empty:
+        played_levels = aggregates.played_levels()
+        if played_levels:
             print(f"🎮 LEVEL ANALYSIS:")
-            level_summary = level_df.groupby('level_name').agg({
-                'deaths': 'sum',
-                'accuracy': 'mean',
-                'mismatches': 'sum',
-                'correct_matches': 'sum',
-                'total_attempts': 'sum'
-            }).round(2)
-            
-            print(f"   Total Levels: {len(level_summary)}")
-            if not level_summary.empty:
-                print(f"   Hardest Level (most deaths): {level_summary['deaths'].idxmax()} ({level_summary['deaths'].max():.0f} total deaths)")
-                print(f"   Easiest Level (least deaths): {level_summary['deaths'].idxmin()} ({level_summary['deaths'].min():.0f} total deaths)")
-                print(f"   Highest Accuracy Level: {level_summary['accuracy'].idxmax()} ({level_summary['accuracy'].max():.1%} accuracy)")
-                print(f"   Lowest Accuracy Level: {level_summary['accuracy'].idxmin()} ({level_summary['accuracy'].min():.1%} accuracy)")
+            deaths = {name: level.deaths for name, level in played_levels.items()}
+            accuracy = {name: round(level.mean_accuracy, 2) for name, level in played_levels.items()}
+            hardest, easiest = max(deaths, key=deaths.get), min(deaths, key=deaths.get)
+            most_accurate, least_accurate = max(accuracy, key=accuracy.get), min(accuracy, key=accuracy.get)
+            
+            print(f"   Total Levels: {len(played_levels)}")
+            print(f"   Hardest Level (most deaths): {hardest} ({deaths[hardest]:.0f} total deaths)")
+            print(f"   Easiest Level (least deaths): {easiest} ({deaths[easiest]:.0f} total deaths)")
+            print(f"   Highest Accuracy Level: {most_accurate} ({accuracy[most_accurate]:.1%} accuracy)")
+            print(f"   Lowest Accuracy Level: {least_accurate} ({accuracy[least_accurate]:.1%} accuracy)")
             print()
         
         # NEW: Health completion analysis
-        if not health_df.empty:
+        if aggregates.health_count:
+            worst_health, best_health = aggregates.health_range()
             print(f"❤️  HEALTH COMPLETION ANALYSIS:")
-            print(f"   Total Level Completions: {len(health_df)}")
-            print(f"   Average Health at Completion: {health_df['health_percentage'].mean():.1f}%")
-            print(f"   Best Health at Completion: {health_df['health_percentage'].max():.1f}%")
-            print(f"   Worst Health at Completion: {health_df['health_percentage'].min():.1f}%")
+            print(f"   Total Level Completions: {aggregates.health_count}")
+            print(f"   Average Health at Completion: {aggregates.mean_health:.1f}%")
+            print(f"   Best Health at Completion: {best_health:.1f}%")
+            print(f"   Worst Health at Completion: {worst_health:.1f}%")
+            median_health, p90_health = aggregates.health_values().quantiles([0.5, 0.9])
+            print(f"   Median / 90th Percentile Health: {median_health:.1f}% / {p90_health:.1f}%")
             
             # Health by level analysis
-            health_by_level = health_df.groupby('level_name')['health_percentage'].agg(['mean', 'count'])
-            for level in health_by_level.index:
-                avg_health = health_by_level.loc[level, 'mean']
-                completions = health_by_level.loc[level, 'count']
-                print(f"   {level}: {avg_health:.1f}% avg health ({completions} completions)")
+            for name in aggregates.level_names():
+                level = aggregates.levels[name]
+                if level.health_count:
+                    print(f"   {name}: {level.mean_health:.1f}% avg health ({level.health_count} completions)")
             print()
         
-        if not mismatch_df.empty:
+        if aggregates.mismatch_count:
             print(f"🎯 ACCURACY & MISMATCH ANALYSIS:")
-            print(f"   Total Mismatches Logged: {len(mismatch_df)}")
-            print(f"   Average Y-Position of Mismatches: {mismatch_df['y_position'].mean():.2f}")
-            if not mismatch_df['y_position'].mode().empty:
-                print(f"   Most Common Mismatch Y-Position: {mismatch_df['y_position'].mode().iloc[0]:.2f}")
+            print(f"   Total Mismatches Logged: {aggregates.mismatch_count}")
+            print(f"   Average Y-Position of Mismatches: {aggregates.mean_mismatch_y:.2f}")
+            most_common_y = aggregates.most_common_mismatch_y()
+            if most_common_y is not None:
+                print(f"   Most Common Mismatch Y-Position: {most_common_y:.2f}")
+            median_y, p90_y = aggregates.mismatch_y_values().quantiles([0.5, 0.9])
+            print(f"   Median / 90th Percentile Mismatch Y: {median_y:.1f} / {p90_y:.1f}")
             
             # Find problematic areas per level
-            for level in mismatch_df['level_name'].unique():
-                level_data = mismatch_df[mismatch_df['level_name'] == level]
-                print(f"   {level}: {len(level_data)} mismatches, avg Y={level_data['y_position'].mean():.1f}")
+            for name in aggregates.level_names():
+                level = aggregates.levels[name]
+                if level.mismatch_count:
+                    print(f"   {name}: {level.mismatch_count} mismatches, avg Y={level.mean_mismatch_y:.1f}")
             print()
+            
+            hotspots = self.mismatch_hotspots(aggregates)
+            if hotspots:
+                print(f"🧱 OBSTACLE MISMATCH HOTSPOTS (nearest obstacle row):")
+                for name, rows in hotspots.items():
+                    for hotspot in rows[:3]:
+                        lanes = ", ".join(f"lane {lane}: #{obstacle}" for obstacle, lane in hotspot.obstacles)
+                        print(f"   {name} y={hotspot.spawn_y:g} ({lanes}): {hotspot.mismatches} mismatches, "
+                              f"{hotspot.share:.1%} of level, {hotspot.per_player:.2f} per player")
+                print()
         
         # Print leaderboard to console
-        if not user_df.empty:
-            print("🏆 LEADERBOARD (Top 10):")
-            top_10 = user_df.nlargest(10, 'score')
-            for i, (_, player) in enumerate(top_10.iterrows(), 1):
-                medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i:2d}."
-                print(f"   {medal} {player['username']:<15} | Score: {player['score']:6.0f} | Accuracy: {player['overall_accuracy']:6.1%} | Mismatches: {player['total_mismatches']:3.0f}")
+        if aggregates.player_count:
+            self.print_leaderboard(aggregates)
+    
+    def summary_stats(self, aggregates):
+        """
+        The figures of the console summary as a JSON-serializable dict
+
+        Args:
+            aggregates (AggregateStore): Aggregated telemetry
+
+        Returns:
+            dict: `players`, `levels`, `health`, `mismatches` and `hotspots`
+                sections; `players`, `health` and `mismatches` are None
+                without data
+        """
+        summary = {'players': None, 'levels': {}, 'health': None, 'mismatches': None, 'hotspots': {}}
+        if aggregates.player_count:
+            summary['players'] = {
+                'count': aggregates.player_count,
+                'mean_deaths': float(aggregates.mean_deaths),
+                'mean_accuracy': float(aggregates.mean_accuracy),
+                'mean_attempts': float(aggregates.mean_attempts),
+                'mean_levels_played': float(aggregates.mean_levels_played),
+            }
+        for name in aggregates.level_names():
+            level = aggregates.levels[name]
+            summary['levels'][name] = {
+                'players': int(level.players),
+                'deaths': int(level.deaths),
+                'correct_matches': int(level.correct_matches),
+                'mismatches': int(level.mismatches),
+                'total_attempts': int(level.total_attempts),
+                'mean_accuracy': float(level.mean_accuracy),
+                'completions': int(level.health_count),
+                'mean_health': float(level.mean_health),
+                'mismatch_positions': int(level.mismatch_count),
+                'mean_mismatch_y': float(level.mean_mismatch_y),
+            }
+        if aggregates.health_count:
+            worst_health, best_health = aggregates.health_range()
+            median_health, p90_health = aggregates.health_values().quantiles([0.5, 0.9])
+            summary['health'] = {
+                'completions': aggregates.health_count,
+                'mean': float(aggregates.mean_health),
+                'min': float(worst_health),
+                'max': float(best_health),
+                'median': float(median_health),
+                'p90': float(p90_health),
+            }
+        if aggregates.mismatch_count:
+            most_common_y = aggregates.most_common_mismatch_y()
+            median_y, p90_y = aggregates.mismatch_y_values().quantiles([0.5, 0.9])
+            summary['mismatches'] = {
+                'count': aggregates.mismatch_count,
+                'mean_y': float(aggregates.mean_mismatch_y),
+                'most_common_y': float(most_common_y) if most_common_y is not None else None,
+                'median_y': float(median_y),
+                'p90_y': float(p90_y),
+            }
+            summary['hotspots'] = {
+                name: [{'spawn_y': hotspot.spawn_y, 'obstacles': [list(obstacle) for obstacle in hotspot.obstacles],
+                        'mismatches': hotspot.mismatches, 'share': hotspot.share, 'per_player': hotspot.per_player}
+                       for hotspot in rows]
+                for name, rows in self.mismatch_hotspots(aggregates).items()
+            }
+        return summary
+
+    def print_leaderboard(self, aggregates, k=10):
+        """Print the top `k` players of an AggregateStore"""
+        print(f"🏆 LEADERBOARD (Top {k}):")
+        for i, player in enumerate(aggregates.top_players(k), 1):
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i:2d}."
+            print(f"   {medal} {player.username:<15} | Score: {player.score:6.0f} | Accuracy: {player.overall_accuracy:6.1%} | Mismatches: {player.total_mismatches:3.0f}")
+        print()
+    
+    def print_activity_summary(self, activity, days=90, cohort_freq='W', retention_days=(1, 7, 30), until=None):
+        """
+        Print active players, cohort retention and level health trends
+        
+        Args:
+            activity (PlayerActivity): Sessions from process_player_activity
+            days (int): Calendar days, up to the latest session, to report on
+            cohort_freq (str): Registration cohort granularity ('D', 'W' or 'M')
+            retention_days (tuple): Days after registration to report retention for
+            until (str or datetime): Last reported day, defaults to the day of
+                the latest session
+        """
+        import pandas as pd
+        
+        recent = activity.last_days(days, until)
+        print(f"📅 PLAYER ACTIVITY (last {days} days):")
+        daily = recent.active_players()
+        if daily.empty:
+            print("   No sessions logged")
+            print()
+            return
+        weekly = recent.active_players(7)
+        sessions = len(recent.sessions.drop_duplicates(['user_code', 'session_time']))
+        print(f"   Sessions Logged: {sessions} "
+              f"from {daily.index[0]:%Y-%m-%d} to {daily.index[-1]:%Y-%m-%d}")
+        print(f"   Average Daily Active Players: {daily.mean():.1f} (peak {daily.max()} on {daily.idxmax():%Y-%m-%d})")
+        print(f"   Weekly Active Players (latest): {weekly.iloc[-1]}")
+        print()
+        
+        retention = activity.retention(max(retention_days), cohort_freq, until)
+        retention = retention[retention['players'] > 0].tail(8)
+        if not retention.empty:
+            print(f"🔁 RETENTION BY REGISTRATION COHORT:")
+            header = " ".join(f"{'D' + str(day):>6}" for day in retention_days)
+            print(f"   {'Cohort':<10} {'Players':>7} {header}")
+            for cohort, row in retention.iterrows():
+                # Days the cohort has not reached by `until` are not known yet
+                rates = " ".join(f"{row[day]:6.1%}" if pd.notna(row[day]) else f"{'—':>6}" for day in retention_days)
+                print(f"   {cohort:%Y-%m-%d} {row['players']:7.0f} {rates}")
+            print()
+        
+        trend = recent.level_health_trend(window=7)
+        if not trend.empty:
+            print(f"📈 LEVEL HEALTH TREND (7-day mean, first vs latest day):")
+            for level_name in trend.columns:
+                values = trend[level_name].dropna()
+                if not values.empty:
+                    print(f"   {level_name}: {values.iloc[0]:.1f}% -> {values.iloc[-1]:.1f}%")
             print()
     
-    def generate_full_report(self):
-        """Generate complete analytics report with health data"""
-        print("🔄 Fetching data from Firebase Realtime Database...")
-        raw_data = self.fetch_all_users_data()
+    def export_dataset(self, frames, path, ingest_date=None, file_format='parquet'):
+        """
+        Save the four analytics DataFrames to a partitioned offline dataset
         
-        if not raw_data:
+        Args:
+            frames (tuple): (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+            path (str): Dataset directory, partitioned by ingest date and level
+            ingest_date (str): Partition date, defaults to today
+            file_format (str): 'parquet' or 'arrow'
+        """
+        from offline_dataset import export_frames
+        
+        export_frames(frames, path, ingest_date, file_format)
+        print(f"💾 Exported {len(frames[0])} players to {path} ({file_format})")
+    
+    def load_dataset(self, path, ingest_date=None, levels=None):
+        """
+        Load one export of an offline dataset with only the columns the report reads
+        
+        Args:
+            path (str): Dataset directory written by export_dataset
+            ingest_date (str): Export to load, defaults to the latest one
+            levels (list): Only load these levels
+            
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        import pandas as pd
+        from offline_dataset import load_frames
+        
+        frames = load_frames(path, ingest_date, levels=levels)
+        if frames is None:
+            print(f"No exports found in {path}")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return frames
+    
+    def open_store(self, path):
+        """
+        Open (or create) a queryable analytics store, reusing the open snapshot
+        cache when it is the same file
+        
+        Returns:
+            AnalyticsStore: The store at `path`
+        """
+        from sql_store import AnalyticsStore
+        
+        if self._snapshot_cache is not None and self._snapshot_cache.path == path:
+            return self._snapshot_cache
+        if self._store is None or self._store.path != path:
+            if self._store is not None:
+                self._store.close()
+            self._store = AnalyticsStore(path)
+        return self._store
+    
+    def save_to_store(self, frames, path):
+        """
+        Upsert processed tables into an analytics store, replacing the stored
+        rows of every user they contain
+        
+        Args:
+            frames (tuple): (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+            path (str): SQLite store file
+        """
+        store = self.open_store(path)
+        written = store.upsert_frames(frames)
+        if self._aggregates_source is store:
+            self._aggregates_source = None
+        print(f"🗄️  Stored {written} players in {path} ({store.player_count} total)")
+    
+    def load_store_aggregates(self, path):
+        """
+        Build the aggregate store with SQL aggregations inside an analytics store
+        
+        Returns:
+            AggregateStore: Aggregates of every stored player
+        """
+        store = self.open_store(path)
+        self.aggregates = store.aggregates()
+        self._aggregates_source = store
+        return self.aggregates
+    
+    def player_stats(self, path, user_id):
+        """
+        Look up one player in an analytics store
+        
+        Args:
+            path (str): SQLite store file
+            user_id (str): Firebase user id
+            
+        Returns:
+            dict: `player` (PlayerSummary), `rank` and `levels` (LevelStats per
+                level), or None if the player is not stored
+        """
+        store = self.open_store(path)
+        player = store.player(user_id)
+        if player is None:
+            return None
+        return {'player': player, 'rank': store.player_rank(user_id), 'levels': store.player_levels(user_id)}
+    
+    def find_players(self, path, username, prefix=False):
+        """
+        Players of an analytics store with the given username (or username prefix)
+        
+        Returns:
+            list: PlayerSummary per match, best score first
+        """
+        return self.open_store(path).find_players(username, prefix)
+    
+    def print_player_stats(self, stats, player_count=None):
+        """Print a player's totals, rank and per-level statistics from player_stats()"""
+        player = stats['player']
+        print(f"👤 {player.username} ({player.user_id})")
+        rank = f"{stats['rank']}" + (f" of {player_count}" if player_count else "")
+        print(f"   Rank: {rank} | Score: {player.score} | Accuracy: {player.overall_accuracy:.1%} | "
+              f"Deaths: {player.total_deaths} | Levels Played: {player.levels_played}")
+        for level in stats['levels']:
+            print(f"   {level.level_name}: {level.accuracy:6.1%} accuracy, {level.correct_matches} matches, "
+                  f"{level.mismatches} mismatches, {level.deaths} deaths")
+        print()
+    
+    def generate_full_report(self, page_size=None, max_workers=None, cache_path=None, processes=None,
+                             dataset_path=None, ingest_date=None, export_path=None, users_file=None,
+                             output_path=None, include_plotlyjs=True, metrics_path=None, trace_memory=False,
+                             profile_path=None, compact=False, store_path=None):
+        """
+        Generate complete analytics report with health data
+        
+        Every stage is measured (wall/CPU time, bytes downloaded, rows, peak
+        RSS) and logged through the `morphrunner.pipeline` logger; the run
+        summary is kept in `self.last_run_metrics`.
+        
+        Args:
+            page_size (int): If set, download users in pages of this size and
+                process each page as it arrives instead of in one request
+            max_workers (int): If set, list users with shallow=true and fetch
+                them with this many concurrent requests
+            cache_path (str): If set, refresh incrementally from this local
+                snapshot cache and only reprocess new or changed users
+            processes (int): If set above 1, flatten the downloaded users on
+                this many worker processes
+            dataset_path (str): If set, report offline from this exported
+                dataset instead of querying Firebase
+            ingest_date (str): Export of `dataset_path` to report on (default: latest)
+            export_path (str): If set, save the processed tables to this
+                offline dataset under today's ingest date
+            users_file (str): If set, stream-parse this users.json dump from
+                disk instead of querying Firebase
+            output_path (str): If set, write the dashboard to this HTML or
+                .json file instead of opening it in a browser
+            include_plotlyjs: How an HTML output_path gets plotly.js, see write_dashboard
+            metrics_path (str): If set, also write the stage metrics to this JSON file
+            trace_memory (bool): Record each stage's peak Python allocation with tracemalloc
+            profile_path (str): If set, cProfile the run and dump the stats to this file
+            compact (bool): Process Firebase and users.json data into compact
+                frames, see process_user_data
+            store_path (str): If set, report from this analytics store with SQL
+                aggregations instead of building DataFrames
+        """
+        metrics = PipelineMetrics(self.byte_counter, trace_memory=trace_memory, profile_path=profile_path)
+        try:
+            frames = self._run_report(metrics, page_size, max_workers, cache_path, processes, dataset_path,
+                                      ingest_date, export_path, users_file, output_path, include_plotlyjs, compact,
+                                      store_path)
+        finally:
+            self.last_run_metrics = metrics.finish()
+            if metrics_path:
+                metrics.write_json(self.last_run_metrics, metrics_path)
+        return frames
+    
+    def _run_report(self, metrics, page_size, max_workers, cache_path, processes, dataset_path, ingest_date,
+                    export_path, users_file, output_path, include_plotlyjs, compact, store_path):
+        """The stages of generate_full_report, each measured by `metrics`"""
+        import pandas as pd
+        
+        aggregates = None
+        if store_path:
+            print(f"🗄️  Querying analytics store {store_path}...")
+            with metrics.stage('query') as stage:
+                aggregates = self.load_store_aggregates(store_path)
+                stage['players'] = aggregates.player_count
+            user_df, level_df, mismatch_df, health_df = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(),
+                                                         pd.DataFrame())
+            has_data = bool(aggregates.player_count or aggregates.levels)
+        elif users_file:
+            print(f"📂 Streaming users from {users_file}...")
+            with metrics.stage('ingest') as stage:
+                user_df, level_df, mismatch_df, health_df = self.process_users_file(users_file, compact=compact)
+                stage['rows'] = frame_rows((user_df, level_df, mismatch_df, health_df))
+            has_data = not (user_df.empty and health_df.empty)
+        elif dataset_path:
+            print(f"📂 Loading offline dataset {dataset_path}...")
+            with metrics.stage('load') as stage:
+                user_df, level_df, mismatch_df, health_df = self.load_dataset(dataset_path, ingest_date)
+                stage['rows'] = frame_rows((user_df, level_df, mismatch_df, health_df))
+            has_data = not (user_df.empty and health_df.empty)
+        elif cache_path:
+            print(f"🔄 Refreshing snapshot {cache_path} from Firebase Realtime Database...")
+            with metrics.stage('refresh') as stage:
+                user_df, level_df, mismatch_df, health_df = self.refresh_incremental(cache_path, max_workers)
+                stage['rows'] = frame_rows((user_df, level_df, mismatch_df, health_df))
+            has_data = not (user_df.empty and health_df.empty)
+        elif page_size:
+            print(f"🔄 Fetching data from Firebase Realtime Database in pages of {page_size} users...")
+            print("⚙️  Processing data as pages arrive...")
+            with metrics.stage('fetch+process') as stage:
+                user_df, level_df, mismatch_df, health_df = self.process_user_data(self.fetch_users_pages(page_size),
+                                                                                   compact=compact)
+                stage['rows'] = frame_rows((user_df, level_df, mismatch_df, health_df))
+            has_data = not (user_df.empty and health_df.empty)
+        else:
+            print("🔄 Fetching data from Firebase Realtime Database...")
+            with metrics.stage('fetch') as stage:
+                if max_workers:
+                    raw_data = self.fetch_users_concurrent(max_workers)
+                else:
+                    raw_data = self.fetch_all_users_data()
+                stage['users'] = len(raw_data)
+            has_data = bool(raw_data)
+            if has_data:
+                print("⚙️  Processing data...")
+                with metrics.stage('process') as stage:
+                    user_df, level_df, mismatch_df, health_df = self.process_user_data(raw_data, processes=processes,
+                                                                                       compact=compact)
+                    stage['rows'] = frame_rows((user_df, level_df, mismatch_df, health_df))
+        
+        if not has_data:
             print("❌ No real player data found in Firebase yet!")
             print("🎮 Play your game to generate analytics data.")
             print("📝 The dashboard will be empty until players start playing.")
@@ -527,33 +1431,226 @@ class MorphRunnerRealtimeAnalytics:
             health_df = pd.DataFrame()
         else:
             print("✅ Using REAL data from your Firebase!")
-            print("⚙️  Processing data...")
-            user_df, level_df, mismatch_df, health_df = self.process_user_data(raw_data)
+            if export_path and not store_path:
+                with metrics.stage('export'):
+                    self.export_dataset((user_df, level_df, mismatch_df, health_df), export_path)
         
         print("📈 Generating dashboard...")
         
+        # Both the console summary and the dashboard read the same aggregates
+        with metrics.stage('aggregate'):
+            # A store run already has its aggregates from SQL
+            if aggregates is None:
+                if cache_path and self._aggregates_source is self._snapshot_cache is not None:
+                    aggregates = self.aggregates
+                else:
+                    aggregates = self.build_aggregates(user_df, level_df, mismatch_df, health_df)
+        
         # Print summary statistics to console
-        if not user_df.empty:
-            self.print_summary_stats(user_df, level_df, mismatch_df, health_df)
-        else:
-            print("📊 No data to analyze yet - dashboard will show empty charts.")
-            print("🏆 Leaderboard will be empty until players start playing.")
+        with metrics.stage('summary'):
+            if aggregates.player_count:
+                self.print_summary_stats(user_df, level_df, mismatch_df, health_df, aggregates)
+            else:
+                print("📊 No data to analyze yet - dashboard will show empty charts.")
+                print("🏆 Leaderboard will be empty until players start playing.")
         
         # Create the complete dashboard
-        dashboard_fig = self.create_complete_dashboard(user_df, level_df, mismatch_df, health_df)
+        with metrics.stage('dashboard'):
+            dashboard_fig = self.create_complete_dashboard(user_df, level_df, mismatch_df, health_df, aggregates)
         
-        # Show the dashboard in browser
-        dashboard_fig.show()
+        with metrics.stage('output'):
+            if output_path:
+                self.write_dashboard(dashboard_fig, output_path, include_plotlyjs)
+                print(f"💾 Dashboard written to {output_path}")
+            else:
+                # Show the dashboard in browser
+                dashboard_fig.show()
         
-        if not raw_data:
+        if not has_data:
             print("🎯 Dashboard is empty - play your game to see real analytics!")
         else:
             print("✅ Dashboard shows your REAL game data with health tracking!")
         
         return user_df, level_df, mismatch_df, health_df
 
+    def serve_reports(self, host='127.0.0.1', port=8050, ttl=60.0, leaderboard_size=100, page_size=None,
+                      max_workers=None, cache_path=None, dataset_path=None, ingest_date=None, users_file=None,
+                      store_path=None):
+        """
+        Serve the summary, leaderboard and dashboard over HTTP from one shared report
+        
+        The report is rebuilt in the background every `ttl` seconds and
+        concurrent requests share it (see report_service), so any number of
+        viewers cost one build per period instead of one generate_full_report
+        each. Runs until interrupted.
+        
+        Args:
+            host (str): Interface to bind
+            port (int): Port to bind
+            ttl (float): Seconds between report refreshes
+            leaderboard_size (int): Best players kept for /leaderboard.json
+            
+        The source arguments are those of generate_full_report.
+        """
+        from report_service import serve
+        
+        source = dict(page_size=page_size, max_workers=max_workers, cache_path=cache_path,
+                      dataset_path=dataset_path, ingest_date=ingest_date, users_file=users_file,
+                      store_path=store_path)
+        serve(self, source, ttl, host, port, leaderboard_size)
+    
+    def run_live_dashboard(self, on_update=None, min_interval=1.0, output_html=None, max_events=None):
+        """
+        Keep live aggregates up to date from the Realtime Database event stream
+        
+        Each put/patch event only re-flattens the users it touches and swaps
+        their contribution in the aggregate store; nothing is refetched.
+        
+        Args:
+            on_update (callable): Called with the AggregateStore after updates,
+                at most once per `min_interval` (default: print a one-line summary)
+            min_interval (float): Minimum seconds between updates
+            output_html (str): If set, also rewrite a self-refreshing live
+                dashboard HTML file on every update
+            max_events (int): Stop after this many data events (default: run forever)
+            
+        Returns:
+            AggregateStore: The live aggregates when the stream ends
+        """
+        store = AggregateStore()
+        self.live_aggregates = store
+        tree = {}
+        events = 0
+        last_update = 0.0
+        
+        def update():
+            if on_update is not None:
+                on_update(store)
+            else:
+                self.print_live_summary(store)
+            if output_html:
+                self.write_live_dashboard(store, output_html, refresh_seconds=max(1, round(min_interval)))
+        
+        print("🔴 Subscribing to live Firebase updates...")
+        try:
+            for event, path, data in self.stream_user_events():
+                if event not in ('put', 'patch'):
+                    continue
+                user_ids = affected_users(event, path, data)
+                tree = apply_event(tree, event, path, data)
+                if user_ids is None:
+                    # The whole users node was (re)sent, e.g. right after connecting
+                    for user_id in list(store.records):
+                        if user_id not in tree:
+                            store.remove_user(user_id)
+                    user_ids = tree.keys()
+                for user_id in user_ids:
+                    store.replace_user(user_id, parse_user(user_id, tree.get(user_id)))
+                
+                events += 1
+                now = time.monotonic()
+                if now - last_update >= min_interval:
+                    update()
+                    last_update = now
+                if max_events and events >= max_events:
+                    break
+        except KeyboardInterrupt:
+            print("⏹️  Live dashboard stopped")
+        update()
+        return store
+    
+    def print_live_summary(self, store):
+        """Print a one-line live summary from an AggregateStore"""
+        deaths = ', '.join(f"{name}: {store.levels[name].deaths}" for name in store.level_names())
+        top = store.top_players(1)
+        leader = f"{top[0].username} ({top[0].score})" if top else 'N/A'
+        print(f"🔴 LIVE {datetime.now():%H:%M:%S} | Players: {store.player_count} | "
+              f"Accuracy: {store.mean_accuracy:.1%} | Deaths: {deaths or 'none'} | 🏆 {leader}")
+    
+    def create_live_figure(self, store):
+        """Create a compact dashboard figure from an AggregateStore"""
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
+        fig = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=('Total Deaths per Level', 'Obstacle Match Accuracy',
+                            'Average Health at Completion', '🏆 Top Players Leaderboard'),
+            vertical_spacing=0.15
+        )
+        level_names = store.level_names()
+        levels = [store.levels[name] for name in level_names]
+        
+        fig.add_trace(go.Bar(x=level_names, y=[level.deaths for level in levels],
+                             marker_color='#FF6B6B', showlegend=False), row=1, col=1)
+        
+        correct = [level.accuracy * 100 for level in levels]
+        incorrect = [100 - pct if level.total_attempts else 0 for pct, level in zip(correct, levels)]
+        fig.add_trace(go.Bar(x=level_names, y=correct, marker_color='#4CAF50',
+                             text=[f'{pct:.1f}%' for pct in correct], textposition='inside',
+                             showlegend=False), row=1, col=2)
+        fig.add_trace(go.Bar(x=level_names, y=incorrect, base=correct, marker_color='#F44336',
+                             text=[f'{pct:.1f}%' for pct in incorrect], textposition='inside',
+                             showlegend=False), row=1, col=2)
+        
+        fig.add_trace(go.Scatter(x=level_names, y=[level.mean_health for level in levels],
+                                 mode='lines+markers', line=dict(color='#2196F3', width=3),
+                                 showlegend=False), row=2, col=1)
+        
+        top_players = store.top_players(10)
+        fig.add_trace(go.Bar(x=[player.username for player in top_players],
+                             y=[player.score for player in top_players],
+                             text=[f"Accuracy: {player.overall_accuracy:.1%}" for player in top_players],
+                             textposition='outside', marker_color='#4CAF50', showlegend=False),
+                      row=2, col=2)
+        
+        fig.update_yaxes(range=[0, 100], row=1, col=2)
+        fig.update_yaxes(range=[0, 100], row=2, col=1)
+        fig.update_layout(
+            height=800,
+            showlegend=False,
+            title_text=f"🔴 Morph Runner: Live Analytics ({store.player_count} players, "
+                       f"updated {datetime.now():%H:%M:%S})",
+            title_x=0.5
+        )
+        return fig
+    
+    def write_live_dashboard(self, store, path, refresh_seconds=2):
+        """Atomically write the live figure as an HTML page that reloads itself"""
+        html = self.create_live_figure(store).to_html(include_plotlyjs='cdn', full_html=True)
+        html = html.replace('<head>', f'<head><meta http-equiv="refresh" content="{refresh_seconds}">', 1)
+        _write_text_atomic(path, html)
+    
+    def write_dashboard(self, fig, path, include_plotlyjs=True):
+        """
+        Write a dashboard figure to disk instead of opening a browser
+        
+        Every trace is pre-binned (sketch histograms, per-level bars, top-10
+        leaderboard), so the file size does not grow with the number of events.
+        
+        Args:
+            fig (plotly.graph_objects.Figure): Figure from create_complete_dashboard
+            path (str): Output file; `.json` writes the figure JSON, anything
+                else a standalone HTML page
+            include_plotlyjs: True embeds plotly.js (self-contained, ~4.5 MB),
+                'cdn' loads it from the plotly CDN, 'directory' references a
+                plotly.min.js next to the report, written once and shared by
+                every report in that directory
+        """
+        if path.endswith('.json'):
+            _write_text_atomic(path, fig.to_json())
+            return
+        if include_plotlyjs == 'directory':
+            bundle_path = os.path.join(os.path.dirname(os.path.abspath(path)), 'plotly.min.js')
+            if not os.path.exists(bundle_path):
+                from plotly.offline import get_plotlyjs
+                _write_text_atomic(bundle_path, get_plotlyjs())
+        _write_text_atomic(path, fig.to_html(include_plotlyjs=include_plotlyjs, full_html=True))
+
 # Usage example
 if __name__ == "__main__":
+    warnings.filterwarnings('ignore')
+    
     # Initialize analytics with your Firebase URL
     analytics = MorphRunnerRealtimeAnalytics("https://morphrunneranalytics3107-default-rtdb.firebaseio.com/")
     
@@ -0,0 +1,102 @@
+"""
+pytest-benchmark suite for the report pipeline.
+
+Covers the fetch modes against the local FirebaseStub, process_user_data,
+print_summary_stats and create_complete_dashboard on synthetic users trees.
+Sizes and activity skew are set through the environment:
+
+    MORPHRUNNER_BENCH_USERS   comma-separated user counts (default 1000,10000)
+    MORPHRUNNER_BENCH_SKEW    activity skew passed to generate_users (default 0.5)
+
+Usage (needs pytest and pytest-benchmark):
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only
+    python -m pytest benchmarks/bench_pipeline.py -k process --benchmark-autosave
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-compare   # against the last saved run
+
+pytest.ini collects bench_*.py files, so `python -m pytest benchmarks/` runs the
+suite too; a plain `pytest` only runs the tests/ directory.
+"""
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from firebase_stub import FirebaseStub
+from synthetic_data import generate_users
+
+SIZES = [int(size) for size in os.environ.get('MORPHRUNNER_BENCH_USERS', '1000,10000').split(',')]
+SKEW = float(os.environ.get('MORPHRUNNER_BENCH_SKEW', '0.5'))
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f'{size}users')
+def raw_data(request):
+    return generate_users(request.param, seed=0, skew=SKEW)
+
+
+@pytest.fixture(scope='module')
+def stub(raw_data):
+    with FirebaseStub({'users': raw_data}) as server:
+        yield server
+
+
+@pytest.fixture(scope='module')
+def frames(raw_data):
+    return MorphRunnerRealtimeAnalytics().process_user_data(raw_data)
+
+
+@pytest.fixture(scope='module')
+def aggregates(frames):
+    return MorphRunnerRealtimeAnalytics().build_aggregates(*frames)
+
+
+def test_fetch_single_get(benchmark, stub, raw_data):
+    analytics = MorphRunnerRealtimeAnalytics(stub.url)
+    result = benchmark.pedantic(analytics.fetch_all_users_data, rounds=3)
+    assert len(result) == len(raw_data)
+
+
+def test_fetch_paged(benchmark, stub, raw_data):
+    analytics = MorphRunnerRealtimeAnalytics(stub.url)
+    result = benchmark.pedantic(lambda: analytics.process_user_data(analytics.fetch_users_pages(1000)), rounds=3)
+    assert len(result[0]) == len(raw_data)
+
+
+def test_fetch_concurrent(benchmark, stub, raw_data):
+    analytics = MorphRunnerRealtimeAnalytics(stub.url, pool_size=16)
+    result = benchmark.pedantic(analytics.fetch_users_concurrent, rounds=1)
+    assert len(result) == len(raw_data)
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'rows'])
+def test_process_user_data(benchmark, raw_data, engine):
+    analytics = MorphRunnerRealtimeAnalytics()
+    user_df, _, _, _ = benchmark(analytics.process_user_data, raw_data, engine=engine)
+    assert len(user_df) == len(raw_data)
+
+
+def test_build_aggregates(benchmark, frames):
+    analytics = MorphRunnerRealtimeAnalytics()
+    store = benchmark(analytics.build_aggregates, *frames)
+    assert store.player_count == len(frames[0])
+
+
+def test_print_summary_stats(benchmark, frames, aggregates):
+    analytics = MorphRunnerRealtimeAnalytics()
+
+    def summarize():
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            analytics.print_summary_stats(*frames, aggregates)
+        return out.getvalue()
+
+    assert 'LEADERBOARD' in benchmark(summarize)
+
+
+def test_create_complete_dashboard(benchmark, frames, aggregates):
+    analytics = MorphRunnerRealtimeAnalytics()
+    fig = benchmark(analytics.create_complete_dashboard, *frames, aggregates)
+    assert len(fig.data) > 0
@@ -0,0 +1,50 @@
+"""
+Cost of the time-windowed activity queries on a synthetic player base.
+
+Builds the session table once, then times a 90-day window slice, daily and
+30-day active players, weekly-cohort retention and the per-level health trend.
+
+Usage:
+    python benchmarks/benchmark_cohorts.py [--users 200000] [--days 90] [--skew 0.5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cohorts import build_player_activity
+from synthetic_data import REGISTRATION_END, generate_users
+
+
+def timed(label, run):
+    start = time.perf_counter()
+    result = run()
+    print(f"{label:<28} {time.perf_counter() - start:>9.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    raw_data = generate_users(args.users, seed=args.seed, skew=args.skew)
+    activity = timed('build session table', lambda: build_player_activity(raw_data))
+    del raw_data
+    print(f"{args.users} players, {len(activity.sessions)} session rows")
+
+    recent = timed(f'{args.days}-day window', lambda: activity.last_days(args.days, REGISTRATION_END))
+    timed('daily active players', recent.active_players)
+    timed('30-day active players', lambda: recent.active_players(30))
+    timed('weekly cohort retention', lambda: activity.retention(30, 'W'))
+    timed('daily cohort retention', lambda: activity.retention(30, 'D'))
+    timed('level health trend', lambda: recent.level_health_trend(window=7))
+
+
+if __name__ == '__main__':
+    main()
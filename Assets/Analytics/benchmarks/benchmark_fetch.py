@@ -0,0 +1,62 @@
+"""
+Wall-clock comparison of the fetch modes against the local Firebase stand-in.
+
+The stand-in adds a fixed per-request latency and a per-response throughput
+cap to mimic the round trip to, and single-stream download rate from, the
+Realtime Database, so the single GET, paged and concurrent modes can be compared.
+
+Usage:
+    python benchmarks/benchmark_fetch.py [--users 5000] [--latency 0.02] [--bandwidth 2e6] [--workers 16]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from firebase_stub import FirebaseStub
+from synthetic_data import generate_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 16, 32])
+    parser.add_argument('--bandwidth', type=float, default=2e6, help='per-response bytes/second cap')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    users = generate_users(args.users)
+    with FirebaseStub({'users': users}, latency=args.latency, failure_rate=args.failure_rate,
+                      bandwidth=args.bandwidth) as stub:
+        modes = [
+            ('single GET', lambda analytics: analytics.fetch_all_users_data()),
+            (f'paged ({args.page_size})', lambda analytics: analytics.process_user_data(
+                analytics.fetch_users_pages(args.page_size))),
+        ]
+        for workers in args.workers:
+            modes.append((f'concurrent ({workers})',
+                          lambda analytics, workers=workers: analytics.fetch_users_concurrent(workers)))
+
+        results = []
+        for name, fetch in modes:
+            analytics = MorphRunnerRealtimeAnalytics(stub.url, pool_size=max(args.workers), backoff_factor=0.01)
+            stub.request_count = 0
+            start = time.perf_counter()
+            fetch(analytics)
+            results.append((name, time.perf_counter() - start, stub.request_count))
+
+    print(f"\n{args.users} users, {args.latency * 1000:.0f} ms latency per request, "
+          f"{args.bandwidth / 1e6:.1f} MB/s per response")
+    print(f"{'mode':>18} | {'seconds':>8} | {'requests':>8}")
+    print('-' * 42)
+    for name, elapsed, requests_made in results:
+        print(f"{name:>18} | {elapsed:>8.2f} | {requests_made:>8}")
+
+
+if __name__ == '__main__':
+    main()
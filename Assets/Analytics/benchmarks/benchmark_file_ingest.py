@@ -0,0 +1,112 @@
+"""
+Parse time and peak memory of ingesting a users.json dump from disk.
+
+Writes synthetic dumps of the requested sizes (users are drawn from a pool of
+generated users and given fresh ids, so large files are quick to write), then
+measures, each in a fresh process:
+  parse    stream-parse every user with json_stream.iter_users_file
+  process  MorphRunnerRealtimeAnalytics.process_users_file (parse + flatten)
+  json     json.load of the whole file (only with --baseline; needs many times
+           the file size in RAM)
+
+Usage:
+    python benchmarks/benchmark_file_ingest.py [--sizes-gb 1 5] [--dir /tmp] [--baseline] [--keep]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import generate_users
+
+
+def write_dump(path, size_bytes, pool_size=10000, seed=0):
+    """Write a {user_id: user_data} dump of about `size_bytes` and return the user count"""
+    pool = [json.dumps(user_data, separators=(',', ':'))
+            for user_data in generate_users(pool_size, seed=seed).values()]
+    rng = random.Random(seed)
+    written = users = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{')
+        while written < size_bytes:
+            entry = f'{"," if users else ""}"{uuid.UUID(int=rng.getrandbits(128), version=4)}":{pool[users % pool_size]}'
+            f.write(entry)
+            written += len(entry)
+            users += 1
+        f.write('}')
+    return users
+
+
+def _run(mode, path, conn):
+    start = time.perf_counter()
+    if mode == 'parse':
+        from json_stream import iter_users_file
+        rows = sum(1 for _ in iter_users_file(path))
+    elif mode == 'process':
+        from analytics import MorphRunnerRealtimeAnalytics
+        rows = len(MorphRunnerRealtimeAnalytics().process_users_file(path)[0])
+    else:
+        with open(path, 'rb') as f:
+            rows = len(json.load(f))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    conn.send((rows, elapsed, peak))
+    conn.close()
+
+
+def measure(mode, path):
+    """Return (rows, seconds, peak_rss_bytes) of one mode run in a fresh process, or None if it died"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run, args=(mode, path, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-gb', type=float, nargs='+', default=[1, 5])
+    parser.add_argument('--dir', default=None, help='where to write the dumps (default: system temp dir)')
+    parser.add_argument('--baseline', action='store_true', help='also time json.load of the whole file')
+    parser.add_argument('--keep', action='store_true', help='keep the dump files')
+    args = parser.parse_args()
+
+    directory = args.dir or os.environ.get('TMPDIR', '/tmp')
+    modes = ['parse', 'process'] + (['json'] if args.baseline else [])
+
+    print(f"{'size':>8} | {'users':>9} | {'mode':>8} | {'seconds':>8} | {'MB/s':>7} | {'peak RSS':>9}")
+    print('-' * 66)
+    for size_gb in args.sizes_gb:
+        path = os.path.join(directory, f'morphrunner_users_{size_gb:g}gb.json')
+        users = write_dump(path, int(size_gb * 1024 ** 3))
+        file_mb = os.path.getsize(path) / 1024 ** 2
+        try:
+            for mode in modes:
+                result = measure(mode, path)
+                if result is None:
+                    print(f"{size_gb:>6g}GB | {users:>9} | {mode:>8} | failed (out of memory?)")
+                    continue
+                _, elapsed, peak = result
+                print(f"{size_gb:>6g}GB | {users:>9} | {mode:>8} | {elapsed:>8.1f} | {file_mb / elapsed:>7.1f} | "
+                      f"{peak / 1024 ** 2:>7.0f}MB")
+        finally:
+            if not args.keep:
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Allocation and timing comparison of the row-based and columnar processing engines.
+
+For each engine this reports wall time, the tracemalloc peak while flattening
+and the resident size of the four resulting DataFrames.
+
+Usage:
+    python benchmarks/benchmark_flattening.py [--users 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from synthetic_data import generate_users
+
+
+def measure(analytics, raw_data, engine):
+    """Return (seconds, peak_bytes, frame_bytes) for one engine"""
+    gc.collect()
+    start = time.perf_counter()
+    frames = analytics.process_user_data(raw_data, engine=engine)
+    elapsed = time.perf_counter() - start
+    del frames
+
+    gc.collect()
+    tracemalloc.start()
+    frames = analytics.process_user_data(raw_data, engine=engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frame_bytes = sum(int(df.memory_usage(deep=True).sum()) for df in frames)
+    return elapsed, peak, frame_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    raw_data = generate_users(args.users, seed=args.seed)
+
+    print(f"{args.users} synthetic users")
+    print(f"{'engine':>10} | {'seconds':>8} | {'peak MB':>8} | {'frames MB':>9}")
+    print('-' * 46)
+    results = {}
+    for engine in ('rows', 'columnar'):
+        results[engine] = measure(analytics, raw_data, engine)
+        elapsed, peak, frame_bytes = results[engine]
+        print(f"{engine:>10} | {elapsed:>8.2f} | {peak / 2**20:>8.1f} | {frame_bytes / 2**20:>9.1f}")
+
+    rows, columnar = results['rows'], results['columnar']
+    print(f"\ncolumnar vs rows: {rows[0] / columnar[0]:.2f}x faster, "
+          f"{rows[1] / columnar[1]:.2f}x lower peak, {rows[2] / columnar[2]:.2f}x smaller frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Cost of attributing mismatch positions to obstacle rows.
+
+Maps random y-positions to the nearest spawnY row of every level file with
+the sorted interval index (one binary search per position) and with a
+brute-force comparison against every row, checks that both agree, and times
+the hotspot table read from an aggregate store's y-position sketches.
+
+Usage:
+    python benchmarks/benchmark_hotspots.py [--positions 5000000] [--users 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from level_layouts import load_layouts, mismatch_hotspots
+from synthetic_data import generate_users
+
+
+def brute_force_rows(rows, y_positions, chunk=1 << 16):
+    """Nearest row by comparing every position with every row"""
+    result = np.empty(len(y_positions), dtype=np.intp)
+    for start in range(0, len(y_positions), chunk):
+        block = y_positions[start:start + chunk]
+        result[start:start + chunk] = np.abs(block[:, None] - rows[None, :]).argmin(axis=1)
+    return result
+
+
+def timed(run):
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--positions', type=int, default=5000000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    layouts = load_layouts()
+    y_positions = np.random.default_rng(args.seed).uniform(0.0, 110.0, args.positions).astype(np.float32)
+    print(f"{args.positions} positions per level")
+    print(f"{'level':>8} | {'rows':>5} | {'searchsorted':>12} | {'brute force':>11} | {'speedup':>8}")
+    print('-' * 58)
+    for level_name, layout in layouts.items():
+        indexed, indexed_seconds = timed(lambda: layout.nearest_rows(y_positions, max_distance=None))
+        brute, brute_seconds = timed(lambda: brute_force_rows(layout.rows, y_positions.astype(np.float64)))
+        # Positions exactly between two rows may go either way
+        ties = np.isin(y_positions, layout.boundaries)
+        assert np.array_equal(indexed[~ties], brute[~ties]), level_name
+        print(f"{level_name:>8} | {len(layout):>5} | {indexed_seconds:>11.3f}s | {brute_seconds:>10.3f}s | "
+              f"{brute_seconds / indexed_seconds:>7.1f}x")
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    aggregates = analytics.build_aggregates_from_users(generate_users(args.users, seed=args.seed))
+    hotspots, seconds = timed(lambda: mismatch_hotspots(aggregates, layouts))
+    print(f"hotspots of {aggregates.mismatch_count} logged mismatches from the sketches: {seconds * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
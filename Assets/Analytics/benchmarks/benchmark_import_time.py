@@ -0,0 +1,58 @@
+"""
+Startup cost of the analytics modules, measured with `python -X importtime`.
+
+Each target is imported in a fresh interpreter; the cumulative import time of
+the target module and of the heavy third-party packages it pulled in is
+reported, best of --repeat runs.
+
+Usage:
+    python benchmarks/benchmark_import_time.py [--repeat 5] [--modules cli analytics]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ANALYTICS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = ['numpy', 'pandas', 'plotly', 'pyarrow', 'requests']
+# What the dashboard needs on top of the CLI, for comparison
+FULL_STACK = 'import analytics, pandas, plotly.graph_objects, plotly.subplots'
+
+
+def import_times(statement):
+    """Return {module: cumulative microseconds} for the top-level imports of `statement`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ANALYTICS_DIR,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        # importtime prints nested imports indented; keep the outermost entry per module
+        times[name] = max(times.get(name, 0), int(cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=['cli', 'analytics'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    targets = [(module, f'import {module}') for module in args.modules] + [('full stack', FULL_STACK)]
+    print(f"{'target':>12} | {'total ms':>9} | " + ' | '.join(f'{name:>8}' for name in HEAVY_PACKAGES))
+    print('-' * (27 + 11 * len(HEAVY_PACKAGES)))
+    for label, statement in targets:
+        runs = [import_times(statement) for _ in range(args.repeat)]
+        best = min(runs, key=lambda times: sum(times.get(name, 0) for name in statement_modules(statement)))
+        total = sum(best.get(name, 0) for name in statement_modules(statement))
+        heavy = ' | '.join(f"{best[name] / 1000:>8.1f}" if name in best else f"{'-':>8}" for name in HEAVY_PACKAGES)
+        print(f"{label:>12} | {total / 1000:>9.1f} | {heavy}")
+
+
+def statement_modules(statement):
+    return [name.strip() for name in statement[len('import '):].split(',')]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Throughput and exactness of the three ways the game can write its counters.
+
+Replays the same synthetic events (deaths, correct matches and mismatches with
+y-positions) against a local IngestService with a fixed per-request latency:
+
+- read-modify-write: a GET then a PUT of the count plus one, per event (the
+  old ObstacleMismatchLogging.GetAndIncrement)
+- increment: one PUT of {".sv": {"increment": 1}} per event
+- batched: one multi-location PATCH per player and batch of events, with
+  server-side increments, as ObstacleMismatchLogging now sends
+
+A player's events overlap in flight like the logger's coroutines do, so
+read-modify-write loses increments. Each mode reports the counts it lost
+against the events sent. For the batched mode the benchmark also checks that
+MorphRunnerRealtimeAnalytics reads exact totals from the service and that a
+restarted service recovers the same tree from its event log.
+
+Usage:
+    python benchmarks/benchmark_ingest.py [--players 100] [--events 50] [--batch 20] [--latency 0.005] [--workers 16]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from ingest_service import IngestService
+from realtime_db import RealtimeDatabaseHandler
+from synthetic_data import LEVELS, make_push_id
+
+_local = threading.local()
+
+
+class DelayedHandler(RealtimeDatabaseHandler):
+
+    def _admit(self):
+        time.sleep(self.server.database.latency)
+        return super()._admit()
+
+
+class DelayedIngestService(IngestService):
+    """IngestService answering each request after `latency` seconds, like a remote database"""
+
+    handler_class = DelayedHandler
+
+    def __init__(self, log_path, latency, **options):
+        super().__init__(log_path, **options)
+        self.latency = latency
+
+EVENT_PATHS = {
+    'death': '{level}_death_times',
+    'match': 'match_stats/{level}/obstacle_match_count',
+    'mismatch': 'match_stats/{level}/obstacle_mismatch_count',
+}
+
+
+def make_events(players, events_per_player, seed=0):
+    """{user_id: [(counter path, y-position or None), ...]} and the expected count per (user_id, path)"""
+    rng = random.Random(seed)
+    events, expected = {}, Counter()
+    for player in range(players):
+        user_id = f'bench-{player:05d}'
+        events[user_id] = []
+        for _ in range(events_per_player):
+            kind = rng.choices(('death', 'match', 'mismatch'), weights=(1, 6, 2))[0]
+            path = EVENT_PATHS[kind].format(level=rng.choice(LEVELS))
+            y_position = round(rng.uniform(0.0, 110.0), 2) if kind == 'mismatch' else None
+            events[user_id].append((path, y_position))
+            expected[user_id, path] += 1
+    return events, expected
+
+
+def _session():
+    """One requests.Session per worker thread"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _append_position(url, user_id, path, y_position):
+    if y_position is None:
+        return 0
+    _session().post(f"{url}users/{user_id}/{path.rsplit('/', 1)[0]}/obstacle_mismatch_positions.json",
+                    json=y_position)
+    return 1
+
+
+def send_read_modify_write(url, user_id, path, y_position):
+    """Returns the number of requests made, like the other send functions"""
+    counter_url = f"{url}users/{user_id}/{path}.json"
+    current = _session().get(counter_url).json() or 0
+    _session().put(counter_url, json=current + 1)
+    return 2 + _append_position(url, user_id, path, y_position)
+
+
+def send_increment(url, user_id, path, y_position):
+    _session().put(f"{url}users/{user_id}/{path}.json", json={'.sv': {'increment': 1}})
+    return 1 + _append_position(url, user_id, path, y_position)
+
+
+def send_batch(url, user_id, batch, rng):
+    update = {}
+    for path, y_position in batch:
+        counter = update.setdefault(path, {'.sv': {'increment': 0}})
+        counter['.sv']['increment'] += 1
+        if y_position is not None:
+            update[f"{path.rsplit('/', 1)[0]}/obstacle_mismatch_positions/{make_push_id(rng)}"] = y_position
+    _session().patch(f"{url}users/{user_id}.json", json=update).raise_for_status()
+    return 1
+
+
+def lost_counts(service, expected):
+    lost = 0
+    for (user_id, path), count in expected.items():
+        stored = service.get(f'users/{user_id}/{path}')
+        lost += count - (stored if isinstance(stored, int) else 0)
+    return lost
+
+
+def run_mode(name, events, expected, args, directory):
+    """Replay `events` in one mode; returns (name, seconds, requests, lost counts, running service)"""
+    log_path = os.path.join(directory, f"{name.replace(' ', '_')}.jsonl")
+    service = DelayedIngestService(log_path, args.latency).start()
+    rng = random.Random(1)
+    tasks = []
+    if name == 'batched':
+        for user_id, player_events in events.items():
+            for start in range(0, len(player_events), args.batch):
+                batch = player_events[start:start + args.batch]
+                tasks.append(lambda user_id=user_id, batch=batch: send_batch(service.url, user_id, batch, rng))
+    else:
+        send = send_read_modify_write if name == 'read-modify-write' else send_increment
+        # A player's events are submitted back to back, so up to `workers` of them are in flight together
+        for user_id, player_events in events.items():
+            for event in player_events:
+                tasks.append(lambda user_id=user_id, event=event: send(service.url, user_id, *event))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        requests_made = sum(future.result() for future in [pool.submit(task) for task in tasks])
+    elapsed = time.perf_counter() - start
+    return name, elapsed, requests_made, lost_counts(service, expected), service
+
+
+def check_batched(service, expected, log_path):
+    """Exact totals through the analytics fetch path, and the same tree after recovery from the log"""
+    analytics = MorphRunnerRealtimeAnalytics(service.url)
+    user_df, level_df, _, _ = analytics.process_user_data(analytics.fetch_all_users_data())
+    sent = sum(count for (_, path), count in expected.items() if path.endswith('match_count'))
+    read = int(level_df['correct_matches'].sum() + level_df['mismatches'].sum())
+    print(f"analytics read {read} of {sent} logged matches and mismatches "
+          f"({'exact' if read == sent else 'MISMATCH'})")
+
+    tree = service.tree
+    service.stop()
+    start = time.perf_counter()
+    restarted = IngestService(log_path)
+    print(f"recovered {restarted.recovered_writes} logged writes in {time.perf_counter() - start:.2f} s, "
+          f"tree {'identical' if restarted.tree == tree else 'DIFFERENT'}")
+    restarted.checkpoint()
+    restarted.stop()
+    return read == sent and restarted.tree == tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--events', type=int, default=50, help='events per player')
+    parser.add_argument('--batch', type=int, default=20, help='events per PATCH in the batched mode')
+    parser.add_argument('--latency', type=float, default=0.005, help='per-request latency in seconds')
+    parser.add_argument('--workers', type=int, default=16, help='requests in flight')
+    args = parser.parse_args()
+
+    events, expected = make_events(args.players, args.events)
+    total_events = args.players * args.events
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('read-modify-write', 'increment', 'batched'):
+            results.append(run_mode(name, events, expected, args, directory))
+            if name != 'batched':
+                results[-1][-1].stop()
+
+        print(f"\n{total_events} events from {args.players} players, "
+              f"{args.latency * 1000:.0f} ms latency per request, {args.workers} requests in flight")
+        print(f"{'mode':>18} | {'seconds':>8} | {'requests':>8} | {'events/s':>9} | {'lost counts':>11}")
+        print('-' * 67)
+        for name, elapsed, requests_made, lost, _ in results:
+            print(f"{name:>18} | {elapsed:>8.2f} | {requests_made:>8} | {total_events / elapsed:>9.0f} | {lost:>11}")
+        print()
+        service = results[-1][-1]
+        check_batched(service, expected, service.log_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Leaderboard benchmark: re-ranking the whole player base vs. the Leaderboard index.
+
+For each size, applies a stream of single-player score updates and reads the
+top 10 after every update, once by calling heapq.nlargest over all players (what
+the dashboard did before) and once through the skip list Leaderboard.
+
+Usage:
+    python benchmarks/benchmark_leaderboard.py [--sizes 10000 100000] [--updates 2000]
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard
+
+
+def random_player(rng, user_id):
+    matches, mismatches = rng.randint(0, 120), rng.randint(0, 40)
+    attempts = matches + mismatches
+    return user_id, matches * 10 - mismatches * 10, matches / attempts if attempts else 0.0
+
+
+def run_rescan(players, updates, k):
+    start = time.perf_counter()
+    for user_id, score, accuracy in updates:
+        players[user_id] = (user_id, score, accuracy)
+        heapq.nlargest(k, players.values(), key=lambda player: (player[1], player[2]))
+    return time.perf_counter() - start
+
+
+def run_index(players, updates, k):
+    leaderboard = Leaderboard(seed=0)
+    start = time.perf_counter()
+    leaderboard.load((user_id, score, accuracy, None) for user_id, score, accuracy in players.values())
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for user_id, score, accuracy in updates:
+        leaderboard.update(user_id, score, accuracy)
+        leaderboard.top(k)
+    return load_time, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'players':>10} | {'rescan us/upd':>13} | {'index us/upd':>12} | {'index load s':>12} | {'speedup':>8}")
+    print('-' * 68)
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        players = {str(i): random_player(rng, str(i)) for i in range(size)}
+        updates = [random_player(rng, str(rng.randrange(size))) for _ in range(args.updates)]
+
+        rescan = run_rescan(dict(players), updates, args.top)
+        load_time, index = run_index(players, updates, args.top)
+        print(f"{size:>10} | {rescan / args.updates * 1e6:>13.1f} | {index / args.updates * 1e6:>12.1f} | "
+              f"{load_time:>12.3f} | {rescan / index:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Resident size of the analytics tables, default versus compact frames.
+
+Builds the four tables from the same synthetic users with the row engine,
+the columnar engine and the columnar engine in compact mode, and reports
+DataFrame.memory_usage(deep=True) per table plus the total with shared
+categories counted once. With --object-strings the string columns of the
+non-compact frames are converted to Python objects, which is how pandas
+releases before 3.0 store them.
+
+Usage:
+    python benchmarks/benchmark_memory.py [--users 100000] [--skew 0.5] [--object-strings]
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from columnar import frames_memory_usage
+from synthetic_data import generate_users
+
+TABLES = ('user_summaries', 'level_details', 'mismatch_positions', 'health_completions')
+
+
+def as_object_strings(frames):
+    """Copies of `frames` with string columns (and categories) held as Python objects"""
+    converted = []
+    for df in frames:
+        columns = {}
+        for column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.rename_categories(values.cat.categories.astype(object))
+            elif pd.api.types.is_string_dtype(values.dtype):
+                values = values.astype(object)
+            columns[column] = values
+        converted.append(pd.DataFrame(columns))
+    return converted
+
+
+def megabytes(count):
+    return f"{count / 1e6:>9.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--object-strings', action='store_true',
+                        help='hold the non-compact string columns as Python objects, as pandas < 3 does')
+    args = parser.parse_args()
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    raw_data = generate_users(args.users, seed=args.seed, skew=args.skew)
+    variants = {
+        'rows': analytics.process_user_data(raw_data, engine='rows'),
+        'columnar': analytics.process_user_data(raw_data),
+        'compact': analytics.process_user_data(raw_data, compact=True),
+    }
+    if args.object_strings:
+        variants['rows'] = as_object_strings(variants['rows'])
+        variants['columnar'] = as_object_strings(variants['columnar'])
+    del raw_data
+
+    print(f"{args.users} users, rows: " + ", ".join(f"{table} {len(df)}"
+                                                    for table, df in zip(TABLES, variants['compact'])))
+    print(f"{'MB':<22}" + "".join(f" | {name:>9}" for name in variants))
+    print('-' * (22 + 12 * len(variants)))
+    for index, table in enumerate(TABLES):
+        print(f"{table:<22}" + "".join(f" | {megabytes(frames[index].memory_usage(deep=True).sum())}"
+                                       for frames in variants.values()))
+    print(f"{'total (deep)':<22}" + "".join(
+        f" | {megabytes(sum(df.memory_usage(deep=True).sum() for df in frames))}" for frames in variants.values()))
+    print(f"{'total (shared once)':<22}" + "".join(f" | {megabytes(frames_memory_usage(frames))}"
+                                                   for frames in variants.values()))
+
+
+if __name__ == '__main__':
+    main()
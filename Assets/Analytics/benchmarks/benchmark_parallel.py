@@ -0,0 +1,81 @@
+"""
+Throughput of multi-process flattening on a synthetic users tree.
+
+Processes the same payload serially and with an increasing number of worker
+processes, either from the in-memory users dict or from JSON shard files
+written to a temporary directory, and reports users per second and the
+speedup over the serial run. Scaling is bounded by the number of cores.
+
+Usage:
+    python benchmarks/benchmark_parallel.py [--users 100000] [--workers 1 2 4 8] [--files 16]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from synthetic_data import generate_users
+
+
+def write_shards(raw_data, count, directory):
+    """Split `raw_data` into `count` JSON files and return their paths"""
+    items = list(raw_data.items())
+    step = -(-len(items) // count)
+    paths = []
+    for index, start in enumerate(range(0, len(items), step)):
+        path = os.path.join(directory, f'users_{index:04d}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(items[start:start + step]), f)
+        paths.append(path)
+    return paths
+
+
+def best_time(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--files', type=int, default=0,
+                        help='read from this many JSON shard files instead of the in-memory dict')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    raw_data = generate_users(args.users, seed=args.seed)
+    print(f"{args.users} users, {os.cpu_count()} CPUs, source: "
+          f"{f'{args.files} JSON files' if args.files else 'in-memory dict'}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.files:
+            paths = write_shards(raw_data, args.files, directory)
+            serial = best_time(lambda: analytics.process_export_files(paths, processes=1), args.repeat)
+        else:
+            serial = best_time(lambda: analytics.process_user_data(raw_data), args.repeat)
+
+        print(f"{'workers':>8} | {'seconds':>9} | {'users/s':>10} | {'speedup':>8}")
+        print('-' * 45)
+        print(f"{'serial':>8} | {serial:>9.3f} | {args.users / serial:>10.0f} | {1.0:>7.2f}x")
+        for workers in args.workers:
+            if args.files:
+                elapsed = best_time(lambda: analytics.process_export_files(paths, processes=workers), args.repeat)
+            else:
+                elapsed = best_time(lambda: analytics.process_user_data(raw_data, processes=workers), args.repeat)
+            print(f"{workers:>8} | {elapsed:>9.3f} | {args.users / elapsed:>10.0f} | {serial / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Scaling benchmark for MorphRunnerRealtimeAnalytics.process_user_data.
+
+Runs the processing stage on synthetic Firebase payloads of increasing size and
+reports the time per user, which should stay roughly flat if the stage scales
+linearly with the number of players.
+
+Usage:
+    python benchmarks/benchmark_processing.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from synthetic_data import generate_users
+
+
+def time_processing(analytics, raw_data, repeat):
+    """Return the best wall time over `repeat` runs of process_user_data"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analytics.process_user_data(raw_data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    baseline = None
+
+    print(f"{'users':>10} | {'seconds':>9} | {'us/user':>8} | {'vs smallest':>11}")
+    print('-' * 48)
+    for size in args.sizes:
+        raw_data = generate_users(size, seed=args.seed)
+        elapsed = time_processing(analytics, raw_data, args.repeat)
+        per_user = elapsed / size
+        if baseline is None:
+            baseline = per_user
+        print(f"{size:>10} | {elapsed:>9.3f} | {per_user * 1e6:>8.1f} | {per_user / baseline:>10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Cost of serving many dashboard viewers from the shared report service.
+
+Measures one generate_full_report run (what every viewer used to pay), then
+starts `cli.py serve` on a synthetic users.json in its own process and replays
+viewers against it in two phases:
+
+- cold: every viewer asks for the summary, leaderboard and dashboard before
+  the first report exists; single-flight makes them share one build
+- polling: each viewer requests one of the three documents every --interval
+  seconds for --duration seconds; requests are answered from memory, and the
+  number of builds follows the TTL rather than the number of viewers
+
+On a single core a load generator without a polling interval starves the
+report build of CPU, which measures the machine rather than the service.
+
+Build and request counts are read from the service's /status.json.
+
+Usage:
+    python benchmarks/benchmark_report_service.py [--users 20000] [--viewers 50] [--ttl 5] [--duration 20] [--interval 0.5]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ANALYTICS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ANALYTICS_DIR)
+
+from analytics import MorphRunnerRealtimeAnalytics
+from synthetic_data import generate_users
+
+PATHS = ['summary.json', 'leaderboard.json', 'dashboard.json']
+_local = threading.local()
+
+
+def _get(url):
+    """GET with one keep-alive session per viewer thread; returns (status, seconds)"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    start = time.perf_counter()
+    response = _local.session.get(url, headers={'Accept-Encoding': 'gzip'})
+    return response.status_code, time.perf_counter() - start
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_listening(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return requests.get(url + 'status.json').json()
+        except requests.ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--viewers', type=int, default=50)
+    parser.add_argument('--ttl', type=float, default=5.0)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of polling')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between a viewer\'s requests')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        users_file = os.path.join(directory, 'users.json')
+        with open(users_file, 'w') as f:
+            json.dump(generate_users(args.users, skew=0.5), f)
+
+        start = time.perf_counter()
+        MorphRunnerRealtimeAnalytics().generate_full_report(users_file=users_file,
+                                                            output_path=os.path.join(directory, 'report.json'))
+        full_report = time.perf_counter() - start
+
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}/"
+        server = subprocess.Popen([sys.executable, os.path.join(ANALYTICS_DIR, 'cli.py'), 'serve',
+                                   '--users-file', users_file, '--port', str(port), '--ttl', str(args.ttl)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_until_listening(url)
+            with ThreadPoolExecutor(args.viewers) as pool:
+                start = time.perf_counter()
+                cold = list(pool.map(_get, [url + path for path in PATHS] * args.viewers))
+                cold_seconds = time.perf_counter() - start
+                cold_status = requests.get(url + 'status.json').json()
+
+                deadline = time.perf_counter() + args.duration
+
+                def poll(viewer):
+                    results = []
+                    while time.perf_counter() < deadline:
+                        results.append(_get(url + PATHS[len(results) % len(PATHS)]))
+                        time.sleep(args.interval)
+                    return results
+
+                polled = [result for results in pool.map(poll, range(args.viewers)) for result in results]
+            status = requests.get(url + 'status.json').json()
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(seconds * 1000 for code, seconds in polled if code == 200)
+    print(f"\n{args.users} users, {args.viewers} viewers polling every {args.interval:g} s, TTL {args.ttl:g} s")
+    print(f"generate_full_report per viewer: {full_report:.2f} s each, "
+          f"{full_report * args.viewers:.1f} s of work for {args.viewers} viewers")
+    print(f"shared report build: {status['build_seconds']:.2f} s")
+    print(f"cold start: {len(cold)} requests in {cold_seconds:.2f} s, {cold_status['builds']} build, "
+          f"{cold_status['coalesced']} requests joined the build in flight, "
+          f"statuses {sorted(set(code for code, _ in cold))}")
+    print(f"polling: {len(polled)} requests in {args.duration:g} s ({len(polled) / args.duration:.0f}/s), "
+          f"{status['builds'] - cold_status['builds']} builds; "
+          f"latency p50 {statistics.median(latencies):.1f} ms, p99 {latencies[int(0.99 * len(latencies))]:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
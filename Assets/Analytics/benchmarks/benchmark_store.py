@@ -0,0 +1,75 @@
+"""
+Latency of analytics store lookups and SQL-pushdown aggregates.
+
+Upserts a synthetic player base into a SQLite analytics store, then times
+point lookups (summary, per-level stats, rank, username search), the top-10
+leaderboard, the aggregate store built with SQL aggregations, and for
+comparison the same aggregates built by loading DataFrames and by
+reprocessing the raw users.
+
+Usage:
+    python benchmarks/benchmark_store.py [--users 100000] [--lookups 1000] [--store path.db]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregate_store import AggregateStore
+from analytics import MorphRunnerRealtimeAnalytics
+from synthetic_data import generate_users
+
+
+def timed(label, run, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<34} {elapsed * 1000:>10.3f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--store', help='store file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    analytics = MorphRunnerRealtimeAnalytics()
+    raw_data = generate_users(args.users, seed=args.seed, skew=args.skew)
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.store or os.path.join(directory, 'store.db')
+        frames = timed('process users', lambda: analytics.process_user_data(raw_data))
+        timed('upsert into store', lambda: analytics.save_to_store(frames, path))
+        store = analytics.open_store(path)
+
+        rng = random.Random(args.seed)
+        user_ids = rng.sample(list(raw_data), min(args.lookups, len(raw_data)))
+        usernames = [raw_data[user_id]['username'] for user_id in user_ids]
+        lookups = iter(user_ids * 4)
+        names = iter(usernames)
+        print(f"per lookup, averaged over {len(user_ids)} players:")
+        timed('  player summary', lambda: store.player(next(lookups)), len(user_ids))
+        timed('  player per-level stats', lambda: store.player_levels(next(lookups)), len(user_ids))
+        timed('  player rank', lambda: store.player_rank(next(lookups)), len(user_ids))
+        timed('  player_stats (all of the above)', lambda: analytics.player_stats(path, next(lookups)),
+              len(user_ids))
+        timed('  username search', lambda: store.find_players(next(names)), len(user_ids))
+        timed('top 10 players', lambda: store.top_players(10), 10)
+
+        store_aggregates = timed('aggregates pushed down to SQL', store.aggregates)
+        frame_aggregates = timed('aggregates from DataFrames', lambda: AggregateStore.from_frames(*frames))
+        timed('aggregates from raw users', lambda: analytics.build_aggregates_from_users(raw_data))
+        assert store_aggregates.top_players(10) == frame_aggregates.top_players(10)
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Headless command line interface for Morph Runner analytics.
+
+`summary` and `leaderboard` only read aggregates and never load pandas or
+plotly; `activity`, `export`, `store`, `serve` and `dashboard` load them when they run.
+With --store, reports are computed by SQL queries on an analytics store
+written by `store`, and `player` looks players up in it. `serve` answers
+summary, leaderboard and dashboard requests over HTTP from one report that is
+rebuilt every --ttl seconds.
+
+Usage:
+    python cli.py summary [--users-file users.json]
+    python cli.py leaderboard --top 20 [--player USER_ID]
+    python cli.py store morphrunner.db [--users-file users.json]
+    python cli.py player morphrunner.db --id USER_ID --name Player42 [--prefix]
+    python cli.py summary --store morphrunner.db
+    python cli.py serve --port 8050 --ttl 60 [--store morphrunner.db]
+    python cli.py activity --days 90 --until 2026-01-31 --cohort W [--users-file users.json]
+    python cli.py export history/ [--format arrow]
+    python cli.py dashboard [--page-size 1000] [--processes 4] [--export history/]
+    python cli.py dashboard --output reports/today.html --plotlyjs directory
+    python cli.py -v dashboard --output report.json --metrics metrics.json [--trace-memory] [--profile run.prof]
+    python cli.py --url http://127.0.0.1:9100/ summary    # read from a local ingest_service.py
+"""
+import argparse
+import logging
+import sys
+import warnings
+
+from analytics import MorphRunnerRealtimeAnalytics
+
+DEFAULT_URL = "https://morphrunneranalytics3107-default-rtdb.firebaseio.com/"
+
+
+def _source_options(parser, store=True):
+    group = parser.add_argument_group('data source (default: one GET of users.json)')
+    if store:
+        group.add_argument('--store', help='report with SQL aggregations on an analytics store written by `store`')
+    group.add_argument('--users-file', help='stream users from a users.json dump on disk')
+    group.add_argument('--dataset', help='read an offline dataset written by `export`')
+    group.add_argument('--ingest-date', help='export of --dataset to read (default: latest)')
+    group.add_argument('--cache', help='refresh incrementally through this SQLite snapshot')
+    group.add_argument('--page-size', type=int, help='download users in pages of this size')
+    group.add_argument('--workers', type=int, help='download users with this many concurrent requests')
+
+
+def _source(args):
+    return dict(page_size=args.page_size, max_workers=args.workers, cache_path=args.cache,
+                dataset_path=args.dataset, ingest_date=args.ingest_date, users_file=args.users_file,
+                store_path=getattr(args, 'store', None))
+
+
+def _frames(analytics, args):
+    if args.users_file:
+        return analytics.process_users_file(args.users_file, compact=args.compact)
+    if args.dataset:
+        return analytics.load_dataset(args.dataset, args.ingest_date)
+    if args.cache:
+        return analytics.refresh_incremental(args.cache, args.workers)
+    if args.page_size:
+        return analytics.process_user_data(analytics.fetch_users_pages(args.page_size), compact=args.compact)
+    if args.workers:
+        raw_data = analytics.fetch_users_concurrent(args.workers)
+    else:
+        raw_data = analytics.fetch_all_users_data()
+    return analytics.process_user_data(raw_data, processes=args.processes, compact=args.compact)
+
+
+def run_summary(analytics, args):
+    aggregates = analytics.load_aggregates(**_source(args))
+    if not aggregates.player_count and not aggregates.levels:
+        print("❌ No player data found")
+        return 1
+    analytics.print_aggregate_summary(aggregates)
+    return 0
+
+
+def run_leaderboard(analytics, args):
+    # The store answers both from its leaderboard index, without aggregating
+    aggregates = analytics.open_store(args.store) if args.store else analytics.load_aggregates(**_source(args))
+    if not aggregates.player_count:
+        print("❌ No player data found")
+        return 1
+    analytics.print_leaderboard(aggregates, args.top)
+    for user_id in args.player or []:
+        rank = aggregates.player_rank(user_id)
+        print(f"   {user_id}: " + (f"rank {rank} of {aggregates.player_count}" if rank else "not ranked"))
+    return 0
+
+
+def run_activity(analytics, args):
+    activity = analytics.load_player_activity(args.page_size, args.workers, args.users_file)
+    if activity.sessions.empty:
+        print("❌ No player sessions found")
+        return 1
+    analytics.print_activity_summary(activity, args.days, args.cohort, until=args.until)
+    return 0
+
+
+def run_store(analytics, args):
+    frames = _frames(analytics, args)
+    if frames[0].empty and frames[3].empty:
+        print("❌ No player data found, nothing stored")
+        return 1
+    analytics.save_to_store(frames, args.path)
+    return 0
+
+
+def run_player(analytics, args):
+    if not (args.id or args.name):
+        print("❌ Pass --id and/or --name")
+        return 2
+    user_ids = list(args.id or [])
+    for name in args.name or []:
+        matches = analytics.find_players(args.path, name, args.prefix)
+        if not matches:
+            print(f"❌ No player named {name}{'*' if args.prefix else ''}")
+        user_ids.extend(player.user_id for player in matches)
+    player_count = analytics.open_store(args.path).player_count
+    found = 0
+    for user_id in dict.fromkeys(user_ids):
+        stats = analytics.player_stats(args.path, user_id)
+        if stats is None:
+            print(f"❌ Player {user_id} not found")
+            continue
+        analytics.print_player_stats(stats, player_count)
+        found += 1
+    return 0 if found else 1
+
+
+def run_export(analytics, args):
+    frames = _frames(analytics, args)
+    if frames[0].empty and frames[3].empty:
+        print("❌ No player data found, nothing exported")
+        return 1
+    analytics.export_dataset(frames, args.path, args.export_date, args.format)
+    return 0
+
+
+def run_dashboard(analytics, args):
+    include_plotlyjs = {'embed': True, 'cdn': 'cdn', 'directory': 'directory'}[args.plotlyjs]
+    analytics.generate_full_report(processes=args.processes, export_path=args.export, output_path=args.output,
+                                   include_plotlyjs=include_plotlyjs, metrics_path=args.metrics,
+                                   trace_memory=args.trace_memory, profile_path=args.profile, compact=args.compact,
+                                   **_source(args))
+    return 0
+
+
+def run_serve(analytics, args):
+    analytics.serve_reports(args.host, args.port, args.ttl, args.leaderboard_size, **_source(args))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=DEFAULT_URL, help='Firebase Realtime Database URL, or the URL of a '
+                                                           'local ingest_service.py')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log pipeline stage metrics')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    summary = commands.add_parser('summary', help='print the console summary')
+    _source_options(summary)
+    summary.set_defaults(run=run_summary, processes=None)
+
+    leaderboard = commands.add_parser('leaderboard', help='print the top players')
+    _source_options(leaderboard)
+    leaderboard.add_argument('--top', type=int, default=10, help='number of players to list')
+    leaderboard.add_argument('--player', action='append', help='also print this user id\'s rank (repeatable)')
+    leaderboard.set_defaults(run=run_leaderboard, processes=None)
+
+    activity = commands.add_parser('activity', help='print active players, cohort retention and level trends')
+    group = activity.add_argument_group('data source (default: one GET of users.json)')
+    group.add_argument('--users-file', help='stream users from a users.json dump on disk')
+    group.add_argument('--page-size', type=int, help='download users in pages of this size')
+    group.add_argument('--workers', type=int, help='download users with this many concurrent requests')
+    activity.add_argument('--days', type=int, default=90, help='days up to the latest session to report on')
+    activity.add_argument('--until', help='last day to report on, YYYY-MM-DD (default: day of the latest session)')
+    activity.add_argument('--cohort', choices=('D', 'W', 'M'), default='W',
+                          help='registration cohort granularity: day, week or month')
+    activity.set_defaults(run=run_activity)
+
+    store = commands.add_parser('store', help='upsert the processed tables into a queryable analytics store')
+    store.add_argument('path', help='SQLite store file, created on first use')
+    _source_options(store, store=False)
+    store.add_argument('--processes', type=int, help='flatten users on this many worker processes')
+    store.add_argument('--compact', action='store_true', help='process into compact tables before storing')
+    store.set_defaults(run=run_store)
+
+    player = commands.add_parser('player', help='look players up in an analytics store')
+    player.add_argument('path', help='SQLite store file written by `store`')
+    player.add_argument('--id', action='append', help='user id to show (repeatable)')
+    player.add_argument('--name', action='append', help='username to show (repeatable)')
+    player.add_argument('--prefix', action='store_true', help='match --name as a username prefix')
+    player.set_defaults(run=run_player)
+
+    serve = commands.add_parser('serve', help='serve the summary, leaderboard and dashboard JSON over HTTP '
+                                              'from a shared, periodically refreshed report')
+    _source_options(serve)
+    serve.add_argument('--host', default='127.0.0.1', help='interface to bind')
+    serve.add_argument('--port', type=int, default=8050)
+    serve.add_argument('--ttl', type=float, default=60.0, help='seconds between report refreshes')
+    serve.add_argument('--leaderboard-size', type=int, default=100, help='best players kept for /leaderboard.json')
+    serve.set_defaults(run=run_serve)
+
+    export = commands.add_parser('export', help='save the processed tables to an offline dataset')
+    export.add_argument('path', help='dataset directory')
+    _source_options(export, store=False)
+    export.add_argument('--format', choices=('parquet', 'arrow'), default='parquet')
+    export.add_argument('--export-date', help='ingest date partition to write (default: today)')
+    export.add_argument('--processes', type=int, help='flatten users on this many worker processes')
+    export.add_argument('--compact', action='store_true', help='build compact tables (32-bit numbers, shared '
+                                                               'categories, no health_percentage column)')
+    export.set_defaults(run=run_export)
+
+    dashboard = commands.add_parser('dashboard', help='build the full dashboard and open it in a browser, '
+                                                      'or write it to --output')
+    _source_options(dashboard)
+    dashboard.add_argument('--processes', type=int, help='flatten users on this many worker processes')
+    dashboard.add_argument('--compact', action='store_true', help='build compact tables (32-bit numbers, shared '
+                                                                  'categories, no health_percentage column)')
+    dashboard.add_argument('--export', help='also save the processed tables to this offline dataset')
+    dashboard.add_argument('--output', help='write the dashboard to this .html or .json file instead of '
+                                            'opening a browser')
+    dashboard.add_argument('--plotlyjs', choices=('embed', 'cdn', 'directory'), default='embed',
+                           help='how HTML output loads plotly.js; `directory` shares one plotly.min.js '
+                                'between all reports in the output directory')
+    dashboard.add_argument('--metrics', help='write per-stage timing and memory metrics to this JSON file')
+    dashboard.add_argument('--trace-memory', action='store_true',
+                           help='record each stage\'s peak Python allocation with tracemalloc (slower)')
+    dashboard.add_argument('--profile', help='cProfile the run and dump the stats to this file')
+    dashboard.set_defaults(run=run_dashboard)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    warnings.filterwarnings('ignore')
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    analytics = MorphRunnerRealtimeAnalytics(args.url, timeout=args.timeout)
+    return args.run(analytics, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Time-indexed player activity: sessions, daily actives, retention and trends.
+
+The Unity logger writes one `health_progression/<yyyyMMdd_HHmmss>` node per
+play session ({level1..level4: health}) and the latest health per level under
+`current_level_health`. build_player_activity flattens those nodes with the
+players' registration times into typed columns in one pass, parses every
+timestamp in a single vectorized call and sorts the sessions by time once.
+PlayerActivity answers window, active-player, retention and trend queries
+with searchsorted slicing, numpy difference arrays and pandas resampling
+instead of per-player loops.
+
+Session keys come from the device clock (DateTime.Now) while registration
+times are UTC; both are kept as naive datetimes.
+"""
+from array import array
+
+import numpy as np
+import pandas as pd
+
+SESSION_FORMAT = '%Y%m%d_%H%M%S'
+REGISTRATION_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+PROGRESSION_LEVELS = {'level1': 'Level1', 'level2': 'Level2', 'level3': 'Level3', 'level4': 'Level4'}
+
+
+class PlayerActivity:
+    """
+    Players and their sessions, sorted by session time
+
+    Attributes:
+        players (DataFrame): user_id, username, registered_at, cohort_day
+            (registration date floored to the day), one row per player
+        sessions (DataFrame): user_code (row of `players`), session_time,
+            level_name, health; sorted by session_time
+        current_health (DataFrame): user_code, level_name, health from
+            `current_level_health`
+    """
+
+    def __init__(self, players, sessions, current_health):
+        self.players = players
+        self.sessions = sessions
+        self.current_health = current_health
+        self._times = sessions['session_time'].to_numpy()
+
+    def window(self, start=None, end=None):
+        """
+        Sessions with start <= session_time < end, sliced from the sorted index
+
+        Returns:
+            PlayerActivity: Same players, sessions restricted to the window
+        """
+        lo = 0 if start is None else np.searchsorted(self._times, np.datetime64(pd.Timestamp(start)), 'left')
+        hi = len(self._times) if end is None else np.searchsorted(self._times, np.datetime64(pd.Timestamp(end)),
+                                                                 'left')
+        return PlayerActivity(self.players, self.sessions.iloc[lo:hi], self.current_health)
+
+    def last_days(self, days, until=None):
+        """
+        Sessions of the `days` calendar days up to and including `until`
+
+        Args:
+            days (int): Window length in days
+            until (str or datetime): Last day of the window, defaults to the
+                day of the latest session
+
+        Returns:
+            PlayerActivity: Same players, sessions restricted to the window
+        """
+        if until is None:
+            if not len(self._times):
+                return self
+            until = self._times[-1]
+        end = pd.Timestamp(until).normalize() + pd.Timedelta(days=1)
+        return self.window(end - pd.Timedelta(days=days), end)
+
+    def _active_days(self):
+        """Unique (user_code, day) pairs, sorted by user and day"""
+        codes = self.sessions['user_code'].to_numpy(np.int64)
+        days = self._times.astype('datetime64[D]').astype(np.int64)
+        pairs = np.unique(codes << 32 | (days - days.min() if len(days) else days))
+        base = days.min() if len(days) else 0
+        return pairs >> 32, (pairs & 0xFFFFFFFF) + base
+
+    def active_players(self, window=1):
+        """
+        Distinct players with a session in the trailing `window` days, per day
+
+        window=1 gives daily active players, 7 weekly and 30 monthly actives.
+        Each (player, day) pair covers the days up to the player's next active
+        day or `window` days, whichever is sooner, so coverage never overlaps
+        and a cumulative sum of +1/-1 markers counts distinct players.
+
+        Returns:
+            Series: Active players indexed by day
+        """
+        if self.sessions.empty:
+            return pd.Series(dtype='int64', name='active_players')
+        codes, days = self._active_days()
+        stop = days + window
+        same_player_next = np.r_[codes[1:] == codes[:-1], False]
+        next_day = np.r_[days[1:], 0]
+        stop = np.where(same_player_next, np.minimum(stop, next_day), stop)
+
+        first, last = days.min(), days.max()
+        length = last - first + window + 1
+        delta = np.bincount(days - first, minlength=length) - np.bincount(stop - first, minlength=length)
+        counts = np.cumsum(delta)[:last - first + 1]
+        index = pd.DatetimeIndex((np.arange(first, last + 1)).astype('datetime64[D]'), name='day')
+        return pd.Series(counts, index=index, name='active_players')
+
+    def retention(self, max_day=30, cohort_freq='D', until=None):
+        """
+        Share of each registration cohort active N days after registering
+
+        Only players whose registration day + N is on or before the end of
+        observation count towards day N, so cohorts that have not reached
+        day N yet read NaN ("not yet known") rather than 0.
+
+        Args:
+            max_day (int): Last day offset reported
+            cohort_freq (str): Cohort granularity, 'D' for registration day,
+                'W' for week, 'M' for month
+            until (str or datetime): Last observed day, defaults to the day of
+                the latest session; later sessions are ignored
+
+        Returns:
+            DataFrame: One row per cohort, a `players` column with the cohort
+                size and columns 0..max_day with retention fractions, NaN
+                where no player of the cohort has reached that day
+        """
+        players = self.players
+        registered = players['cohort_day'].to_numpy()
+        cohorts = pd.PeriodIndex(players['cohort_day'], freq=cohort_freq).to_timestamp()
+        cohort_sizes = pd.Series(1, index=cohorts).groupby(level=0).sum()
+
+        if until is not None:
+            end = pd.Timestamp(until).normalize()
+        elif len(self._times):
+            end = pd.Timestamp(self._times[-1]).normalize()
+        else:
+            end = players['cohort_day'].max()
+        end_day = np.datetime64(end, 'D').astype(np.int64) if pd.notna(end) else 0
+        registered_days = registered.astype('datetime64[D]').astype(np.int64)
+
+        codes, days = self._active_days()
+        offsets = days - registered_days[codes]
+        keep = (offsets >= 0) & (offsets <= max_day) & (days <= end_day) & ~np.isnat(registered[codes])
+        counts = pd.crosstab(cohorts[codes[keep]], offsets[keep])
+        counts = counts.reindex(index=cohort_sizes.index, columns=range(max_day + 1), fill_value=0)
+        counts.columns.name = None
+
+        # Players of each cohort observed for at least N days: count the days
+        # each player was observed, then sum from the right
+        observed = end_day - registered_days
+        valid = ~np.isnat(registered) & (observed >= 0)
+        eligible = np.zeros((len(cohort_sizes), max_day + 1), dtype=np.int64)
+        np.add.at(eligible, (cohort_sizes.index.get_indexer(cohorts[valid]), np.minimum(observed[valid], max_day)), 1)
+        eligible = np.cumsum(eligible[:, ::-1], axis=1)[:, ::-1]
+
+        table = counts / np.where(eligible > 0, eligible, np.nan)
+        table.insert(0, 'players', cohort_sizes)
+        table.index.name = 'cohort'
+        return table
+
+    def level_health_trend(self, freq='D', window=7, include_zero=False):
+        """
+        Mean session health per level over time, smoothed over a trailing window
+
+        Falling health on a level over time means players find it harder.
+
+        Args:
+            freq (str): Resampling period
+            window (int): Trailing periods in the rolling mean (weighted by
+                the number of sessions in each period)
+            include_zero (bool): Count 0.0 health entries, which the game also
+                writes for levels that were not reached
+
+        Returns:
+            DataFrame: Periods as rows, levels as columns
+        """
+        sessions = self.sessions
+        if not include_zero:
+            sessions = sessions[sessions['health'] > 0]
+        if sessions.empty:
+            return pd.DataFrame()
+        grouped = sessions.groupby([pd.Grouper(key='session_time', freq=freq), 'level_name'], observed=True)['health']
+        sums = grouped.sum().unstack('level_name').asfreq(freq, fill_value=0).fillna(0)
+        counts = grouped.size().unstack('level_name').asfreq(freq, fill_value=0).fillna(0)
+        trend = sums.rolling(window, min_periods=1).sum() / counts.rolling(window, min_periods=1).sum()
+        trend.index.name = 'period'
+        return trend
+
+    def current_health_by_level(self):
+        """Mean of the players' latest health per level (`current_level_health`)"""
+        return self.current_health.groupby('level_name', observed=True)['health'].mean()
+
+
+def build_player_activity(raw_data):
+    """
+    Flatten registration times, health_progression and current_level_health
+
+    Args:
+        raw_data (dict or iterable): Raw users tree, or an iterable of
+            {user_id: user_data} pages
+
+    Returns:
+        PlayerActivity: Players and their time-sorted sessions
+    """
+    user_ids, usernames, registrations = [], [], []
+    session_users, session_keys, session_levels = array('i'), [], array('b')
+    session_health = array('f')
+    current_users, current_levels, current_values = array('i'), [], array('f')
+    level_names = list(PROGRESSION_LEVELS.values())
+    level_codes = {key: code for code, key in enumerate(PROGRESSION_LEVELS)}
+
+    for page in [raw_data] if isinstance(raw_data, dict) else raw_data:
+        for user_id, user_data in page.items():
+            if not isinstance(user_data, dict):
+                continue
+            code = len(user_ids)
+            user_ids.append(user_id)
+            usernames.append(user_data.get('username', f'Player_{user_id[:8]}'))
+            registration = user_data.get('registration_time')
+            registrations.append(registration if isinstance(registration, str) else None)
+
+            progression = user_data.get('health_progression')
+            if isinstance(progression, dict):
+                for session_key, values in progression.items():
+                    if not isinstance(values, dict):
+                        continue
+                    for key, health in values.items():
+                        level = level_codes.get(key)
+                        if level is not None and isinstance(health, (int, float)):
+                            session_users.append(code)
+                            session_keys.append(session_key)
+                            session_levels.append(level)
+                            session_health.append(health)
+
+            current = user_data.get('current_level_health')
+            if isinstance(current, dict):
+                for level_name, health in current.items():
+                    if isinstance(health, (int, float)):
+                        current_users.append(code)
+                        current_levels.append(level_name)
+                        current_values.append(health)
+
+    registered_at = pd.to_datetime(pd.Series(registrations, dtype=object), format=REGISTRATION_FORMAT,
+                                   errors='coerce')
+    players = pd.DataFrame({
+        'user_id': user_ids,
+        'username': usernames,
+        'registered_at': registered_at,
+        'cohort_day': registered_at.dt.normalize(),
+    })
+
+    session_time = pd.to_datetime(pd.Series(session_keys, dtype=object), format=SESSION_FORMAT, errors='coerce')
+    sessions = pd.DataFrame({
+        'user_code': np.frombuffer(session_users, dtype=np.int32),
+        'session_time': session_time,
+        'level_name': pd.Categorical.from_codes(np.frombuffer(session_levels, dtype=np.int8), categories=level_names),
+        'health': np.frombuffer(session_health, dtype=np.float32),
+    })
+    sessions = sessions[sessions['session_time'].notna()].sort_values('session_time', kind='stable')
+    sessions = sessions.reset_index(drop=True)
+
+    current_health = pd.DataFrame({
+        'user_code': np.frombuffer(current_users, dtype=np.int32),
+        'level_name': pd.Categorical(current_levels),
+        'health': np.frombuffer(current_values, dtype=np.float32),
+    })
+    return PlayerActivity(players, sessions, current_health)
@@ -0,0 +1,447 @@
+"""
+Columnar flattening engine for the Firebase `users` tree.
+
+Each user subtree is flattened once into a small UserRecord, and the records are
+written straight into typed column buffers instead of one dict per row.
+pandas is only imported when the buffers are materialized, so parse_user can
+be used by the console reports without loading it.
+
+In compact mode the four tables share one categorical dtype per key column,
+numeric columns are downcast to 32 bits, unique strings are stored as Arrow
+strings when pyarrow is installed, and `health_percentage` is left out; use
+health_percentage() to derive it.
+"""
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+UserRecord = namedtuple('UserRecord', [
+    'user_id',
+    'username',
+    'registration_time',
+    'levels',       # [(level_name, deaths, correct_matches, mismatches), ...]
+    'mismatches',   # [(level_name, [position_id, ...], array('f', y_positions)), ...]
+    'health',       # [(level_name, array('d', health_remaining), completion_count), ...]
+])
+
+
+def _numeric_items(values_by_key, typecode):
+    """
+    Split a Firebase push-id map into (keys, typed values), dropping
+    non-numeric entries. The common all-numeric case is converted in C.
+    """
+    try:
+        return list(values_by_key), array(typecode, values_by_key.values())
+    except TypeError:
+        numeric = [(key, value) for key, value in values_by_key.items() if isinstance(value, (int, float))]
+        return [key for key, _ in numeric], array(typecode, [value for _, value in numeric])
+
+
+def parse_user(user_id, user_data):
+    """
+    Flatten one Firebase user subtree
+
+    Args:
+        user_id (str): Firebase key of the user
+        user_data (dict): The user's subtree
+
+    Returns:
+        UserRecord: Flattened user, or None if the subtree is not a dict
+    """
+    if not isinstance(user_data, dict):
+        return None
+
+    username = user_data.get('username', f'Player_{user_id[:8]}')
+    registration_time = user_data.get('registration_time', 'Unknown')
+
+    death_data = {}
+    for key, value in user_data.items():
+        if key.endswith('_death_times') and isinstance(value, (int, float)):
+            death_data[key[:-len('_death_times')]] = value
+
+    health = []
+    completion_stats = user_data.get('completion_stats', {})
+    for level_name, completion_data in completion_stats.items():
+        if isinstance(completion_data, dict):
+            completion_count = completion_data.get('completion_count', 0)
+            health_values = completion_data.get('health_remaining_values', {})
+            if isinstance(health_values, dict) and health_values:
+                _, values = _numeric_items(health_values, 'd')
+                if values:
+                    health.append((level_name, values, completion_count))
+
+    levels = []
+    mismatches = []
+    match_stats = user_data.get('match_stats', {})
+    for level_name, level_stats in match_stats.items():
+        if isinstance(level_stats, dict):
+            levels.append((level_name,
+                           death_data.get(level_name, 0),
+                           level_stats.get('obstacle_match_count', 0),
+                           level_stats.get('obstacle_mismatch_count', 0)))
+            positions = level_stats.get('obstacle_mismatch_positions', {})
+            if isinstance(positions, dict) and positions:
+                pos_ids, y_positions = _numeric_items(positions, 'f')
+                if y_positions:
+                    mismatches.append((level_name, pos_ids, y_positions))
+
+    return UserRecord(user_id, username, registration_time, levels, mismatches, health)
+
+
+class _Dictionary:
+    """Assigns dense integer codes to repeated strings"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+
+class ColumnarBuilder:
+    """
+    Accumulates UserRecords into typed column buffers and materializes the
+    four analytics DataFrames.
+
+    `user_id`, `username` and `level_name` are dictionary encoded and become
+    pandas categoricals; mismatch positions are stored as float32. Detail rows
+    only store the user and level codes, usernames are looked up per user.
+    """
+
+    def __init__(self):
+        self.user_ids = _Dictionary()
+        self.usernames = _Dictionary()
+        self.level_names = _Dictionary()
+        self.username_codes = array('i')  # indexed by user code
+
+        self.summary_ids = []
+        self.summary_usernames = []
+        self.summary_registration = []
+        self.summary_counts = array('q')  # 6 values per summarized user
+        self.summary_accuracy = array('d')
+
+        self.level_users = array('i')
+        self.level_levels = array('i')
+        self.level_counts = array('q')  # deaths, correct, mismatches, attempts
+        self.level_accuracy = array('d')
+
+        self.mismatch_users = array('i')
+        self.mismatch_levels = array('i')
+        self.mismatch_y = array('f')
+        self.mismatch_ids = []
+
+        self.health_users = array('i')
+        self.health_levels = array('i')
+        self.health_values = array('d')
+        self.health_counts = array('q')
+
+    def add(self, record):
+        """Append one UserRecord to the column buffers"""
+        if record is None:
+            return
+        user_code = self.user_ids.encode(record.user_id)
+        if user_code == len(self.username_codes):
+            self.username_codes.append(self.usernames.encode(record.username))
+        level_code = self.level_names.encode
+
+        for level_name, values, completion_count in record.health:
+            count = len(values)
+            self.health_users.extend(array('i', [user_code]) * count)
+            self.health_levels.extend(array('i', [level_code(level_name)]) * count)
+            self.health_values.extend(values)
+            self.health_counts.extend(array('q', [int(completion_count)]) * count)
+
+        for level_name, pos_ids, y_positions in record.mismatches:
+            count = len(y_positions)
+            self.mismatch_users.extend(array('i', [user_code]) * count)
+            self.mismatch_levels.extend(array('i', [level_code(level_name)]) * count)
+            self.mismatch_y.extend(y_positions)
+            self.mismatch_ids.extend(pos_ids)
+
+        if not record.levels:
+            return
+
+        total_deaths = total_matches = total_mismatches = 0
+        level_users = self.level_users.append
+        level_levels = self.level_levels.append
+        level_counts = self.level_counts.extend
+        level_accuracy = self.level_accuracy.append
+        for level_name, deaths, match_count, mismatch_count in record.levels:
+            deaths, match_count, mismatch_count = int(deaths), int(match_count), int(mismatch_count)
+            attempts = match_count + mismatch_count
+            level_users(user_code)
+            level_levels(level_code(level_name))
+            level_counts((deaths, match_count, mismatch_count, attempts))
+            level_accuracy(match_count / attempts if attempts > 0 else 0.0)
+            total_deaths += deaths
+            total_matches += match_count
+            total_mismatches += mismatch_count
+
+        total_attempts = total_matches + total_mismatches
+        self.summary_ids.append(record.user_id)
+        self.summary_usernames.append(record.username)
+        self.summary_registration.append(record.registration_time)
+        self.summary_counts.extend((total_deaths, total_matches, total_mismatches, total_attempts,
+                                    len(record.levels), total_matches * 10 - total_mismatches * 10))
+        self.summary_accuracy.append(total_matches / total_attempts if total_attempts > 0 else 0.0)
+
+    def merge(self, other):
+        """
+        Append the buffers of another builder, e.g. one filled in a worker process
+
+        The other builder's user and level codes are remapped onto this
+        builder's dictionaries; a user already present keeps its username.
+        """
+        user_map = np.empty(len(other.user_ids.values), dtype=np.int32)
+        for code, (user_id, name_code) in enumerate(zip(other.user_ids.values, other.username_codes)):
+            user_map[code] = self.user_ids.encode(user_id)
+            if user_map[code] == len(self.username_codes):
+                self.username_codes.append(self.usernames.encode(other.usernames.values[name_code]))
+        level_map = np.array([self.level_names.encode(name) for name in other.level_names.values],
+                             dtype=np.int32)
+
+        def remap(codes, mapping):
+            return array('i', mapping[np.frombuffer(codes, dtype=np.int32)].tobytes())
+
+        self.summary_ids.extend(other.summary_ids)
+        self.summary_usernames.extend(other.summary_usernames)
+        self.summary_registration.extend(other.summary_registration)
+        self.summary_counts.extend(other.summary_counts)
+        self.summary_accuracy.extend(other.summary_accuracy)
+
+        self.level_users.extend(remap(other.level_users, user_map))
+        self.level_levels.extend(remap(other.level_levels, level_map))
+        self.level_counts.extend(other.level_counts)
+        self.level_accuracy.extend(other.level_accuracy)
+
+        self.mismatch_users.extend(remap(other.mismatch_users, user_map))
+        self.mismatch_levels.extend(remap(other.mismatch_levels, level_map))
+        self.mismatch_y.extend(other.mismatch_y)
+        self.mismatch_ids.extend(other.mismatch_ids)
+
+        self.health_users.extend(remap(other.health_users, user_map))
+        self.health_levels.extend(remap(other.health_levels, level_map))
+        self.health_values.extend(other.health_values)
+        self.health_counts.extend(other.health_counts)
+        return self
+
+    def _keys(self, user_codes, level_codes, dtypes=None):
+        import pandas as pd
+
+        user_codes = np.frombuffer(user_codes, dtype=np.int32)
+        name_codes = np.frombuffer(self.username_codes, dtype=np.int32)[user_codes]
+        level_codes = np.frombuffer(level_codes, dtype=np.int32)
+        if dtypes is not None:
+            return {
+                'user_id': pd.Categorical.from_codes(user_codes, dtype=dtypes['user_id']),
+                'username': pd.Categorical.from_codes(name_codes, dtype=dtypes['username']),
+                'level_name': pd.Categorical.from_codes(level_codes, dtype=dtypes['level_name']),
+            }
+        return {
+            'user_id': pd.Categorical.from_codes(user_codes, categories=self.user_ids.values),
+            'username': pd.Categorical.from_codes(name_codes, categories=self.usernames.values),
+            'level_name': pd.Categorical.from_codes(level_codes, categories=self.level_names.values),
+        }
+
+    def _shared_dtypes(self):
+        """One CategoricalDtype per key column, shared by the four compact tables"""
+        import pandas as pd
+
+        return {column: pd.CategoricalDtype(pd.Index(dictionary.values, dtype=_string_dtype()))
+                for column, dictionary in (('user_id', self.user_ids), ('username', self.usernames),
+                                           ('level_name', self.level_names))}
+
+    def to_frames(self, compact=False):
+        """
+        Materialize the column buffers
+
+        Args:
+            compact (bool): Share the categorical dtypes between tables, store
+                counts as int32 and accuracy, health and positions as float32,
+                and leave out the derived `health_percentage` column
+
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        if compact:
+            return self._to_compact_frames()
+
+        import pandas as pd
+
+        summary_counts = np.frombuffer(self.summary_counts, dtype=np.int64).reshape(-1, 6)
+        user_df = pd.DataFrame({
+            'user_id': self.summary_ids,
+            'username': self.summary_usernames,
+            'registration_time': self.summary_registration,
+            'total_deaths': summary_counts[:, 0],
+            'total_correct_matches': summary_counts[:, 1],
+            'total_mismatches': summary_counts[:, 2],
+            'total_attempts': summary_counts[:, 3],
+            'overall_accuracy': np.frombuffer(self.summary_accuracy, dtype=np.float64),
+            'levels_played': summary_counts[:, 4],
+            'score': summary_counts[:, 5],
+        })
+
+        level_counts = np.frombuffer(self.level_counts, dtype=np.int64).reshape(-1, 4)
+        level_df = pd.DataFrame({
+            **self._keys(self.level_users, self.level_levels),
+            'deaths': level_counts[:, 0],
+            'correct_matches': level_counts[:, 1],
+            'mismatches': level_counts[:, 2],
+            'total_attempts': level_counts[:, 3],
+            'accuracy': np.frombuffer(self.level_accuracy, dtype=np.float64),
+        })
+
+        mismatch_df = pd.DataFrame({
+            **self._keys(self.mismatch_users, self.mismatch_levels),
+            'y_position': np.frombuffer(self.mismatch_y, dtype=np.float32),
+            'position_id': self.mismatch_ids,
+        })
+
+        health_values = np.frombuffer(self.health_values, dtype=np.float64)
+        health_df = pd.DataFrame({
+            **self._keys(self.health_users, self.health_levels),
+            'health_remaining': health_values,
+            # Convert to percentage (assuming max health is 100)
+            'health_percentage': health_values / 100.0 * 100,
+            'completion_count': np.frombuffer(self.health_counts, dtype=np.int64),
+        })
+
+        return user_df, level_df, mismatch_df, health_df
+
+    def _to_compact_frames(self):
+        import pandas as pd
+
+        dtypes = self._shared_dtypes()
+        strings = _string_dtype()
+        summary_counts = np.frombuffer(self.summary_counts, dtype=np.int64).reshape(-1, 6).astype(np.int32)
+        summary_codes = np.fromiter(map(self.user_ids.codes.__getitem__, self.summary_ids), dtype=np.int32,
+                                    count=len(self.summary_ids))
+        name_codes = np.frombuffer(self.username_codes, dtype=np.int32)[summary_codes]
+        user_df = pd.DataFrame({
+            'user_id': pd.Categorical.from_codes(summary_codes, dtype=dtypes['user_id']),
+            'username': pd.Categorical.from_codes(name_codes, dtype=dtypes['username']),
+            'registration_time': pd.array(self.summary_registration, dtype=strings),
+            'total_deaths': summary_counts[:, 0],
+            'total_correct_matches': summary_counts[:, 1],
+            'total_mismatches': summary_counts[:, 2],
+            'total_attempts': summary_counts[:, 3],
+            'overall_accuracy': np.frombuffer(self.summary_accuracy, dtype=np.float64).astype(np.float32),
+            'levels_played': summary_counts[:, 4],
+            'score': summary_counts[:, 5],
+        })
+
+        level_counts = np.frombuffer(self.level_counts, dtype=np.int64).reshape(-1, 4).astype(np.int32)
+        level_df = pd.DataFrame({
+            **self._keys(self.level_users, self.level_levels, dtypes),
+            'deaths': level_counts[:, 0],
+            'correct_matches': level_counts[:, 1],
+            'mismatches': level_counts[:, 2],
+            'total_attempts': level_counts[:, 3],
+            'accuracy': np.frombuffer(self.level_accuracy, dtype=np.float64).astype(np.float32),
+        })
+
+        mismatch_df = pd.DataFrame({
+            **self._keys(self.mismatch_users, self.mismatch_levels, dtypes),
+            'y_position': np.frombuffer(self.mismatch_y, dtype=np.float32),
+            'position_id': pd.array(self.mismatch_ids, dtype=strings),
+        })
+
+        health_df = pd.DataFrame({
+            **self._keys(self.health_users, self.health_levels, dtypes),
+            'health_remaining': np.frombuffer(self.health_values, dtype=np.float64).astype(np.float32),
+            'completion_count': np.frombuffer(self.health_counts, dtype=np.int64).astype(np.int32),
+        })
+
+        return user_df, level_df, mismatch_df, health_df
+
+
+def _string_dtype():
+    """Arrow-backed strings when pyarrow is installed, Python objects otherwise"""
+    import pandas as pd
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return object
+    return pd.StringDtype('pyarrow')
+
+
+def health_percentage(health_df):
+    """
+    Health remaining in percent of the maximum health (100), derived on demand
+    for compact health tables that do not store it
+
+    Returns:
+        pandas.Series: float64 percentages aligned with `health_df`
+    """
+    if 'health_percentage' in health_df:
+        return health_df['health_percentage']
+    return health_df['health_remaining'].astype('float64') / 100.0 * 100
+
+
+def frames_memory_usage(frames):
+    """
+    Bytes held by DataFrames, counting categories shared between columns once
+
+    DataFrame.memory_usage(deep=True) counts a categorical's categories in
+    every column that uses them, which overstates compact frames.
+
+    Returns:
+        int: Total bytes
+    """
+    import pandas as pd
+
+    total = 0
+    seen = set()
+    for df in frames:
+        for column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                total += values.cat.codes.memory_usage(index=False)
+                categories = values.cat.categories
+                if id(categories) not in seen:
+                    seen.add(id(categories))
+                    total += categories.memory_usage(deep=True)
+            else:
+                total += values.memory_usage(index=False, deep=True)
+    return total
+
+
+def concat_frames(frames):
+    """
+    Concatenate DataFrames with the same columns, unioning the categories of
+    categorical columns instead of falling back to object dtype
+
+    Args:
+        frames (list): DataFrames produced by ColumnarBuilder (or reloaded copies)
+
+    Returns:
+        pandas.DataFrame: The stacked rows
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    non_empty = [df for df in frames if not df.empty]
+    if not non_empty:
+        return frames[0]
+    if len(non_empty) == 1:
+        return non_empty[0].reset_index(drop=True)
+
+    columns = {}
+    for column in non_empty[0].columns:
+        parts = [df[column] for df in non_empty]
+        if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            parts = [part if isinstance(part.dtype, pd.CategoricalDtype) else part.astype('category')
+                     for part in parts]
+            columns[column] = union_categoricals(parts, ignore_order=True)
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
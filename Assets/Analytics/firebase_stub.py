@@ -0,0 +1,86 @@
+"""
+Local stand-in for the Firebase Realtime Database REST API.
+
+Serves an in-memory tree over HTTP the way `<db>.firebaseio.com/<path>.json`
+does (see realtime_db for the supported API), with artificial latency,
+injected 503 failures and a bandwidth cap. Point MorphRunnerRealtimeAnalytics
+at the printed URL to exercise the fetch and live paths without touching
+production.
+
+Usage:
+    python firebase_stub.py --users 10000 --port 9000 [--skew 0.5] [--latency 0.02] [--bandwidth 2e6]
+"""
+import argparse
+import random
+import time
+
+from realtime_db import RealtimeDatabaseHandler, RealtimeDatabaseServer, RealtimeTree
+from synthetic_data import generate_users
+
+
+class FirebaseStubHandler(RealtimeDatabaseHandler):
+
+    def _admit(self):
+        """Count the request and apply the latency; returns False after answering an injected failure"""
+        super()._admit()
+        stub = self.server.database
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.failure_rate and random.random() < stub.failure_rate:
+            self._send_json(503, {'error': 'injected failure'})
+            return False
+        return True
+
+    def _send_body(self, status, body):
+        if self.server.database.bandwidth:
+            time.sleep(len(body) / self.server.database.bandwidth)
+        super()._send_body(status, body)
+
+
+class FirebaseStub(RealtimeDatabaseServer):
+    """
+    In-memory Realtime Database served on localhost, with injected faults
+
+    Args:
+        tree (dict): Root of the database, e.g. {'users': generate_users(1000)}
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        latency (float): Artificial delay added to every request, in seconds
+        failure_rate (float): Fraction of requests answered with 503
+        bandwidth (float): Per-response throughput cap in bytes/second, 0 for none
+        keep_alive (float): Seconds between keep-alive events on idle streams
+    """
+
+    handler_class = FirebaseStubHandler
+
+    def __init__(self, tree=None, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, bandwidth=0,
+                 keep_alive=30.0):
+        super().__init__(RealtimeTree(tree), host, port, keep_alive)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.bandwidth = bandwidth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=0.0, help='player activity skew, see synthetic_data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--bandwidth', type=float, default=0, help='per-response bytes/second cap')
+    args = parser.parse_args()
+
+    stub = FirebaseStub({'users': generate_users(args.users, seed=args.seed, skew=args.skew)}, args.host, args.port,
+                        latency=args.latency, failure_rate=args.failure_rate, bandwidth=args.bandwidth)
+    print(f"Serving {args.users} synthetic users at {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Local ingest service for game telemetry, with server-side counters.
+
+ObstacleMismatchLogging buffers its events and sends them as one
+multi-location PATCH per flush. Counters in that PATCH are Firebase server
+values ({".sv": {"increment": n}}), so the database adds to the stored count
+instead of the game reading the count and writing it back plus one. The same
+requests work against Firebase and against this service.
+
+IngestService speaks the subset of the Realtime Database REST API that the
+game and MorphRunnerRealtimeAnalytics use (see realtime_db) and keeps its
+data in a DurableTree. Each write follows the same steps:
+
+- It is resolved and applied to the in-memory tree under one lock, so
+  concurrent increments are serialized and counts are exact.
+- It is appended to a JSON-lines event log before the request is answered.
+  Log records hold the resolved values, so replaying a record twice gives
+  the same tree.
+
+On start, the tree is rebuilt from the last checkpoint plus the log, and
+checkpoint() folds the log into a new checkpoint. Reads (shallow and
+orderBy paging, event streams) are served from the materialized tree, so the
+analytics fetch paths work unchanged against the service URL.
+
+Usage:
+    python ingest_service.py --log ingest/events.jsonl --port 9100 [--fsync] [--checkpoint-every 100000]
+    python cli.py --url http://127.0.0.1:9100/ summary
+"""
+import argparse
+import json
+import logging
+import os
+
+from realtime_db import RealtimeDatabaseServer, RealtimeTree
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+
+
+class DurableTree(RealtimeTree):
+    """
+    RealtimeTree whose writes are logged to disk and recovered on creation
+
+    Args:
+        log_path (str): Append-only event log, created on first use
+        checkpoint_path (str): Tree snapshot the log is replayed onto,
+            defaults to `<log_path>.checkpoint.json`
+        fsync (bool): fsync the log after every write request instead of only
+            flushing it to the OS
+        checkpoint_every (int): Write a checkpoint after this many logged
+            writes, 0 to only checkpoint on request
+    """
+
+    def __init__(self, log_path, checkpoint_path=None, fsync=False, checkpoint_every=0):
+        super().__init__()
+        self.log_path = log_path
+        self.checkpoint_path = checkpoint_path or log_path + CHECKPOINT_SUFFIX
+        self.fsync = fsync
+        self.checkpoint_every = checkpoint_every
+        # Writes in the log since the last checkpoint
+        self.logged_writes = 0
+        directory = os.path.dirname(os.path.abspath(log_path))
+        os.makedirs(directory, exist_ok=True)
+        self.recovered_writes = self._recover()
+        self._log = open(log_path, 'a', encoding='utf-8')
+
+    def _recover(self):
+        """Load the checkpoint and replay the log onto it; returns the number of replayed writes"""
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                self.tree = json.load(f)
+        if not os.path.exists(self.log_path):
+            return 0
+        replayed = 0
+        # End of the last complete record; a write torn by a crash was never
+        # acknowledged, so it can be dropped
+        complete = 0
+        with open(self.log_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.endswith(b'\n'):
+                    break
+                complete += len(line)
+                try:
+                    op, path, data = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable record %d of %s", line_number, self.log_path)
+                    continue
+                if op == 'put':
+                    super().put(path, data)
+                else:
+                    super().patch(path, data)
+                replayed += 1
+        if complete < os.path.getsize(self.log_path):
+            # Cut the torn tail off, or the next record would be appended to it
+            logger.warning("Dropping a torn record at the end of %s", self.log_path)
+            os.truncate(self.log_path, complete)
+        self.logged_writes = replayed
+        return replayed
+
+    def _append(self, op, path, data):
+        """Log a resolved write; called with the lock held"""
+        self._log.write(json.dumps([op, path, data], separators=(',', ':')) + '\n')
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self.logged_writes += 1
+        if self.checkpoint_every and self.logged_writes >= self.checkpoint_every:
+            self.checkpoint()
+
+    def put(self, path, value):
+        with self.lock:
+            value = super().put(path, value)
+            self._append('put', path, value)
+        return value
+
+    def patch(self, path, values):
+        with self.lock:
+            values = super().patch(path, values)
+            self._append('patch', path, values)
+        return values
+
+    def checkpoint(self):
+        """Write the materialized tree to the checkpoint file and start a new, empty log"""
+        with self.lock:
+            temporary = self.checkpoint_path + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(self.tree, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.checkpoint_path)
+            # Replaying records already in the checkpoint is harmless, so a crash
+            # between the replace and the truncate loses nothing
+            self._log.close()
+            self._log = open(self.log_path, 'w', encoding='utf-8')
+            self.logged_writes = 0
+
+    def close(self):
+        with self.lock:
+            self._log.close()
+
+
+class IngestService(RealtimeDatabaseServer):
+    """
+    Realtime Database REST API served from a DurableTree
+
+    Args:
+        log_path (str): Append-only event log, created on first use
+        checkpoint_path (str): Tree snapshot the log is replayed onto,
+            defaults to `<log_path>.checkpoint.json`
+        fsync (bool): fsync the log after every write request instead of only
+            flushing it to the OS
+        checkpoint_every (int): Write a checkpoint after this many logged
+            writes, 0 to only checkpoint on request
+        **server_options: host, port and keep_alive, see RealtimeDatabaseServer
+    """
+
+    def __init__(self, log_path, checkpoint_path=None, fsync=False, checkpoint_every=0, **server_options):
+        super().__init__(DurableTree(log_path, checkpoint_path, fsync, checkpoint_every), **server_options)
+
+    @property
+    def log_path(self):
+        return self.store.log_path
+
+    @property
+    def recovered_writes(self):
+        return self.store.recovered_writes
+
+    def checkpoint(self):
+        self.store.checkpoint()
+
+    def stop(self):
+        super().stop()
+        self.store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--log', default=os.path.join('ingest', 'events.jsonl'), help='event log file')
+    parser.add_argument('--checkpoint', help=f'checkpoint file (default: <log>{CHECKPOINT_SUFFIX})')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--fsync', action='store_true', help='fsync the log after every write request')
+    parser.add_argument('--checkpoint-every', type=int, default=100000,
+                        help='fold the log into the checkpoint after this many writes, 0 for never')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    service = IngestService(args.log, args.checkpoint, fsync=args.fsync, checkpoint_every=args.checkpoint_every,
+                            host=args.host, port=args.port)
+    users = service.get('users')
+    print(f"Recovered {len(users) if isinstance(users, dict) else 0} users "
+          f"({service.recovered_writes} logged writes replayed)")
+    print(f"Ingesting at {service.url}")
+    try:
+        service.server.serve_forever()
+    except KeyboardInterrupt:
+        service.checkpoint()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
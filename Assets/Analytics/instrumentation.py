@@ -0,0 +1,157 @@
+"""
+Per-stage metrics for the report pipeline.
+
+PipelineMetrics times each stage of a run (wall and CPU time), records bytes
+downloaded and rows produced, how far each stage raised the process's peak
+resident set size, and optionally the peak traced Python memory per stage.
+The process peak itself is only reported for the whole run, since it is a
+high-water mark that every later stage would inherit. Results are logged
+through the `morphrunner.pipeline` logger and can be written as JSON; a
+cProfile of the whole run can be dumped next to them.
+"""
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger('morphrunner.pipeline')
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where unsupported"""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+class ByteCounter:
+    """Thread-safe running total of downloaded bytes, fed by a requests response hook"""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.total += count
+
+    def response_hook(self, response, stream=False, **kwargs):
+        # Streamed bodies (the SSE endpoint) are not counted, reading them here would block
+        if stream:
+            return
+        content = response.content
+        wire_bytes = response.raw.tell() if hasattr(response.raw, 'tell') else 0
+        self.add(wire_bytes or len(content))
+
+
+class PipelineMetrics:
+    """
+    Collects one record per pipeline stage
+
+    Args:
+        byte_counter (ByteCounter): Download counter to attribute to stages
+        trace_memory (bool): Record each stage's peak Python allocation with
+            tracemalloc (slows allocation-heavy stages noticeably)
+        profile_path (str): If set, profile the run with cProfile and dump
+            the stats to this file in finish()
+    """
+
+    def __init__(self, byte_counter=None, trace_memory=False, profile_path=None):
+        self.byte_counter = byte_counter
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self.stages = []
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._started_tracing = False
+        self._profiler = None
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if profile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure the enclosed block as one stage
+
+        Yields:
+            dict: The stage record; callers may add keys such as `rows`
+        """
+        record = {'stage': name}
+        bytes_before = self.byte_counter.total if self.byte_counter else 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        rss_peak_before = peak_rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu_start, 6)
+            if self.byte_counter:
+                record['bytes_downloaded'] = self.byte_counter.total - bytes_before
+            if self.trace_memory:
+                record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1] - traced_before
+            if rss_peak_before is not None:
+                # 0 when the stage stayed below the peak of an earlier stage
+                record['peak_rss_growth_bytes'] = peak_rss_bytes() - rss_peak_before
+            self.stages.append(record)
+            logger.info("stage %s: %s", name, json.dumps({k: v for k, v in record.items() if k != 'stage'}))
+
+    def finish(self):
+        """
+        Stop profiling and tracing and return the run summary
+
+        Returns:
+            dict: Totals of the run and the list of stage records
+        """
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            logger.info("cProfile stats written to %s", self.profile_path)
+            self._profiler = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        summary = {
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._start, 6),
+            'cpu_seconds': round(time.process_time() - self._cpu_start, 6),
+            'bytes_downloaded': sum(stage.get('bytes_downloaded', 0) for stage in self.stages),
+            'process_peak_rss_bytes': peak_rss_bytes(),
+            'stages': self.stages,
+        }
+        logger.info("pipeline finished: %s", json.dumps({k: v for k, v in summary.items() if k != 'stages'}))
+        return summary
+
+    def write_json(self, summary, path):
+        """Write a run summary from finish() to `path` as JSON"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def frame_rows(frames):
+    """{table: row count} of the four analytics DataFrames"""
+    tables = ('user_summaries', 'level_details', 'mismatch_positions', 'health_completions')
+    return {table: len(df) for table, df in zip(tables, frames)}
@@ -0,0 +1,132 @@
+"""
+Streaming reader for large `users.json` dumps on disk.
+
+The file is read in fixed-size chunks and the members of the users object are
+decoded one at a time with the C-accelerated `json` scanner, so memory holds
+one chunk plus the user being decoded rather than the whole tree.
+"""
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _ObjectStream:
+    """Incremental cursor over the text of a JSON document"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.scanner = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read one more chunk, dropping the consumed prefix of the buffer"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=self.eof)
+        self.pos = 0
+        return bool(chunk)
+
+    def _peek(self):
+        """Next non-whitespace character, or '' at the end of the file"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON dump, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next JSON value, reading more chunks until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.scanner.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A scalar ending exactly at the buffer end (e.g. a number) may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def members(self):
+        """
+        Yield the (key, value) pairs of the object starting at the cursor
+
+        Values are decoded lazily: a caller that wants to descend into a value
+        can stop consuming the outer iteration and call members() again.
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(':')
+            yield key
+            separator = self._peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' in JSON dump, found {separator or 'end of file'!r}")
+
+
+def iter_users_file(path, root_key=None, chunk_size=1 << 20):
+    """
+    Stream the users of a JSON dump one at a time
+
+    Args:
+        path (str): A `users.json` export ({user_id: user_data}), or a full
+            database export when `root_key` is given
+        root_key (str): Top-level key holding the users object, e.g. 'users'
+        chunk_size (int): Bytes read from disk at a time
+
+    Yields:
+        tuple: (user_id, user_data)
+    """
+    with open(path, 'rb') as f:
+        stream = _ObjectStream(f, chunk_size)
+        if stream._peek() == 'n':  # an empty database exports as null
+            return
+        if root_key is None:
+            for user_id in stream.members():
+                yield user_id, stream.value()
+            return
+        for key in stream.members():
+            if key == root_key and stream._peek() == '{':
+                for user_id in stream.members():
+                    yield user_id, stream.value()
+                return
+            stream.value()
+
+
+def iter_users_file_pages(path, page_size=1000, root_key=None, chunk_size=1 << 20):
+    """
+    Group the users of a JSON dump into {user_id: user_data} pages
+
+    Yields:
+        dict: Up to `page_size` users, in file order
+    """
+    page = {}
+    for user_id, user_data in iter_users_file(path, root_key, chunk_size):
+        page[user_id] = user_data
+        if len(page) >= page_size:
+            yield page
+            page = {}
+    if page:
+        yield page
@@ -0,0 +1,174 @@
+"""
+Order-statistics index of players by score.
+
+Players are kept in an indexable skip list ordered by (score desc, accuracy
+desc, user_id), so a score change costs O(log N), the top K players are read
+in O(K) and a player's rank is found in O(log N) without sorting the whole
+player base on every render.
+"""
+import random
+
+MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ('key', 'value', 'next', 'width')
+
+    def __init__(self, key, value, levels):
+        self.key = key
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class Leaderboard:
+    """
+    Players ranked by score, with accuracy as the tie-break
+
+    Args:
+        seed: Seed of the level generator, for reproducible layouts
+    """
+
+    def __init__(self, seed=None):
+        self._head = _Node(None, None, MAX_LEVELS)
+        self._height = 1  # levels currently linked from the head
+        self._keys = {}
+        self._random_bits = random.Random(seed).getrandbits
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._keys
+
+    def __iter__(self):
+        """Iterate over the stored values, best first"""
+        node = self._head.next[0]
+        while node is not None:
+            yield node.value
+            node = node.next[0]
+
+    @staticmethod
+    def _key(user_id, score, accuracy):
+        return -score, -accuracy, user_id
+
+    def _chain(self, key):
+        """Rightmost node before `key` on every level, and the rank of each"""
+        chain = [None] * self._height
+        steps = [0] * self._height
+        node, position = self._head, 0
+        for level in range(self._height - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                position += node.width[level]
+                node, following = following, following.next[level]
+            chain[level] = node
+            steps[level] = position
+        return chain, steps
+
+    def _random_levels(self):
+        """Geometric level count (p=1/2): one plus the trailing zero bits of a random word"""
+        bits = self._random_bits(MAX_LEVELS - 1)
+        return (bits & -bits).bit_length() or MAX_LEVELS
+
+    def load(self, entries):
+        """
+        Replace the contents in O(N log N) with one sort instead of N inserts
+
+        Args:
+            entries (iterable): (user_id, score, accuracy, value) tuples
+        """
+        self.clear()
+        items = sorted((self._key(user_id, score, accuracy), user_id if value is None else value)
+                       for user_id, score, accuracy, value in entries)
+        last = [self._head] * MAX_LEVELS
+        last_position = [0] * MAX_LEVELS
+        random_levels = self._random_levels
+        for position, (key, value) in enumerate(items, 1):
+            levels = random_levels()
+            node = _Node(key, value, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+            if levels > self._height:
+                self._height = levels
+            self._keys[key[2]] = key
+        for level in range(self._height):
+            last[level].width[level] = len(items) + 1 - last_position[level]
+
+    def update(self, user_id, score, accuracy, value=None):
+        """
+        Insert a player or move them to their new position
+
+        Args:
+            user_id (str): Player id
+            score (int): Ranking score, higher is better
+            accuracy (float): Tie-break for equal scores, higher is better
+            value: Payload returned by top() and get(), defaults to user_id
+        """
+        if user_id in self._keys:
+            self.remove(user_id)
+        key = self._key(user_id, score, accuracy)
+        levels = self._random_levels()
+        if levels > self._height:
+            for level in range(self._height, levels):
+                self._head.width[level] = len(self._keys) + 1
+            self._height = levels
+        chain, steps = self._chain(key)
+        position = steps[0] + 1
+
+        node = _Node(key, user_id if value is None else value, levels)
+        for level in range(levels):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - (position - steps[level]) + 1
+            previous.width[level] = position - steps[level]
+        for level in range(levels, self._height):
+            chain[level].width[level] += 1
+        self._keys[user_id] = key
+
+    def remove(self, user_id):
+        """Drop a player; unknown ids are ignored"""
+        key = self._keys.pop(user_id, None)
+        if key is None:
+            return
+        chain, _ = self._chain(key)
+        node = chain[0].next[0]
+        for level in range(len(node.next)):
+            chain[level].width[level] += node.width[level] - 1
+            chain[level].next[level] = node.next[level]
+        for level in range(len(node.next), self._height):
+            chain[level].width[level] -= 1
+
+    def top(self, k=10):
+        """The best `k` values, best first"""
+        result = []
+        node = self._head.next[0]
+        while node is not None and len(result) < k:
+            result.append(node.value)
+            node = node.next[0]
+        return result
+
+    def rank(self, user_id):
+        """1-based position of a player, or None if they are not ranked"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        _, steps = self._chain(key)
+        return steps[0] + 1
+
+    def get(self, user_id):
+        """Stored value of a player, or None"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        chain, _ = self._chain(key)
+        return chain[0].next[0].value
+
+    def clear(self):
+        self._head = _Node(None, None, MAX_LEVELS)
+        self._height = 1
+        self._keys.clear()
@@ -0,0 +1,187 @@
+"""
+Obstacle layouts of the levels, joined with the logged mismatch positions.
+
+Spawner.cs loads `Resources/<Level> data/<level>.txt`, a JSON array of
+LevelData records ({obstacleIndex, laneIndex, spawnY}), and places each
+obstacle at its spawnY. Obstacles do not move, so a mismatch logged at an
+obstacle's y-position belongs to the obstacle row spawned nearest to it.
+
+A LevelLayout keeps the distinct spawnY rows sorted, with the midpoints
+between neighbouring rows as interval boundaries, so a batch of positions is
+mapped to rows with one binary search each (np.searchsorted) instead of
+comparing every position with every obstacle. Levels are discovered from the
+files on disk.
+"""
+import json
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_RESOURCES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Resources')
+LEVEL_DIR_SUFFIX = ' data'
+# Positions further than this from every obstacle row are not attributed to one
+DEFAULT_MAX_DISTANCE = 1.0
+
+Hotspot = namedtuple('Hotspot', [
+    'level_name',
+    'spawn_y',
+    'obstacles',    # ((obstacleIndex, laneIndex), ...) spawned on this row
+    'mismatches',   # mismatches attributed to the row
+    'share',        # fraction of the level's attributed mismatches
+    'per_player',   # mismatches per player with match statistics on the level
+])
+
+
+def level_sort_key(level_name):
+    """Sort 'Level2' before 'Level10'"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', level_name)]
+
+
+class LevelLayout:
+    """
+    Sorted interval index over the obstacle rows of one level
+
+    Args:
+        level_name (str): Scene name, e.g. 'Level1'
+        records (list): LevelData dicts with obstacleIndex, laneIndex, spawnY
+    """
+
+    def __init__(self, level_name, records):
+        self.level_name = level_name
+        records = sorted(records, key=lambda record: (record['spawnY'], record['laneIndex']))
+        self.rows = np.unique(np.array([record['spawnY'] for record in records], dtype=np.float64))
+        self.boundaries = (self.rows[1:] + self.rows[:-1]) / 2
+        self.obstacles = [[] for _ in self.rows]
+        for row, record in zip(np.searchsorted(self.rows, [record['spawnY'] for record in records]), records):
+            self.obstacles[row].append((record['obstacleIndex'], record['laneIndex']))
+        self.obstacles = [tuple(obstacles) for obstacles in self.obstacles]
+
+    @classmethod
+    def from_file(cls, level_name, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(level_name, json.load(f))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def nearest_rows(self, y_positions, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Index of the obstacle row nearest to each position
+
+        Args:
+            y_positions: Sequence, array or Series of logged y-positions
+            max_distance (float): Positions further than this from their
+                nearest row map to -1; None attributes every position
+
+        Returns:
+            numpy.ndarray: Row indexes into self.rows
+        """
+        y_positions = np.asarray(y_positions, dtype=np.float64)
+        if not len(self.rows):
+            return np.full(y_positions.shape, -1, dtype=np.intp)
+        rows = np.searchsorted(self.boundaries, y_positions, side='right')
+        if max_distance is not None:
+            rows[np.abs(self.rows[rows] - y_positions) > max_distance] = -1
+        return rows
+
+    def row_counts(self, y_positions, weights=None, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Mismatches attributed to each obstacle row
+
+        Args:
+            y_positions: Logged y-positions
+            weights: Optional count per position, e.g. histogram bin counts
+
+        Returns:
+            numpy.ndarray: One count per row of self.rows
+        """
+        rows = self.nearest_rows(y_positions, max_distance)
+        attributed = rows >= 0
+        if weights is not None:
+            weights = np.asarray(weights)[attributed]
+        return np.bincount(rows[attributed], weights=weights, minlength=len(self.rows)).astype(np.int64)
+
+    def histogram_row_counts(self, histogram, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Row counts read from a FixedBinHistogram of y-positions
+
+        Bin centres are mapped to rows, which is exact whenever the midpoints
+        between rows fall on bin edges (integer spawnY rows with the 0.5 wide
+        mismatch sketch bins). Under- and overflow bins are not attributed.
+        """
+        centres = histogram.edges()[:-1] + histogram.width / 2
+        return self.row_counts(centres, histogram.counts[1:-1], max_distance)
+
+    def hotspots(self, counts, players=0):
+        """
+        Hotspot rows of this level, most mismatches first
+
+        Args:
+            counts (numpy.ndarray): Row counts from row_counts()
+            players (int): Players with match statistics on the level
+
+        Returns:
+            list: Hotspot per row with at least one mismatch
+        """
+        total = counts.sum()
+        order = np.argsort(-counts, kind='stable')
+        return [Hotspot(self.level_name, float(self.rows[row]), self.obstacles[row], int(counts[row]),
+                        float(counts[row] / total), float(counts[row] / players) if players else 0.0)
+                for row in order if counts[row]]
+
+
+def discover_level_files(resources_dir=DEFAULT_RESOURCES_DIR):
+    """
+    Find the level files the Spawner loads, `<Level> data/<level>.txt`
+
+    Returns:
+        dict: {level_name: path}, sorted by level
+    """
+    found = {}
+    if not os.path.isdir(resources_dir):
+        return found
+    for entry in os.listdir(resources_dir):
+        if not entry.endswith(LEVEL_DIR_SUFFIX):
+            continue
+        level_name = entry[:-len(LEVEL_DIR_SUFFIX)]
+        path = os.path.join(resources_dir, entry, f'{level_name.lower()}.txt')
+        if os.path.isfile(path):
+            found[level_name] = path
+    return {name: found[name] for name in sorted(found, key=level_sort_key)}
+
+
+def load_layouts(resources_dir=DEFAULT_RESOURCES_DIR):
+    """
+    Load every level layout under `resources_dir`
+
+    Returns:
+        dict: {level_name: LevelLayout}, sorted by level
+    """
+    return {name: LevelLayout.from_file(name, path) for name, path in discover_level_files(resources_dir).items()}
+
+
+def mismatch_hotspots(aggregates, layouts, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Per-obstacle-row mismatch hotspots of every level with a layout
+
+    Reads the per-level mismatch y-position sketches of an AggregateStore, so
+    no DataFrame is needed.
+
+    Args:
+        aggregates (AggregateStore): Aggregated telemetry
+        layouts (dict): {level_name: LevelLayout} from load_layouts()
+
+    Returns:
+        dict: {level_name: [Hotspot, ...]} for levels with attributed mismatches
+    """
+    hotspots = {}
+    for level_name, layout in layouts.items():
+        level = aggregates.levels.get(level_name)
+        if level is None or not level.mismatch_count:
+            continue
+        counts = layout.histogram_row_counts(level.mismatch_y_histogram, max_distance)
+        if counts.any():
+            hotspots[level_name] = layout.hotspots(counts, level.players)
+    return hotspots
@@ -0,0 +1,129 @@
+"""
+Helpers for the Realtime Database REST streaming (Server-Sent Events) protocol.
+
+The stream for a location starts with a `put` of the whole subtree at path "/"
+and then sends `put`/`patch` events with paths relative to that location.
+"""
+import json
+
+# Events that carry no data change
+CONTROL_EVENTS = ('keep-alive',)
+# Events after which the server closes the stream
+TERMINAL_EVENTS = ('cancel', 'auth_revoked')
+
+
+def iter_sse_events(lines):
+    """
+    Parse a text/event-stream body
+
+    Args:
+        lines (iterable): Decoded lines of the response body
+
+    Yields:
+        tuple: (event_name, data) with data decoded from JSON
+    """
+    event = None
+    data_lines = []
+    for line in lines:
+        if line is None:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line:
+            if event is not None or data_lines:
+                payload = '\n'.join(data_lines)
+                yield event or 'message', json.loads(payload) if payload else None
+            event = None
+            data_lines = []
+        elif line.startswith(':'):
+            continue
+        elif line.startswith('event:'):
+            event = line[len('event:'):].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[len('data:'):].lstrip())
+
+
+def split_path(path):
+    return [part for part in path.split('/') if part]
+
+
+def apply_event(tree, event, path, data):
+    """
+    Apply a `put` or `patch` event to a local mirror of the streamed location
+
+    Args:
+        tree (dict): Mirror of the location, modified in place
+        event (str): 'put' replaces the node at `path`, 'patch' updates its children
+        path (str): Event path relative to the streamed location
+        data: New value (None deletes)
+
+    Returns:
+        dict: The mirror, which is a new object if the root itself was replaced
+    """
+    parts = split_path(path)
+    if event == 'patch':
+        for key, value in (data or {}).items():
+            tree = apply_event(tree, 'put', '/'.join(parts + split_path(key)), value)
+        return tree
+
+    if not parts:
+        return data if isinstance(data, dict) else {}
+
+    node = tree
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            if data is None:
+                return tree
+            child = node[part] = {}
+        node = child
+    if data is None:
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = data
+    return tree
+
+
+def affected_users(event, path, data):
+    """
+    User ids touched by an event on the `users` stream
+
+    Returns:
+        set: User ids, or None if the whole `users` node was replaced
+    """
+    parts = split_path(path)
+    if parts:
+        return {parts[0]}
+    if event == 'patch':
+        return {split_path(key)[0] for key in (data or {}) if split_path(key)}
+    return None
+
+
+def iter_stream_lines(read, chunk_size=65536):
+    """
+    Split a streaming response body into lines as soon as they arrive
+
+    Args:
+        read (callable): Returns the next available bytes (b'' at end of stream),
+            e.g. urllib3's HTTPResponse.read1
+
+    Yields:
+        str: Lines without their terminator
+    """
+    pending = []
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        while True:
+            end = chunk.find(b'\n')
+            if end < 0:
+                pending.append(chunk)
+                break
+            pending.append(chunk[:end])
+            line = b''.join(pending)
+            pending = []
+            yield line.rstrip(b'\r').decode('utf-8')
+            chunk = chunk[end + 1:]
+    if pending:
+        yield b''.join(pending).rstrip(b'\r').decode('utf-8')
@@ -0,0 +1,197 @@
+"""
+Offline, partitioned copies of the processed analytics tables.
+
+Every export writes the four DataFrames of one run as a hive-partitioned
+Parquet or Arrow IPC dataset under `root/<table>/ingest_date=YYYY-MM-DD/`,
+with the per-level tables further split into `level_name=<level>/`. Loading
+goes through memory-mapped files with partition and column pruning, so
+reports and ad-hoc analyses over months of exports read only the dates,
+levels and columns they ask for. Arrow IPC files are written uncompressed and
+are read without decoding; Parquet files are smaller on disk.
+
+Requires pyarrow.
+"""
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:  # optional dependency, only needed for offline datasets
+    pa = ds = fs = None
+
+from snapshot_cache import CATEGORICAL_COLUMNS, TABLE_ORDER
+
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}  # format name -> file extension
+LEVEL_PARTITIONED = ('level_details', 'mismatch_positions', 'health_completions')
+
+# Columns the AggregateStore needs to produce the dashboard and the console summary
+REPORT_COLUMNS = {
+    'user_summaries': ['user_id', 'username', 'total_deaths', 'total_correct_matches', 'total_mismatches',
+                       'total_attempts', 'overall_accuracy', 'levels_played', 'score'],
+    'level_details': ['user_id', 'level_name', 'deaths', 'correct_matches', 'mismatches', 'total_attempts',
+                      'accuracy'],
+    'mismatch_positions': ['user_id', 'level_name', 'y_position'],
+    'health_completions': ['user_id', 'level_name', 'health_remaining'],
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Offline datasets require pyarrow (pip install pyarrow)")
+
+
+def _partitioning(table):
+    fields = [pa.field('ingest_date', pa.string())]
+    if table in LEVEL_PARTITIONED:
+        fields.append(pa.field('level_name', pa.string()))
+    return ds.partitioning(pa.schema(fields), flavor='hive')
+
+
+def _detect_format(table_dir):
+    for _, _, files in os.walk(table_dir):
+        for name in files:
+            for file_format, extension in FORMATS.items():
+                if name.endswith('.' + extension):
+                    return file_format
+    return None
+
+
+def export_frames(frames, root, ingest_date=None, file_format='parquet'):
+    """
+    Write the four analytics DataFrames as one ingest date of the dataset
+
+    Re-exporting the same date replaces that date's partitions.
+
+    Args:
+        frames (tuple): (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        root (str): Dataset directory, created if missing
+        ingest_date (str or date): Partition date, defaults to today
+        file_format (str): 'parquet' or 'arrow' (uncompressed Arrow IPC)
+    """
+    _require_pyarrow()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown dataset format: {file_format}")
+    ingest_date = str(ingest_date or date.today().isoformat())
+
+    for table, df in zip(TABLE_ORDER, frames):
+        table_dir = os.path.join(root, table)
+        existing_format = _detect_format(table_dir)
+        if existing_format not in (None, file_format):
+            raise ValueError(f"{table_dir} holds {existing_format} files, cannot add {file_format}")
+        shutil.rmtree(os.path.join(table_dir, f'ingest_date={ingest_date}'), ignore_errors=True)
+        if df.empty:
+            continue
+
+        df = df.assign(ingest_date=ingest_date)
+        if 'level_name' in df:
+            df['level_name'] = df['level_name'].astype(str)
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        write_options = None
+        if file_format == 'arrow':
+            write_options = ds.IpcFileFormat().make_write_options(compression=None)
+        ds.write_dataset(arrow_table, table_dir, format='ipc' if file_format == 'arrow' else 'parquet',
+                         partitioning=_partitioning(table), file_options=write_options,
+                         basename_template='part-{i}.' + FORMATS[file_format],
+                         existing_data_behavior='overwrite_or_ignore')
+
+
+def _open(root, table):
+    table_dir = os.path.join(root, table)
+    file_format = _detect_format(table_dir)
+    if file_format is None:
+        return None
+    return ds.dataset(table_dir, format='ipc' if file_format == 'arrow' else 'parquet',
+                      partitioning=_partitioning(table), filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def ingest_dates(root):
+    """
+    Returns:
+        list: Sorted ingest dates present in the dataset
+    """
+    _require_pyarrow()
+    dates = set()
+    for table in TABLE_ORDER:
+        table_dir = os.path.join(root, table)
+        if os.path.isdir(table_dir):
+            dates.update(name.split('=', 1)[1] for name in os.listdir(table_dir) if name.startswith('ingest_date='))
+    return sorted(dates)
+
+
+def load_arrow_table(root, table, columns=None, levels=None, start_date=None, end_date=None):
+    """
+    Read one table as a pyarrow Table backed by memory-mapped files
+
+    Args:
+        root (str): Dataset directory
+        table (str): One of snapshot_cache.TABLE_ORDER
+        columns (list): Columns to read (default: all, including the partition columns)
+        levels (list): Only read these levels (per-level tables)
+        start_date (str): First ingest date to read, inclusive
+        end_date (str): Last ingest date to read, inclusive
+
+    Returns:
+        pyarrow.Table: The matching rows, or None if the table was never exported
+    """
+    _require_pyarrow()
+    dataset = _open(root, table)
+    if dataset is None:
+        return None
+    condition = None
+    for expression in (
+            ds.field('ingest_date') >= str(start_date) if start_date else None,
+            ds.field('ingest_date') <= str(end_date) if end_date else None,
+            ds.field('level_name').isin(list(levels)) if levels and table in LEVEL_PARTITIONED else None):
+        if expression is not None:
+            condition = expression if condition is None else condition & expression
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def load_table(root, table, columns=None, levels=None, start_date=None, end_date=None):
+    """
+    Read one table as a DataFrame, for ad-hoc analyses across ingest dates
+
+    Takes the same arguments as load_arrow_table. `user_id`, `username` and
+    `level_name` of the per-level tables come back as categoricals.
+
+    Returns:
+        pandas.DataFrame: The matching rows (empty if the table was never exported)
+    """
+    arrow_table = load_arrow_table(root, table, columns, levels, start_date, end_date)
+    if arrow_table is None:
+        return pd.DataFrame(columns=columns or [])
+    df = arrow_table.to_pandas(split_blocks=True)
+    if table in LEVEL_PARTITIONED:
+        for column in CATEGORICAL_COLUMNS:
+            if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+    return df
+
+
+def load_frames(root, ingest_date=None, columns=REPORT_COLUMNS, levels=None):
+    """
+    Load the four tables of one export
+
+    Args:
+        root (str): Dataset directory
+        ingest_date (str): Export to load, defaults to the latest one
+        columns (dict): {table: columns} to read; defaults to the columns the
+            report needs, None reads every column
+        levels (list): Only read these levels
+
+    Returns:
+        tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df),
+            or None if the dataset has no exports
+    """
+    if ingest_date is None:
+        dates = ingest_dates(root)
+        if not dates:
+            return None
+        ingest_date = dates[-1]
+    return tuple(load_table(root, table, columns[table] if columns else None, levels, ingest_date, ingest_date)
+                 for table in TABLE_ORDER)
@@ -0,0 +1,119 @@
+"""
+Multi-process flattening of the Firebase `users` tree.
+
+Users are independent, so the tree (or a set of exported JSON files) is split
+into shards that worker processes flatten into their own ColumnarBuilder. Only
+the builders' typed column buffers travel back to the parent, where they are
+merged in shard order and materialized once.
+
+With the `fork` start method the workers inherit the raw user dict and receive
+just a (start, stop) slice of it; elsewhere each shard is pickled to its worker.
+Export files are read by the workers themselves, so only paths are sent.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from columnar import ColumnarBuilder, parse_user
+
+# Users inherited by forked workers, set only while a pool is running
+_FORKED_ITEMS = None
+
+
+def _build(items):
+    builder = ColumnarBuilder()
+    for user_id, user_data in items:
+        builder.add(parse_user(user_id, user_data))
+    return builder
+
+
+def _build_forked_slice(bounds):
+    start, stop = bounds
+    return _build(_FORKED_ITEMS[start:stop])
+
+
+def _build_file(path):
+    with open(path, 'rb') as f:
+        users = json.load(f)
+    if not isinstance(users, dict):
+        return ColumnarBuilder()
+    # Accept both a bare users.json export and a full database export
+    if isinstance(users.get('users'), dict):
+        users = users['users']
+    return _build(users.items())
+
+
+def _merge(builders, compact=False):
+    merged = ColumnarBuilder()
+    for builder in builders:
+        merged.merge(builder)
+    return merged.to_frames(compact)
+
+
+def _fork_context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def default_workers():
+    """Number of worker processes used when none is given"""
+    return os.cpu_count() or 1
+
+
+def process_users_parallel(raw_data, workers=None, shards_per_worker=4, compact=False):
+    """
+    Flatten a {user_id: user_data} dict across a process pool
+
+    Args:
+        raw_data (dict): Raw users tree as returned by GET users.json
+        workers (int): Worker processes, defaults to the CPU count
+        shards_per_worker (int): Shards handed to each worker, for load balancing
+        compact (bool): Build compact frames, see ColumnarBuilder.to_frames
+
+    Returns:
+        tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+    """
+    global _FORKED_ITEMS
+    workers = workers or default_workers()
+    items = list(raw_data.items())
+    if workers <= 1 or len(items) < 2:
+        return _build(items).to_frames(compact)
+
+    shard_count = min(len(items), workers * shards_per_worker)
+    step = -(-len(items) // shard_count)
+    bounds = [(start, min(start + step, len(items))) for start in range(0, len(items), step)]
+
+    context = _fork_context()
+    if context is None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return _merge(executor.map(_build, (items[start:stop] for start, stop in bounds)), compact)
+
+    _FORKED_ITEMS = items
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            return _merge(executor.map(_build_forked_slice, bounds), compact)
+    finally:
+        _FORKED_ITEMS = None
+
+
+def process_files_parallel(paths, workers=None, compact=False):
+    """
+    Flatten exported users JSON files across a process pool, one file per task
+
+    Args:
+        paths (list): JSON files, each holding {user_id: user_data} or a full
+            database export with a top-level `users` key
+        workers (int): Worker processes, defaults to the CPU count
+        compact (bool): Build compact frames, see ColumnarBuilder.to_frames
+
+    Returns:
+        tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+    """
+    paths = list(paths)
+    workers = min(workers or default_workers(), max(len(paths), 1))
+    if workers <= 1:
+        return _merge((_build_file(path) for path in paths), compact)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_fork_context()) as executor:
+        return _merge(executor.map(_build_file, paths), compact)
@@ -0,0 +1,377 @@
+"""
+In-memory Realtime Database tree served over the Firebase REST API.
+
+RealtimeTree holds the data and applies writes the way the Realtime Database
+does: PUT/PATCH/POST with server values ({".sv": {"increment": n}} and
+{".sv": "timestamp"}), multi-location PATCH applied atomically, and change
+notifications for `text/event-stream` listeners. RealtimeDatabaseServer serves
+a tree at `<url>/<path>.json`, including the query parameters analytics.py
+relies on (shallow=true, orderBy="$key", startAt, limitToFirst).
+
+firebase_stub.FirebaseStub adds latency and failure injection on top for
+tests and benchmarks; ingest_service.IngestService serves a tree whose writes
+are logged to disk.
+"""
+import json
+import queue
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from synthetic_data import make_push_id
+
+_INTEGER_KEY = re.compile(r'-?[0-9]{1,10}')
+
+
+def firebase_key_order(key):
+    """
+    Sort key of orderBy="$key" as the Realtime Database orders children
+
+    Keys that parse as 32-bit integers come first, in numeric order, then
+    every other key in string order. Kept separate from the client's cursor
+    logic in analytics.py so the server can catch ordering bugs there.
+    """
+    if _INTEGER_KEY.fullmatch(key):
+        value = int(key)
+        if -2**31 <= value <= 2**31 - 1:
+            return (0, value, '')
+    return (1, 0, key)
+
+
+def resolve_server_values(value, current=None, now_ms=None):
+    """
+    Replace Firebase server values in a written value
+
+    Args:
+        value: JSON value of a write, possibly containing {".sv": ...} nodes
+        current: Value stored at the written location, the base of increments
+        now_ms (int): Server time for "timestamp", defaults to the clock
+
+    Returns:
+        The value with every server value replaced by its result
+
+    Raises:
+        ValueError: On an unsupported server value
+    """
+    if not isinstance(value, dict):
+        return value
+    if '.sv' in value:
+        server_value = value['.sv']
+        if server_value == 'timestamp':
+            return int(time.time() * 1000) if now_ms is None else now_ms
+        increment = server_value.get('increment') if isinstance(server_value, dict) else None
+        if isinstance(increment, (int, float)) and not isinstance(increment, bool):
+            # Like Firebase, a missing or non-numeric current value counts as 0
+            base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+            return base + increment
+        raise ValueError(f"Unsupported server value {json.dumps(server_value)}")
+    current = current if isinstance(current, dict) else {}
+    return {key: resolve_server_values(child, current.get(key), now_ms) for key, child in value.items()}
+
+
+def _split(path):
+    return [part for part in path.split('/') if part]
+
+
+def _sse(event, path, data):
+    return f"event: {event}\ndata: {json.dumps({'path': path, 'data': data})}\n\n"
+
+
+class RealtimeTree:
+    """
+    JSON tree with Realtime Database write semantics and change streams
+
+    Args:
+        tree (dict): Initial root of the database
+    """
+
+    def __init__(self, tree=None):
+        self.tree = tree if tree is not None else {}
+        self.subscribers = {}
+        self.lock = threading.RLock()
+        self._rng = random.Random()
+
+    def get(self, path):
+        """Return the node at a slash separated path, or None"""
+        node = self.tree
+        for part in _split(path):
+            if not isinstance(node, dict):
+                return None
+            node = node.get(part)
+        return node
+
+    def put(self, path, value):
+        """
+        Replace the node at `path` (None deletes it) and notify streams
+
+        Returns:
+            The written value, with server values resolved
+        """
+        with self.lock:
+            value = resolve_server_values(value, self.get(path))
+            self._set(_split(path), value)
+            self._notify('put', _split(path), value)
+        return value
+
+    def patch(self, path, values):
+        """
+        Update children of the node at `path` and notify streams
+
+        Keys may be slash separated paths below `path`, so one request can
+        update many locations; it is applied atomically.
+
+        Returns:
+            dict: The written values, with server values resolved
+        """
+        if not isinstance(values, dict):
+            raise ValueError("PATCH data must be an object")
+        with self.lock:
+            parts = _split(path)
+            values = {key: resolve_server_values(value, self.get('/'.join(parts + _split(key))))
+                      for key, value in values.items()}
+            for key, value in values.items():
+                self._set(parts + _split(key), value)
+            self._notify('patch', parts, values)
+        return values
+
+    def push(self, path, value):
+        """Append `value` under a new push id, like POST, and return the id"""
+        push_id = make_push_id(self._rng)
+        self.put(f"{path}/{push_id}", value)
+        return push_id
+
+    def _set(self, parts, value):
+        if not parts:
+            self.tree = value if isinstance(value, dict) else {}
+            return
+        node = self.tree
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    def subscribe(self, path):
+        """Register a stream on `path`; its queue starts with a put of the current subtree"""
+        subscriber = queue.Queue()
+        with self.lock:
+            self.subscribers[subscriber] = _split(path)
+            subscriber.put(_sse('put', '/', self.get(path)))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.pop(subscriber, None)
+
+    def close_streams(self, event=None, data=None):
+        """End every open stream, after a terminal `event` if one is given"""
+        with self.lock:
+            for subscriber in self.subscribers:
+                if event is not None:
+                    subscriber.put(f"event: {event}\ndata: {json.dumps(data)}\n\n")
+                subscriber.put(None)
+
+    def _notify(self, event, parts, data):
+        for subscriber, location in self.subscribers.items():
+            if parts[:len(location)] == location:
+                subscriber.put(_sse(event, '/' + '/'.join(parts[len(location):]), data))
+            elif location[:len(parts)] == parts:
+                # The write replaced an ancestor of the streamed location
+                subscriber.put(_sse('put', '/', self.get('/'.join(location))))
+
+
+class RealtimeDatabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; avoid Nagle stalls on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _admit(self):
+        """Count the request; returns False after answering it instead of serving it"""
+        database = self.server.database
+        with database.store.lock:
+            database.request_count += 1
+        return True
+
+    def do_GET(self):
+        if not self._admit():
+            return
+        store = self.server.database.store
+
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        if not path.endswith('.json'):
+            return self._send_json(404, {'error': 'Not Found'})
+
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        if 'text/event-stream' in self.headers.get('Accept', ''):
+            return self._stream(path[:-len('.json')])
+        node = store.get(path[:-len('.json')])
+
+        if query.get('shallow') == 'true':
+            if len(query) > 1:
+                return self._send_json(400, {'error': 'Mixing shallow with other query parameters is not supported'})
+            if isinstance(node, dict):
+                node = {key: True for key in node}
+        elif 'orderBy' in query and isinstance(node, dict):
+            if query['orderBy'] != '"$key"':
+                return self._send_json(400, {'error': 'Only orderBy="$key" is supported'})
+            keys = sorted(node, key=firebase_key_order)
+            if 'startAt' in query:
+                start = firebase_key_order(json.loads(query['startAt']))
+                keys = [key for key in keys if firebase_key_order(key) >= start]
+            if 'limitToFirst' in query:
+                keys = keys[:int(query['limitToFirst'])]
+            node = {key: node[key] for key in keys}
+
+        self._send_json(200, node)
+
+    def _read_write(self):
+        """Return (path, value) of a write request, or None after answering an error"""
+        path = unquote(urlparse(self.path).path)
+        if not path.endswith('.json'):
+            self._send_json(404, {'error': 'Not Found'})
+            return None
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            value = json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            self._send_json(400, {'error': 'Invalid data; couldn\'t parse JSON object'})
+            return None
+        return path[:-len('.json')], value
+
+    def _write(self, apply):
+        """Apply a write request and answer with its result, or 400 when it is rejected"""
+        request = self._read_write()
+        if request is None or not self._admit():
+            return
+        try:
+            result = apply(*request)
+        except ValueError as error:
+            return self._send_json(400, {'error': str(error)})
+        self._send_json(200, result)
+
+    def do_PUT(self):
+        self._write(self.server.database.store.put)
+
+    def do_PATCH(self):
+        self._write(self.server.database.store.patch)
+
+    def do_POST(self):
+        self._write(lambda path, value: {'name': self.server.database.store.push(path, value)})
+
+    def _stream(self, path):
+        database = self.server.database
+        subscriber = database.store.subscribe(path)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            while True:
+                try:
+                    message = subscriber.get(timeout=database.keep_alive)
+                except queue.Empty:
+                    message = 'event: keep-alive\ndata: null\n\n'
+                if message is None:
+                    break
+                self.wfile.write(message.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            database.store.unsubscribe(subscriber)
+            self.close_connection = True
+
+    def _send_json(self, status, payload):
+        self._send_body(status, json.dumps(payload).encode('utf-8'))
+
+    def _send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class RealtimeDatabaseServer:
+    """
+    Serves a RealtimeTree on localhost over the REST API
+
+    Args:
+        store (RealtimeTree): The tree to serve; reads and writes go to it
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        keep_alive (float): Seconds between keep-alive events on idle streams
+    """
+
+    handler_class = RealtimeDatabaseHandler
+
+    def __init__(self, store, host='127.0.0.1', port=0, keep_alive=30.0):
+        self.store = store
+        self.keep_alive = keep_alive
+        self.request_count = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler_class)
+        self.server.daemon_threads = True
+        self.server.database = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def tree(self):
+        return self.store.tree
+
+    @property
+    def subscribers(self):
+        return self.store.subscribers
+
+    def get(self, path):
+        return self.store.get(path)
+
+    def put(self, path, value):
+        return self.store.put(path, value)
+
+    def patch(self, path, values):
+        return self.store.patch(path, values)
+
+    def push(self, path, value):
+        return self.store.push(path, value)
+
+    def close_streams(self, event='auth_revoked', data='credential is no longer valid'):
+        """
+        End every open stream with a terminal event
+
+        Firebase sends 'auth_revoked' when the credential expires and
+        'cancel' when security rules stop allowing the read.
+        """
+        self.store.close_streams(event, data)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.store.close_streams()
+        if self._thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,443 @@
+"""
+Asyncio HTTP service that serves every viewer from one shared, memoized report.
+
+Before this service, each consumer of the summary, leaderboard or dashboard
+ran generate_full_report, which downloads and reprocesses every user. The
+service builds one Report instead: the summary figures, the leaderboard and
+the dashboard figure JSON, with the response bodies encoded (and gzipped)
+once. That report is shared by every request:
+
+- A background task rebuilds the report every `ttl` seconds on a worker
+  thread, so requests keep being answered from the previous report while a
+  refresh runs.
+- Refreshes are single-flight. A request that needs a report before the
+  first build has finished, or after the current report went stale, joins the
+  refresh in flight instead of starting another.
+- Responses carry an ETag per report, so polling viewers get 304 Not Modified
+  until the next refresh.
+
+Any number of concurrent viewers cost one report build per refresh period.
+Only the standard library is needed to serve; pandas and plotly are loaded by
+the build, as in the rest of the pipeline.
+
+Endpoints:
+    GET /                   dashboard page, polls /dashboard.json
+    GET /summary.json       figures of the console summary
+    GET /leaderboard.json   top players; ?top=N (up to the cached size) and ?player=USER_ID (repeatable)
+    GET /dashboard.json     plotly figure JSON of create_complete_dashboard
+    GET /status.json        report age, builds, build time and coalesced requests
+
+Usage:
+    python cli.py serve --port 8050 --ttl 60 [--users-file users.json | --store morphrunner.db | ...]
+"""
+import asyncio
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60.0
+DEFAULT_LEADERBOARD_SIZE = 100
+DEFAULT_TOP = 10
+# Seconds a keep-alive connection may sit idle before the next request
+DEFAULT_IDLE_TIMEOUT = 15.0
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+INDEX_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Morph Runner Analytics</title>
+<script src="plotly.min.js"></script></head>
+<body style="margin:0"><div id="dashboard" style="width:100vw;height:100vh"></div>
+<script>
+async function load() {
+    const response = await fetch('dashboard.json', {cache: 'no-cache'});
+    if (response.ok) {
+        const figure = await response.json();
+        Plotly.react('dashboard', figure.data, figure.layout);
+    }
+}
+load();
+setInterval(load, %(refresh_ms)d);
+</script></body></html>
+"""
+
+
+def _encode(payload):
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+class Report:
+    """
+    One build of the shared report; never modified after it is built, so it
+    can be read by the event loop while the next one is built
+
+    Args:
+        summary (dict): summary_stats of the aggregates
+        players (list): PlayerSummary of the best players, best first
+        ranks (dict): {user_id: rank} of every player
+        dashboard_json (str): Plotly figure JSON
+        build_seconds (float): Wall time of the build
+    """
+
+    def __init__(self, summary, players, ranks, dashboard_json, build_seconds):
+        self.built_at = time.time()
+        self.built_monotonic = time.monotonic()
+        self.build_seconds = build_seconds
+        self.etag = f'"{int(self.built_at * 1000):x}"'
+        self.players = players
+        self.ranks = ranks
+        self.bodies = {
+            '/summary.json': _encode(summary),
+            '/leaderboard.json': _encode(self.leaderboard(DEFAULT_TOP)),
+            '/dashboard.json': dashboard_json.encode('utf-8'),
+        }
+        self.gzipped = {path: gzip.compress(body, 6) for path, body in self.bodies.items()
+                        if len(body) >= GZIP_MIN_BYTES}
+
+    @property
+    def age(self):
+        return time.monotonic() - self.built_monotonic
+
+    def leaderboard(self, top=DEFAULT_TOP, user_ids=()):
+        """Leaderboard payload: the `top` best players and the ranks of `user_ids`"""
+        payload = {
+            'player_count': len(self.ranks),
+            'top': [dict(player._asdict(), rank=rank) for rank, player in enumerate(self.players[:max(top, 0)], 1)],
+        }
+        if user_ids:
+            payload['ranks'] = {user_id: self.ranks.get(user_id) for user_id in user_ids}
+        return payload
+
+
+def build_report(analytics, source, leaderboard_size=DEFAULT_LEADERBOARD_SIZE):
+    """
+    Build a Report from one report source
+
+    Args:
+        analytics (MorphRunnerRealtimeAnalytics): Client to build with
+        source (dict): Source arguments of load_aggregates (users_file,
+            store_path, cache_path, ...)
+        leaderboard_size (int): Best players kept for /leaderboard.json
+
+    Returns:
+        Report: The new report
+    """
+    start = time.perf_counter()
+    aggregates = analytics.load_aggregates(**source)
+    summary = analytics.summary_stats(aggregates)
+    # Ranks are copied out so the report stays valid when the aggregates are updated in place
+    ranks = {player.user_id: rank for rank, player in enumerate(aggregates.leaderboard, 1)}
+    players = aggregates.top_players(leaderboard_size)
+    dashboard_json = analytics.create_complete_dashboard(None, None, None, None, aggregates).to_json()
+    return Report(summary, players, ranks, dashboard_json, time.perf_counter() - start)
+
+
+class ReportCache:
+    """
+    Memoized report, rebuilt after `ttl` seconds with single-flight builds
+
+    Args:
+        build (callable): Returns a new Report; run on a worker thread
+        ttl (float): Seconds a report is served before it is rebuilt; a
+            failed build is retried after the same period
+    """
+
+    def __init__(self, build, ttl=DEFAULT_TTL):
+        self._build = build
+        self.ttl = ttl
+        self.report = None
+        self.builds = 0
+        # Requests and refreshes that joined a build already in flight
+        self.coalesced = 0
+        self.last_error = None
+        self._retry_at = 0.0
+        self._refresh = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='report-build')
+
+    @property
+    def refreshing(self):
+        return self._refresh is not None
+
+    def _due(self):
+        """True when the report is missing or stale and no failed build is waiting for its retry"""
+        stale = self.report is None or self.report.age >= self.ttl
+        return stale and time.monotonic() >= self._retry_at
+
+    async def get(self):
+        """
+        The current report
+
+        Waits only while no report has been built yet. A stale report is
+        still served while its refresh runs in the background.
+
+        Raises:
+            Exception: The build error, when no report could be built yet
+        """
+        if self.report is None:
+            if self._refresh is None and not self._due():
+                raise RuntimeError(f"No report yet, last build failed: {self.last_error}")
+            return await self.refresh()
+        if self._due() and self._refresh is None:
+            # Consume the result so a failed background refresh is not reported as unhandled
+            self._start_refresh().add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self.report
+
+    def _start_refresh(self):
+        self._refresh = asyncio.get_running_loop().create_task(self._run())
+        return self._refresh
+
+    async def refresh(self):
+        """Build a new report, or join the build already in flight"""
+        if self._refresh is not None:
+            self.coalesced += 1
+            refresh = self._refresh
+        else:
+            refresh = self._start_refresh()
+        # A cancelled waiter must not cancel the build the other waiters share
+        return await asyncio.shield(refresh)
+
+    async def _run(self):
+        try:
+            report = await asyncio.get_running_loop().run_in_executor(self._executor, self._build)
+        except Exception as error:
+            self.last_error = f"{type(error).__name__}: {error}"
+            self._retry_at = time.monotonic() + self.ttl
+            logger.exception("Report build failed, retrying in %.0f s", self.ttl)
+            raise
+        finally:
+            self._refresh = None
+        self.report = report
+        self.builds += 1
+        self.last_error = None
+        logger.info("Report %d built in %.2f s", self.builds, report.build_seconds)
+        return report
+
+    async def run_periodically(self):
+        """Rebuild the report whenever it goes stale, until cancelled"""
+        while True:
+            if self._due():
+                try:
+                    await self.refresh()
+                except Exception:
+                    pass  # logged by _run; the previous report keeps being served
+            if self.report is not None and self.report.age < self.ttl:
+                delay = self.ttl - self.report.age
+            else:
+                delay = self._retry_at - time.monotonic()
+            await asyncio.sleep(max(delay, 0.05))
+
+    def status(self):
+        report = self.report
+        return {
+            'ttl': self.ttl,
+            'builds': self.builds,
+            'coalesced': self.coalesced,
+            'refreshing': self.refreshing,
+            'last_error': self.last_error,
+            'built_at': report.built_at if report else None,
+            'age': report.age if report else None,
+            'build_seconds': report.build_seconds if report else None,
+            'players': len(report.ranks) if report else None,
+        }
+
+    def close(self):
+        """Cancel the refresh in flight and stop the build thread"""
+        if self._refresh is not None:
+            self._refresh.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ReportService:
+    """
+    HTTP/1.1 server answering report requests from a ReportCache
+
+    Args:
+        cache (ReportCache): Shared report
+        host (str): Interface to bind
+        port (int): Port to bind, 0 picks a free one
+        idle_timeout (float): Seconds a connection may wait for its next
+            request before it is closed
+    """
+
+    def __init__(self, cache, host='127.0.0.1', port=8050, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.requests = 0
+        self._server = None
+        self._refresher = None
+        self._connections = set()
+        self._static = {}
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/"
+
+    async def start(self):
+        """Bind the port and start refreshing the report in the background"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._refresher = asyncio.get_running_loop().create_task(self.cache.run_periodically())
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        """Stop accepting, close the open connections and stop refreshing"""
+        self._refresher.cancel()
+        self._server.close()
+        # Idle keep-alive connections would otherwise stay open, and
+        # Server.wait_closed waits for every connection from Python 3.12.1
+        connections = list(self._connections)
+        for connection in connections:
+            connection.cancel()
+        if connections:
+            await asyncio.wait(connections)
+        self.cache.close()
+        await self._server.wait_closed()
+
+    @staticmethod
+    async def _read_head(reader):
+        """(request line, {lowercased header name: value}) of the next request"""
+        request_line = await reader.readline()
+        headers = {}
+        while request_line:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    async def _handle(self, reader, writer):
+        """Serve the requests of one keep-alive connection"""
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                request_line, headers = await asyncio.wait_for(self._read_head(reader), self.idle_timeout)
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    self._respond(writer, 400, _encode({'error': 'Bad request'}), keep_alive=False)
+                    break
+                method, target, version = parts
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                if method not in ('GET', 'HEAD'):
+                    # The request body, if any, is not read, so the connection cannot be reused
+                    self._respond(writer, 405, _encode({'error': 'Method not allowed'}), keep_alive=False)
+                    break
+                self.requests += 1
+                status, body, response_headers = await self._route(target, headers)
+                self._respond(writer, status, body, response_headers, keep_alive, head=method == 'HEAD')
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); a handler task that ends cancelled makes
+            # asyncio log a traceback per connection on Python 3.11
+            pass
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def _route(self, target, headers):
+        """(status, body, headers) of a GET request"""
+        url = urlsplit(target)
+        if url.path == '/status.json':
+            status = dict(self.cache.status(), requests=self.requests)
+            return 200, _encode(status), {'Cache-Control': 'no-cache'}
+        if url.path in ('/', '/index.html', '/plotly.min.js'):
+            return self._static_file(url.path, headers)
+        if url.path not in ('/summary.json', '/leaderboard.json', '/dashboard.json'):
+            return 404, _encode({'error': 'Not found'}), {}
+
+        try:
+            report = await self.cache.get()
+        except Exception:
+            return 503, _encode({'error': self.cache.last_error}), {'Retry-After': str(int(self.cache.ttl))}
+        response_headers = {
+            'ETag': report.etag,
+            'Cache-Control': f"max-age={max(int(self.cache.ttl - report.age), 0)}",
+            'X-Report-Age': f"{report.age:.1f}",
+        }
+        if headers.get('if-none-match') == report.etag:
+            return 304, b'', response_headers
+
+        query = parse_qs(url.query)
+        if url.path == '/leaderboard.json' and query:
+            try:
+                top = int(query.get('top', [DEFAULT_TOP])[-1])
+            except ValueError:
+                return 400, _encode({'error': 'top must be an integer'}), {}
+            return 200, _encode(report.leaderboard(top, query.get('player', ()))), response_headers
+        if url.path in report.gzipped and 'gzip' in headers.get('accept-encoding', ''):
+            response_headers['Content-Encoding'] = 'gzip'
+            return 200, report.gzipped[url.path], response_headers
+        return 200, report.bodies[url.path], response_headers
+
+    def _static_file(self, path, headers):
+        """The dashboard page and plotly.js, encoded on first use"""
+        if path not in self._static:
+            if path == '/plotly.min.js':
+                from plotly.offline import get_plotlyjs
+                body = get_plotlyjs().encode('utf-8')
+                content_type = 'application/javascript'
+            else:
+                body = (INDEX_HTML % {'refresh_ms': max(self.cache.ttl, 1) * 1000}).encode('utf-8')
+                content_type = 'text/html; charset=utf-8'
+            self._static[path] = (body, gzip.compress(body, 6), content_type)
+        body, gzipped, content_type = self._static[path]
+        response_headers = {'Content-Type': content_type, 'Cache-Control': 'max-age=3600'}
+        if 'gzip' in headers.get('accept-encoding', ''):
+            response_headers['Content-Encoding'] = 'gzip'
+            body = gzipped
+        return 200, body, response_headers
+
+    @staticmethod
+    def _respond(writer, status, body, headers=None, keep_alive=True, head=False):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not head and status != 304:
+            writer.write(body)
+
+
+async def _serve(analytics, source, ttl, host, port, leaderboard_size):
+    cache = ReportCache(lambda: build_report(analytics, source, leaderboard_size), ttl)
+    service = await ReportService(cache, host, port).start()
+    print(f"📡 Serving reports at {service.url} (refreshed every {ttl:g} s)")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.stop()
+
+
+def serve(analytics, source, ttl=DEFAULT_TTL, host='127.0.0.1', port=8050, leaderboard_size=DEFAULT_LEADERBOARD_SIZE):
+    """
+    Serve the reports of one source until interrupted
+
+    Args:
+        analytics (MorphRunnerRealtimeAnalytics): Client the reports are built with
+        source (dict): Source arguments of load_aggregates
+        ttl (float): Seconds between report refreshes
+    """
+    try:
+        asyncio.run(_serve(analytics, source, ttl, host, port, leaderboard_size))
+    except KeyboardInterrupt:
+        pass
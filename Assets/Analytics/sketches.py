@@ -0,0 +1,221 @@
+"""
+Bounded-size distributions of per-level event values.
+
+A FixedBinHistogram counts values in equal-width bins over a known range, so
+its memory does not grow with the number of events, two histograms over the same
+bins merge by adding counts, and (unlike t-digest or KLL) values can be
+retracted again, which the incrementally updated AggregateStore relies on. The
+dashboard draws its bars from the bins.
+
+ValueCounts keeps an exact count per distinct value. The game logs positions
+and health with two decimals, so the number of distinct values per level is
+bounded by that resolution rather than by the number of events, and range,
+mode and quantiles are those of the logged values themselves. Counts are
+retractable and mergeable like the bins; t-digest and KLL summaries are not
+retractable, which is why neither is used.
+"""
+import numpy as np
+
+# (low, high, bins) of the y-position histogram kept per level, 0.5 wide bins
+MISMATCH_Y_BINS = (0.0, 120.0, 240)   # obstacle y-positions, spawnY tops out around 106
+
+
+class FixedBinHistogram:
+    """
+    Counts of values in `bins` equal-width bins over [low, high)
+
+    Values below `low` or at/above `high` are counted in an underflow and an
+    overflow bin and are reported as `low` and `high` by the read methods.
+    """
+
+    def __init__(self, low, high, bins):
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = int(bins)
+        self.width = (self.high - self.low) / self.bins
+        # [underflow, bin 0, ..., bin n-1, overflow]
+        self.counts = np.zeros(self.bins + 2, dtype=np.int64)
+
+    @classmethod
+    def like(cls, other):
+        """An empty histogram with the same bins as `other`"""
+        return cls(other.low, other.high, other.bins)
+
+    def add(self, values, sign=1, weights=None):
+        """
+        Count (or with sign=-1 uncount) a batch of values
+
+        Args:
+            values: Sequence, array or Series of numbers
+            weights: Optional number of occurrences of each value
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return
+        index = np.floor((values - self.low) / self.width)
+        np.clip(index, -1, self.bins, out=index)
+        counts = np.bincount(index.astype(np.intp) + 1, weights=weights, minlength=self.bins + 2)
+        if weights is not None:
+            counts = counts.astype(np.int64)
+        if sign > 0:
+            self.counts += counts
+        else:
+            self.counts -= counts
+
+    def merge(self, other):
+        """Add the counts of a histogram with the same bins, in place"""
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts += other.counts
+        return self
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def edges(self):
+        return self.low + self.width * np.arange(self.bins + 1)
+
+    def _value(self, slot):
+        """Lower edge of a slot of self.counts, clamped to [low, high]"""
+        if slot == 0:
+            return self.low
+        if slot == self.bins + 1:
+            return self.high
+        return self.low + (slot - 1) * self.width
+
+    def quantiles(self, qs):
+        """
+        Approximate quantiles by linear interpolation inside bins
+
+        Args:
+            qs (list): Quantiles in [0, 1]
+
+        Returns:
+            list: One value per quantile, or Nones when empty
+        """
+        total = self.counts.sum()
+        if not total:
+            return [None] * len(qs)
+        cumulative = np.cumsum(self.counts)
+        result = []
+        for q in qs:
+            rank = q * total
+            slot = int(np.searchsorted(cumulative, rank, side='left'))
+            slot = min(slot, self.bins + 1)
+            if slot in (0, self.bins + 1):
+                result.append(self._value(slot))
+                continue
+            before = cumulative[slot - 1]
+            fraction = (rank - before) / self.counts[slot] if self.counts[slot] else 0.0
+            result.append(self._value(slot) + fraction * self.width)
+        return result
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def coarsen(self, factor):
+        """
+        Merge every `factor` adjacent bins, for plotting
+
+        Returns:
+            tuple: (left_edges, counts, width) of the in-range bins
+        """
+        usable = self.bins - self.bins % factor
+        counts = self.counts[1:usable + 1].reshape(-1, factor).sum(axis=1)
+        width = self.width * factor
+        return self.low + width * np.arange(len(counts)), counts, width
+
+
+class ValueCounts:
+    """
+    Exact number of occurrences of each distinct value
+
+    Values are keyed rounded to DECIMALS places, well below the two decimals
+    the game logs, so float32 and float64 copies of a value share one key.
+    """
+
+    DECIMALS = 4
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, values, sign=1, weights=None):
+        """
+        Count (or with sign=-1 uncount) a batch of values
+
+        Args:
+            values: Sequence, array or Series of numbers
+            weights: Optional number of occurrences of each value
+        """
+        table = self.counts
+        if weights is None and len(values) < 64:
+            # One user's values: a dict update beats numpy's per-call overhead
+            for value in values:
+                value = round(float(value), self.DECIMALS)
+                count = table.get(value, 0) + sign
+                if count:
+                    table[value] = count
+                else:
+                    del table[value]
+            return
+        values = np.round(np.asarray(values, dtype=np.float64), self.DECIMALS)
+        if weights is None:
+            distinct, counts = np.unique(values, return_counts=True)
+        else:
+            distinct, inverse = np.unique(values, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights).astype(np.int64)
+        for value, count in zip(distinct.tolist(), counts.tolist()):
+            count = table.get(value, 0) + sign * count
+            if count:
+                table[value] = count
+            else:
+                table.pop(value, None)
+
+    def merge(self, other):
+        """Add the counts of another ValueCounts, in place"""
+        table = self.counts
+        for value, count in other.counts.items():
+            table[value] = table.get(value, 0) + count
+        return self
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def min(self):
+        """Lowest value, or None when empty"""
+        return min(self.counts) if self.counts else None
+
+    def max(self):
+        """Highest value, or None when empty"""
+        return max(self.counts) if self.counts else None
+
+    def mode(self):
+        """Most frequent value (the lowest one on ties, like Series.mode), or None when empty"""
+        if not self.counts:
+            return None
+        top = max(self.counts.values())
+        return min(value for value, count in self.counts.items() if count == top)
+
+    def quantiles(self, qs):
+        """
+        Quantiles with linear interpolation between values, like Series.quantile
+
+        Args:
+            qs (list): Quantiles in [0, 1]
+
+        Returns:
+            list: One value per quantile, or Nones when empty
+        """
+        if not self.counts:
+            return [None] * len(qs)
+        values = np.array(sorted(self.counts))
+        cumulative = np.cumsum([self.counts[value] for value in values.tolist()])
+        positions = np.asarray(qs, dtype=np.float64) * (cumulative[-1] - 1)
+        below = values[np.searchsorted(cumulative, np.floor(positions), side='right')]
+        above = values[np.searchsorted(cumulative, np.ceil(positions), side='right')]
+        return (below + (positions - np.floor(positions)) * (above - below)).tolist()
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
@@ -0,0 +1,112 @@
+"""
+Persistent local snapshot of processed analytics data.
+
+A SQLite file keyed by user_id that stores a content hash (or Firebase ETag)
+per user next to that user's rows of the four analytics tables, so a refresh
+only has to reprocess users whose subtree changed since the last run.
+The tables use the AnalyticsStore schema and indexes, so a snapshot can also
+be queried with the AnalyticsStore lookups and aggregates.
+"""
+import pandas as pd
+
+from columnar import concat_frames
+from sql_store import TABLE_ORDER, AnalyticsStore
+
+CATEGORICAL_COLUMNS = ('user_id', 'username', 'level_name')
+
+
+class SnapshotCache(AnalyticsStore):
+    """
+    SQLite snapshot of processed users
+
+    Args:
+        path (str): Database file, created on first use
+    """
+
+    def __init__(self, path):
+        self._frames = None
+        super().__init__(path)
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, content_hash TEXT NOT NULL)")
+        super()._create_schema()
+
+    def content_hashes(self):
+        """
+        Returns:
+            dict: {user_id: content_hash} of every cached user
+        """
+        return dict(self.conn.execute("SELECT user_id, content_hash FROM users"))
+
+    def frames(self):
+        """
+        Cached DataFrames, loaded from disk on first access and kept in memory afterwards
+
+        Returns:
+            tuple: (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        if self._frames is None:
+            frames = []
+            for table in TABLE_ORDER:
+                df = pd.read_sql_query(f"SELECT * FROM {table}", self.conn)
+                if table != 'user_summaries':
+                    for column in CATEGORICAL_COLUMNS:
+                        df[column] = df[column].astype('category')
+                if table == 'mismatch_positions':
+                    df['y_position'] = df['y_position'].astype('float32')
+                frames.append(df)
+            self._frames = tuple(frames)
+        return self._frames
+
+    def user_frames(self, user_ids):
+        """
+        In-memory rows of the given users
+
+        Returns:
+            tuple: The four cached DataFrames restricted to `user_ids`
+        """
+        user_ids = set(user_ids)
+        return tuple(df[df['user_id'].isin(user_ids)] if not df.empty else df for df in self.frames())
+
+    def apply(self, changed_hashes, changed_frames, removed_ids=()):
+        """
+        Replace the rows of changed users and drop removed users, on disk and in memory
+
+        Args:
+            changed_hashes (dict): {user_id: content_hash} of new or changed users
+            changed_frames (tuple): The four DataFrames built from just those users
+            removed_ids (iterable): Users no longer present in the database
+
+        Returns:
+            tuple: Updated (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+        """
+        stale_ids = set(changed_hashes) | set(removed_ids)
+        current = self.frames()
+        if not stale_ids:
+            return current
+
+        with self.conn:
+            self._delete_users(stale_ids, ['users'] + TABLE_ORDER)
+            self.conn.executemany("INSERT INTO users VALUES (?, ?)", changed_hashes.items())
+            for table, df in zip(TABLE_ORDER, changed_frames):
+                if not df.empty:
+                    df.to_sql(table, self.conn, if_exists='append', index=False)
+
+        updated = []
+        for kept, fresh in zip(current, changed_frames):
+            if not kept.empty:
+                kept = kept[~kept['user_id'].isin(stale_ids)]
+            updated.append((kept, fresh))
+        self._frames = tuple(concat_frames(list(pair)) for pair in updated)
+        return self._frames
+
+    def upsert_frames(self, frames):
+        self._frames = None
+        return super().upsert_frames(frames)
+
+    def remove_users(self, user_ids):
+        self._frames = None
+        super().remove_users(user_ids)
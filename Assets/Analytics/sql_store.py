@@ -0,0 +1,289 @@
+"""
+Queryable SQLite store of the processed analytics tables.
+
+The four tables of process_user_data are upserted per user into one SQLite
+file with indexes on user_id, username and level_name and a leaderboard index
+on (score, accuracy). Point lookups (a player's summary, per-level stats or
+rank) are index seeks, and the console summary and dashboard aggregates are
+computed with GROUP BY queries inside SQLite, so only per-level totals, the
+distinct (level, value) counts behind the histograms and one row per player
+leave the database. pandas is not needed to query the store.
+
+Bulk loads that write at least as many users as are already stored drop the
+secondary indexes and rebuild them after the insert, which is cheaper than
+updating them row by row.
+
+The snapshot cache uses the same schema, so a snapshot file can be queried
+the same way.
+"""
+import sqlite3
+from collections import namedtuple
+
+import numpy as np
+
+from aggregate_store import AggregateStore, PlayerSummary
+from columnar import health_percentage
+from sketches import MISMATCH_Y_BINS, FixedBinHistogram
+
+TABLES = {
+    'user_summaries': [
+        ('user_id', 'TEXT'), ('username', 'TEXT'), ('registration_time', 'TEXT'),
+        ('total_deaths', 'INTEGER'), ('total_correct_matches', 'INTEGER'), ('total_mismatches', 'INTEGER'),
+        ('total_attempts', 'INTEGER'), ('overall_accuracy', 'REAL'), ('levels_played', 'INTEGER'),
+        ('score', 'INTEGER'),
+    ],
+    'level_details': [
+        ('user_id', 'TEXT'), ('username', 'TEXT'), ('level_name', 'TEXT'), ('deaths', 'INTEGER'),
+        ('correct_matches', 'INTEGER'), ('mismatches', 'INTEGER'), ('total_attempts', 'INTEGER'),
+        ('accuracy', 'REAL'),
+    ],
+    'mismatch_positions': [
+        ('user_id', 'TEXT'), ('username', 'TEXT'), ('level_name', 'TEXT'), ('y_position', 'REAL'),
+        ('position_id', 'TEXT'),
+    ],
+    'health_completions': [
+        ('user_id', 'TEXT'), ('username', 'TEXT'), ('level_name', 'TEXT'), ('health_remaining', 'REAL'),
+        ('health_percentage', 'REAL'), ('completion_count', 'INTEGER'),
+    ],
+}
+
+# Same order as the tuple returned by process_user_data
+TABLE_ORDER = ['user_summaries', 'level_details', 'mismatch_positions', 'health_completions']
+
+INDEXES = {
+    'user_summaries': [('username',), ('score DESC', 'overall_accuracy DESC', 'user_id')],
+    'level_details': [('username',), ('level_name',)],
+    'mismatch_positions': [('level_name', 'y_position')],
+    'health_completions': [('level_name', 'health_remaining')],
+}
+
+LevelStats = namedtuple('LevelStats', [
+    'level_name', 'deaths', 'correct_matches', 'mismatches', 'total_attempts', 'accuracy',
+])
+
+_PLAYER_COLUMNS = ', '.join(PlayerSummary._fields)
+
+
+def _index_name(table, columns):
+    return f"idx_{table}_" + '_'.join(column.split()[0] for column in columns)
+
+
+class AnalyticsStore:
+    """
+    SQLite file holding the four analytics tables
+
+    Args:
+        path (str): Database file, created on first use
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            for table, columns in TABLES.items():
+                column_sql = ', '.join(f"{name} {sql_type}" for name, sql_type in columns)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_sql})")
+            self._create_indexes()
+
+    def _create_indexes(self):
+        for table in TABLE_ORDER:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_id ON {table} (user_id)")
+            for index_columns in INDEXES[table]:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_index_name(table, index_columns)} "
+                                  f"ON {table} ({', '.join(index_columns)})")
+
+    def _drop_indexes(self):
+        for table in TABLE_ORDER:
+            self.conn.execute(f"DROP INDEX IF EXISTS idx_{table}_user_id")
+            for index_columns in INDEXES[table]:
+                self.conn.execute(f"DROP INDEX IF EXISTS {_index_name(table, index_columns)}")
+
+    def _delete_users(self, user_ids, tables):
+        """Delete the rows of `user_ids` from `tables`; call inside a transaction"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS stale_users (user_id TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM stale_users")
+        self.conn.executemany("INSERT INTO stale_users VALUES (?)", ((user_id,) for user_id in user_ids))
+        for table in tables:
+            self.conn.execute(f"DELETE FROM {table} WHERE user_id IN (SELECT user_id FROM stale_users)")
+
+    def upsert_frames(self, frames):
+        """
+        Replace the stored rows of every user in `frames` with the rows in `frames`
+
+        Accepts default and compact frames; a missing health_percentage is
+        derived from health_remaining.
+
+        Args:
+            frames (tuple): (user_summary_df, level_details_df, mismatch_positions_df, health_completion_df)
+
+        Returns:
+            int: Number of users written
+        """
+        user_ids = set()
+        for df in frames:
+            if not df.empty:
+                user_ids.update(df['user_id'].unique().tolist())
+        if not user_ids:
+            return 0
+
+        bulk = len(user_ids) >= self.player_count
+        with self.conn:
+            self._delete_users(user_ids, TABLE_ORDER)
+            if bulk:
+                self._drop_indexes()
+            for table, df in zip(TABLE_ORDER, frames):
+                if df.empty:
+                    continue
+                names = [name for name, _ in TABLES[table]]
+                columns = []
+                for name in names:
+                    if name == 'health_percentage':
+                        columns.append(health_percentage(df).tolist())
+                    elif name in df:
+                        columns.append(df[name].tolist())
+                    else:
+                        columns.append([None] * len(df))
+                self.conn.executemany(f"INSERT INTO {table} ({', '.join(names)}) "
+                                      f"VALUES ({', '.join('?' * len(names))})", zip(*columns))
+            if bulk:
+                self._create_indexes()
+        return len(user_ids)
+
+    def remove_users(self, user_ids):
+        """Delete every row of the given users"""
+        with self.conn:
+            self._delete_users(set(user_ids), TABLE_ORDER)
+
+    # Point lookups
+
+    @property
+    def player_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM user_summaries").fetchone()[0]
+
+    def player(self, user_id):
+        """
+        Returns:
+            PlayerSummary: The player's totals, or None if the player is not stored
+        """
+        row = self.conn.execute(f"SELECT {_PLAYER_COLUMNS} FROM user_summaries WHERE user_id = ?",
+                                (user_id,)).fetchone()
+        return PlayerSummary._make(row) if row else None
+
+    def find_players(self, username, prefix=False):
+        """
+        Players with a username, or with a username starting with `username`
+
+        Returns:
+            list: PlayerSummary per match, best score first
+        """
+        if prefix:
+            # A range on the username index; U+10FFFF sorts after any other character
+            where, params = "username >= ? AND username < ?", (username, username + '\U0010ffff')
+        else:
+            where, params = "username = ?", (username,)
+        rows = self.conn.execute(f"SELECT {_PLAYER_COLUMNS} FROM user_summaries WHERE {where} "
+                                 f"ORDER BY score DESC, overall_accuracy DESC, user_id", params)
+        return [PlayerSummary._make(row) for row in rows]
+
+    def player_levels(self, user_id):
+        """
+        Returns:
+            list: LevelStats of each level the player has match statistics for
+        """
+        rows = self.conn.execute("SELECT level_name, deaths, correct_matches, mismatches, total_attempts, accuracy "
+                                 "FROM level_details WHERE user_id = ? ORDER BY level_name", (user_id,))
+        return [LevelStats._make(row) for row in rows]
+
+    def player_rank(self, user_id):
+        """
+        1-based leaderboard position, ordered like Leaderboard (score, then
+        accuracy, then user_id), or None if the player is not stored
+        """
+        player = self.player(user_id)
+        if player is None:
+            return None
+        # Three range counts on the leaderboard index; one OR'ed predicate would scan the table
+        ahead = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM user_summaries WHERE score > ?) "
+            "+ (SELECT COUNT(*) FROM user_summaries WHERE score = ? AND overall_accuracy > ?) "
+            "+ (SELECT COUNT(*) FROM user_summaries WHERE score = ? AND overall_accuracy = ? AND user_id < ?)",
+            (player.score, player.score, player.overall_accuracy, player.score, player.overall_accuracy,
+             user_id)).fetchone()[0]
+        return ahead + 1
+
+    def top_players(self, k=10):
+        """Highest scoring players, best first, read from the leaderboard index"""
+        rows = self.conn.execute(f"SELECT {_PLAYER_COLUMNS} FROM user_summaries "
+                                 f"ORDER BY score DESC, overall_accuracy DESC, user_id LIMIT ?", (k,))
+        return [PlayerSummary._make(row) for row in rows]
+
+    # Aggregates pushed down to SQLite
+
+    def level_totals(self):
+        """
+        Per-level totals of the four tables, computed with GROUP BY queries
+
+        Returns:
+            dict: {level_name: {LevelAggregate attribute: value}}, including
+                `health_values` and `mismatch_y_values` (values, counts)
+                arrays and the `mismatch_y_histogram` count array
+        """
+        totals = {}
+        for row in self.conn.execute(
+                "SELECT level_name, SUM(deaths), SUM(correct_matches), SUM(mismatches), SUM(total_attempts), "
+                "SUM(accuracy), COUNT(*) FROM level_details GROUP BY level_name"):
+            totals.setdefault(row[0], {}).update(zip(
+                ('deaths', 'correct_matches', 'mismatches', 'total_attempts', 'accuracy_sum', 'players'), row[1:]))
+
+        for table, column, prefix, count_name in (
+                ('health_completions', 'health_remaining', 'health', 'health_count'),
+                ('mismatch_positions', 'y_position', 'mismatch_y', 'mismatch_count')):
+            for level_name, (values, counts) in self._value_counts(table, column).items():
+                level = totals.setdefault(level_name, {})
+                level.update({
+                    count_name: int(counts.sum()),
+                    f'{prefix}_sum': float(values @ counts),
+                    f'{prefix}_values': (values, counts),
+                })
+                if prefix == 'mismatch_y':
+                    histogram = FixedBinHistogram(*MISMATCH_Y_BINS)
+                    histogram.add(values, weights=counts)
+                    level['mismatch_y_histogram'] = histogram.counts
+        return totals
+
+    def _value_counts(self, table, column):
+        """
+        {level_name: (distinct values, counts)} of a per-level value column
+
+        Grouping by the exact values streams the (level_name, value) covering
+        index in order, without the temporary b-tree a computed bin would need.
+        """
+        rows = self.conn.execute(f"SELECT level_name, {column}, COUNT(*) FROM {table} "
+                                 f"WHERE {column} IS NOT NULL GROUP BY level_name, {column}").fetchall()
+        grouped = {}
+        for level_name, value, count in rows:
+            entry = grouped.get(level_name)
+            if entry is None:
+                entry = grouped[level_name] = ([], [])
+            entry[0].append(value)
+            entry[1].append(count)
+        return {level_name: (np.array(values, dtype=np.float64), np.array(counts, dtype=np.int64))
+                for level_name, (values, counts) in grouped.items()}
+
+    def aggregates(self):
+        """
+        AggregateStore of the stored tables, built from SQL aggregations and
+        one scan of user_summaries instead of DataFrames
+
+        Returns:
+            AggregateStore: Aggregates read by the console summary and dashboard
+        """
+        players = (PlayerSummary._make(row)
+                   for row in self.conn.execute(f"SELECT {_PLAYER_COLUMNS} FROM user_summaries"))
+        return AggregateStore.from_totals(players, self.level_totals())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,118 @@
+"""
+Synthetic Firebase payloads shaped like the tree ObstacleMismatchLogging.cs writes.
+
+Used by the benchmarks so performance work can be measured without a live
+Realtime Database. Besides the fields the analytics read, users carry the
+`health_progression` sessions and `current_level_health` values the game logs,
+so payload sizes match production. With `skew` > 0 player activity follows a
+Pareto distribution: most players log a handful of events and a few log
+hundreds, like a real player base.
+"""
+import random
+import string
+import uuid
+from datetime import datetime, timedelta
+
+LEVELS = ['Level1', 'Level2', 'Level3', 'Level4']
+PUSH_ID_CHARS = '-' + string.digits + string.ascii_uppercase + '_' + string.ascii_lowercase
+# Registrations are spread over this many days before REGISTRATION_END
+REGISTRATION_DAYS = 365
+REGISTRATION_END = datetime(2025, 12, 31)
+
+
+def make_push_id(rng):
+    """Return a 20 character key in the style of a Firebase push id"""
+    return '-' + ''.join(rng.choice(PUSH_ID_CHARS) for _ in range(19))
+
+
+def _activity(rng, skew):
+    """Multiplier on a player's event counts; 1 without skew, Pareto-distributed otherwise"""
+    if not skew:
+        return 1.0
+    # Pareto with shape 1/skew, scaled so the median player is close to the unskewed one
+    return min(rng.paretovariate(1.0 / skew) * 0.7, 50.0)
+
+
+def generate_user(rng, levels=LEVELS, skew=0.0):
+    """
+    Generate a single user subtree
+
+    Args:
+        rng (random.Random): Random source
+        levels (list): Level names the player may have reached
+        skew (float): 0 for uniform activity, higher values for a heavier
+            tail of very active players (0.5 is a realistic choice)
+
+    Returns:
+        tuple: (user_id, user_data)
+    """
+    user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    registered = REGISTRATION_END - timedelta(seconds=rng.randrange(REGISTRATION_DAYS * 86400))
+    user_data = {
+        'username': f'Player{rng.randint(1, 999999)}',
+        'registration_time': registered.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    }
+    activity = _activity(rng, skew)
+
+    match_stats = {}
+    completion_stats = {}
+    current_level_health = {}
+    reached = levels[:rng.randint(1, len(levels))]
+    for level_name in reached:
+        match_count = int(rng.randint(0, 40) * activity)
+        mismatch_count = int(rng.randint(0, 10) * activity)
+        match_stats[level_name] = {
+            'obstacle_match_count': match_count,
+            'obstacle_mismatch_count': mismatch_count,
+            'obstacle_mismatch_positions': {
+                make_push_id(rng): round(rng.uniform(0.0, 110.0), 2) for _ in range(mismatch_count)
+            }
+        }
+        user_data[f'{level_name}_death_times'] = int(rng.randint(0, 8) * activity)
+        current_level_health[level_name] = round(rng.uniform(0.0, 100.0), 2)
+
+        if rng.random() < 0.6:
+            completion_count = max(1, int(rng.randint(1, 3) * activity))
+            completion_stats[level_name] = {
+                'completion_count': completion_count,
+                'obstacle_match_count': match_count,
+                'obstacle_mismatch_count': mismatch_count,
+                'score': match_count * 10 - mismatch_count * 20,
+                'health_remaining_values': {
+                    make_push_id(rng): round(rng.uniform(5.0, 100.0), 2) for _ in range(completion_count)
+                }
+            }
+
+    # One health snapshot per play session, keyed by the session start time
+    health_progression = {}
+    session = registered
+    for _ in range(max(1, int(rng.randint(1, 4) * activity))):
+        session += timedelta(seconds=rng.randrange(3600, 14 * 86400))
+        health_progression[session.strftime('%Y%m%d_%H%M%S')] = {
+            f'level{index}': round(rng.uniform(0.0, 100.0), 2) if f'Level{index}' in reached else 0.0
+            for index in range(1, 5)
+        }
+
+    user_data['match_stats'] = match_stats
+    user_data['current_level_health'] = current_level_health
+    user_data['health_progression'] = health_progression
+    if completion_stats:
+        user_data['completion_stats'] = completion_stats
+    return user_id, user_data
+
+
+def generate_users(num_users, seed=0, levels=LEVELS, skew=0.0):
+    """
+    Generate a complete `users` tree
+
+    Args:
+        num_users (int): Number of players to generate
+        seed (int): Seed for reproducible output
+        levels (list): Level names the players may have reached
+        skew (float): Activity skew, see generate_user
+
+    Returns:
+        dict: {user_id: user_data} as returned by GET users.json
+    """
+    rng = random.Random(seed)
+    return dict(generate_user(rng, levels, skew) for _ in range(num_users))
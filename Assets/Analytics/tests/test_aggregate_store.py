@@ -0,0 +1,104 @@
+"""
+Correctness checks for the AggregateStore distributions.
+
+The range, mode and quantiles of health at completion and mismatch
+y-positions are compared against pandas on the flattened tables, for stores
+built from DataFrames, from raw users, from SQLite totals and after users are
+replaced (retracted and re-added).
+
+Usage (needs pytest):
+    python -m pytest tests/test_aggregate_store.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregate_store import AggregateStore
+from analytics import MorphRunnerRealtimeAnalytics
+from columnar import parse_user
+from sketches import ValueCounts
+from sql_store import AnalyticsStore
+from synthetic_data import generate_users
+
+
+@pytest.fixture(scope='module')
+def raw_data():
+    users = generate_users(300, seed=5, skew=0.5)
+    # Exact extremes the summary must print as logged, not as bin edges
+    first = next(iter(users.values()))
+    first['completion_stats'] = {'Level1': {'completion_count': 2, 'health_remaining_values': {'a': 100.0, 'b': 5.1}}}
+    return users
+
+
+@pytest.fixture(scope='module')
+def frames(raw_data):
+    return MorphRunnerRealtimeAnalytics().process_user_data(raw_data)
+
+
+def _expected(frames):
+    _, _, mismatch_df, health_df = frames
+    health = health_df['health_remaining'].astype('float64').round(4)
+    y_positions = mismatch_df['y_position'].astype('float64').round(4)
+    return {
+        'health_range': (health.min(), health.max()),
+        'health_quantiles': health.quantile([0.5, 0.9]).tolist(),
+        'most_common_y': y_positions.mode().iloc[0],
+        'y_quantiles': y_positions.quantile([0.5, 0.9]).tolist(),
+    }
+
+
+def _assert_matches(store, expected):
+    assert store.health_range() == pytest.approx(expected['health_range'])
+    assert store.health_values().quantiles([0.5, 0.9]) == pytest.approx(expected['health_quantiles'])
+    assert store.most_common_mismatch_y() == pytest.approx(expected['most_common_y'])
+    assert store.mismatch_y_values().quantiles([0.5, 0.9]) == pytest.approx(expected['y_quantiles'])
+
+
+def test_frames_store_matches_pandas(frames):
+    store = AggregateStore.from_frames(*frames)
+    expected = _expected(frames)
+    assert expected['health_range'][1] == 100.0 and expected['health_range'][0] <= 5.1
+    _assert_matches(store, expected)
+
+
+def test_user_records_store_matches_pandas(raw_data, frames):
+    store = MorphRunnerRealtimeAnalytics().build_aggregates_from_users(raw_data)
+    _assert_matches(store, _expected(frames))
+
+
+def test_sql_store_matches_pandas(tmp_path, frames):
+    store = AnalyticsStore(str(tmp_path / 'analytics.db'))
+    try:
+        store.upsert_frames(frames)
+        _assert_matches(store.aggregates(), _expected(frames))
+    finally:
+        store.close()
+
+
+def test_replaced_users_are_retracted_exactly(raw_data, frames):
+    store = MorphRunnerRealtimeAnalytics().build_aggregates_from_users(raw_data)
+    # Replace every user with an empty record and back again
+    for user_id in raw_data:
+        store.replace_user(user_id, parse_user(user_id, {'username': 'gone'}))
+    assert store.health_values().count == 0 and store.mismatch_y_values().count == 0
+    for user_id, user_data in raw_data.items():
+        store.replace_user(user_id, parse_user(user_id, user_data))
+    _assert_matches(store, _expected(frames))
+
+    frame_store = AggregateStore.from_frames(*frames)
+    frame_store.add_frames(*frames, sign=-1)
+    assert not frame_store.levels
+
+
+def test_value_counts_quantiles_match_numpy():
+    values = np.random.default_rng(0).integers(0, 50, 1001) / 4
+    counts = ValueCounts()
+    counts.add(values)
+    qs = [0, 0.1, 0.25, 0.5, 0.9, 0.99, 1]
+    assert counts.quantiles(qs) == pytest.approx(np.quantile(values, qs).tolist())
+    counts.add(values[:500], sign=-1)
+    assert counts.quantiles(qs) == pytest.approx(np.quantile(values[500:], qs).tolist())
@@ -0,0 +1,110 @@
+"""
+Correctness checks for the PlayerActivity queries.
+
+active_players and retention are compared against brute-force counts over
+the raw sessions of a small synthetic player base, so the difference-array
+and day-offset arithmetic in cohorts.py can be changed safely.
+
+Usage (needs pytest):
+    python -m pytest tests/test_cohorts.py
+"""
+import math
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cohorts import build_player_activity
+from synthetic_data import generate_users
+
+
+@pytest.fixture(scope='module')
+def raw_data():
+    return generate_users(300, seed=3, skew=0.5)
+
+
+@pytest.fixture(scope='module')
+def activity(raw_data):
+    return build_player_activity(raw_data)
+
+
+def _session_days(raw_data):
+    """{user_id: set of session days} and {user_id: registration day}"""
+    sessions, registered = {}, {}
+    for user_id, user_data in raw_data.items():
+        registered[user_id] = date.fromisoformat(user_data['registration_time'][:10])
+        sessions[user_id] = {date(int(key[:4]), int(key[4:6]), int(key[6:8]))
+                             for key in user_data.get('health_progression', {})}
+    return sessions, registered
+
+
+def _cohort_start(day, cohort_freq):
+    if cohort_freq == 'W':
+        # pandas weekly periods end on Sunday, so they start on Monday
+        return day - timedelta(days=day.weekday())
+    if cohort_freq == 'M':
+        return day.replace(day=1)
+    return day
+
+
+@pytest.mark.parametrize('window', [1, 7, 30])
+def test_active_players_matches_brute_force(raw_data, activity, window):
+    sessions, _ = _session_days(raw_data)
+    result = activity.active_players(window)
+    for day, count in result.items():
+        day = day.date()
+        expected = sum(1 for days in sessions.values()
+                       if any(day - timedelta(days=window - 1) <= active <= day for active in days))
+        assert count == expected, day
+
+
+@pytest.mark.parametrize('cohort_freq', ['D', 'W', 'M'])
+@pytest.mark.parametrize('until', [None, '2025-12-20'])
+def test_retention_matches_brute_force(raw_data, activity, cohort_freq, until):
+    max_day = 30
+    sessions, registered = _session_days(raw_data)
+    end = date.fromisoformat(until) if until else max(day for days in sessions.values() for day in days)
+    table = activity.retention(max_day, cohort_freq, until)
+
+    members = {}
+    for user_id, day in registered.items():
+        members.setdefault(_cohort_start(day, cohort_freq), []).append(user_id)
+    assert sorted(table.index.date) == sorted(members)
+
+    for cohort, user_ids in members.items():
+        row = table.loc[str(cohort)]
+        assert row['players'] == len(user_ids)
+        for offset in range(max_day + 1):
+            eligible = [user_id for user_id in user_ids if registered[user_id] + timedelta(days=offset) <= end]
+            if not eligible:
+                assert math.isnan(row[offset]), (cohort, offset)
+                continue
+            active = sum(1 for user_id in eligible
+                         if registered[user_id] + timedelta(days=offset) in sessions[user_id])
+            assert row[offset] == pytest.approx(active / len(eligible)), (cohort, offset)
+
+
+def test_retention_unknown_for_cohorts_younger_than_the_day():
+    raw_data = {
+        'a': {'registration_time': '2026-01-01T10:00:00Z',
+              'health_progression': {'20260102_120000': {'level1': 50.0}, '20260108_120000': {'level1': 40.0}}},
+        'b': {'registration_time': '2026-01-09T10:00:00Z',
+              'health_progression': {'20260110_120000': {'level1': 70.0}}},
+    }
+    table = build_player_activity(raw_data).retention(7, 'D')
+    assert table.loc['2026-01-01', 7] == 1.0
+    assert table.loc['2026-01-09', 1] == 1.0
+    assert math.isnan(table.loc['2026-01-09', 7])
+
+
+def test_levels_without_sessions_are_not_reported():
+    users = {'u1': {'registration_time': '2025-03-01T10:00:00Z',
+                    'health_progression': {'20250301_100000': {'level1': 50.0, 'level4': 0.0}},
+                    'current_level_health': {'Level1': 50.0}}}
+    activity = build_player_activity(users)
+    # Every progression level is a category of the session table, used or not
+    assert list(activity.level_health_trend().columns) == ['Level1']
+    assert list(activity.current_health_by_level().index) == ['Level1']
@@ -0,0 +1,116 @@
+"""
+Durability of the IngestService event log and checkpoints.
+
+Writes acknowledged by the service must survive a restart: after a clean
+stop, after SIGKILL of a service process with and without checkpoints in
+between, and with a torn last record left in the log by a crash.
+
+Usage (needs pytest):
+    python -m pytest tests/test_ingest_service.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import requests
+
+ANALYTICS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ANALYTICS_DIR)
+
+from ingest_service import IngestService
+
+
+def _flush(url, user_id, batch):
+    """Send one flush like ObstacleMismatchLogging: counters as increments, positions pushed"""
+    update = {f'match_stats/Level1/{name}': {'.sv': {'increment': count}} for name, count in batch.items()}
+    update[f'match_stats/Level1/obstacle_mismatch_positions/p{sum(batch.values()):04d}'] = 12.5
+    response = requests.patch(f"{url}users/{user_id}.json", json=update, timeout=5)
+    response.raise_for_status()
+
+
+def _expected_counts(flushes):
+    counts = {}
+    for user_id, batch in flushes:
+        for name, count in batch.items():
+            counts[user_id, name] = counts.get((user_id, name), 0) + count
+    return counts
+
+
+def _assert_counts(service, counts):
+    for (user_id, name), count in counts.items():
+        assert service.get(f'users/{user_id}/match_stats/Level1/{name}') == count
+
+
+FLUSHES = [(f'user-{i % 3}', {'obstacle_match_count': i + 1, 'obstacle_mismatch_count': i % 2}) for i in range(10)]
+
+
+def test_restart_after_stop_replays_the_log_onto_the_checkpoint(tmp_path):
+    log_path = str(tmp_path / 'events.jsonl')
+    with IngestService(log_path) as service:
+        for user_id, batch in FLUSHES[:4]:
+            _flush(service.url, user_id, batch)
+        service.checkpoint()
+        for user_id, batch in FLUSHES[4:]:
+            _flush(service.url, user_id, batch)
+        tree = json.loads(json.dumps(service.tree))
+
+    restarted = IngestService(log_path)
+    try:
+        assert restarted.recovered_writes == len(FLUSHES) - 4
+        assert restarted.tree == tree
+        _assert_counts(restarted, _expected_counts(FLUSHES))
+    finally:
+        restarted.stop()
+
+
+def test_nothing_acknowledged_is_lost_when_the_process_is_killed(tmp_path):
+    log_path = str(tmp_path / 'events.jsonl')
+    acknowledged = []
+    # Two service processes in a row, killed without a clean shutdown; the
+    # first checkpoints every 3 writes, so recovery needs checkpoint and log
+    for checkpoint_every, flushes in (('3', FLUSHES[:7]), ('0', FLUSHES[7:])):
+        process = subprocess.Popen([sys.executable, '-u', 'ingest_service.py', '--log', log_path, '--port', '0',
+                                    '--checkpoint-every', checkpoint_every],
+                                   cwd=ANALYTICS_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            for line in process.stdout:
+                if line.startswith('Ingesting at '):
+                    url = line.split()[-1]
+                    break
+            for user_id, batch in flushes:
+                _flush(url, user_id, batch)
+                acknowledged.append((user_id, batch))
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+
+    restarted = IngestService(log_path)
+    try:
+        _assert_counts(restarted, _expected_counts(acknowledged))
+        positions = restarted.get('users/user-0/match_stats/Level1/obstacle_mismatch_positions')
+        assert len(positions) == sum(1 for user_id, _ in acknowledged if user_id == 'user-0')
+    finally:
+        restarted.stop()
+
+
+def test_torn_last_record_is_dropped(tmp_path):
+    log_path = str(tmp_path / 'events.jsonl')
+    with IngestService(log_path) as service:
+        for user_id, batch in FLUSHES[:3]:
+            _flush(service.url, user_id, batch)
+    # A crash in the middle of appending a record that was never acknowledged
+    with open(log_path, 'a', encoding='utf-8') as log:
+        log.write('["patch","users/user-0",{"match_st')
+
+    with IngestService(log_path) as restarted:
+        assert restarted.recovered_writes == 3
+        _assert_counts(restarted, _expected_counts(FLUSHES[:3]))
+        # Later writes are logged as records of their own and recovered too
+        _flush(restarted.url, *FLUSHES[3])
+    again = IngestService(log_path)
+    try:
+        _assert_counts(again, _expected_counts(FLUSHES[:4]))
+    finally:
+        again.stop()
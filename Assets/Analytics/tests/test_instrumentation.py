@@ -0,0 +1,47 @@
+"""
+Checks of the per-stage pipeline metrics.
+
+Usage (needs pytest):
+    python -m pytest tests/test_instrumentation.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ANALYTICS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ANALYTICS_DIR)
+
+from instrumentation import peak_rss_bytes
+
+MIB = 1024 * 1024
+
+# Run in a fresh process, so the peak left by earlier tests does not hide the allocation.
+# Linux carries ru_maxrss across exec, so the block is sized past the inherited peak.
+STAGES_SCRIPT = """
+import json
+from instrumentation import PipelineMetrics, peak_rss_bytes
+size = peak_rss_bytes() + 200 * 1024 * 1024
+metrics = PipelineMetrics()
+with metrics.stage('allocate'):
+    block = b'x' * size
+    del block
+with metrics.stage('idle'):
+    pass
+print(json.dumps(metrics.finish()))
+"""
+
+
+@pytest.mark.skipif(peak_rss_bytes() is None, reason='resource module not available')
+def test_rss_growth_is_attributed_to_the_stage_that_allocated():
+    output = subprocess.run([sys.executable, '-c', STAGES_SCRIPT], cwd=ANALYTICS_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    summary = json.loads(output)
+
+    allocate, idle = summary['stages']
+    assert allocate['peak_rss_growth_bytes'] >= 150 * MIB
+    # A later, smaller stage does not inherit the earlier stage's peak
+    assert idle['peak_rss_growth_bytes'] < 10 * MIB
+    assert summary['process_peak_rss_bytes'] >= allocate['peak_rss_growth_bytes']
@@ -0,0 +1,92 @@
+"""
+Live event stream against the local FirebaseStub.
+
+Drives the stub's text/event-stream endpoint with put and patch writes, idle
+keep-alives and a terminal auth_revoked event, and checks what
+stream_user_events yields and what run_live_dashboard aggregates from it.
+
+Usage (needs pytest):
+    python -m pytest tests/test_live.py
+"""
+import copy
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from firebase_stub import FirebaseStub
+from live import iter_sse_events, iter_stream_lines
+from synthetic_data import generate_users
+
+
+def _wait_for_subscriber(stub, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not stub.subscribers:
+        assert time.monotonic() < deadline, 'stream never subscribed'
+        time.sleep(0.01)
+
+
+def test_stream_sends_keep_alives_while_idle():
+    users = {'u1': {'username': 'First'}}
+    with FirebaseStub({'users': users}, keep_alive=0.05) as stub:
+        with requests.get(f"{stub.url}users.json", headers={'Accept': 'text/event-stream'}, stream=True,
+                          timeout=5) as response:
+            events = iter_sse_events(iter_stream_lines(response.raw.read1))
+            assert next(events) == ('put', {'path': '/', 'data': users})
+            assert next(events) == ('keep-alive', None)
+            stub.close_streams()
+            rest = list(events)
+    assert rest[-1] == ('auth_revoked', 'credential is no longer valid')
+    assert all(event == ('keep-alive', None) for event in rest[:-1])
+
+
+def test_stream_user_events_yields_put_and_patch_until_auth_revoked():
+    users = {'u1': {'username': 'First'}, 'u2': {'username': 'Second'}}
+    with FirebaseStub({'users': users}, keep_alive=0.05) as stub:
+        analytics = MorphRunnerRealtimeAnalytics(stub.url)
+        stream = analytics.stream_user_events(reconnect=False)
+        assert next(stream) == ('put', '/', users)
+
+        stub.put('users/u1/username', 'Renamed')
+        stub.patch('users', {'u2/Level1_death_times': 3, 'u3': {'username': 'Third'}})
+        time.sleep(0.2)  # idle long enough for keep-alives, which are not yielded
+        stub.close_streams('auth_revoked')
+
+        assert list(stream) == [
+            ('put', '/u1/username', 'Renamed'),
+            ('patch', '/', {'u2/Level1_death_times': 3, 'u3': {'username': 'Third'}}),
+        ]
+
+
+def test_run_live_dashboard_tracks_writes_until_the_stream_ends():
+    users = generate_users(20, seed=1)
+    with FirebaseStub({'users': copy.deepcopy(users)}, keep_alive=0.05) as stub:
+        analytics = MorphRunnerRealtimeAnalytics(stub.url)
+        new_user = generate_users(1, seed=2)
+        removed = next(iter(users))
+
+        def write():
+            _wait_for_subscriber(stub)
+            stub.patch('users', new_user)
+            stub.put(f'users/{removed}', None)
+            time.sleep(0.1)
+            stub.close_streams()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        store = analytics.run_live_dashboard(on_update=lambda store: None, min_interval=0)
+        writer.join()
+
+    expected = dict(users, **new_user)
+    expected.pop(removed)
+    reference = MorphRunnerRealtimeAnalytics().build_aggregates_from_users(expected)
+    assert set(store.records) == set(reference.records)
+    assert store.total_deaths == reference.total_deaths
+    assert store.mismatch_count == reference.mismatch_count
+    assert [player.user_id for player in store.top_players(5)] == \
+        [player.user_id for player in reference.top_players(5)]
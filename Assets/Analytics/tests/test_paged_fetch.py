@@ -0,0 +1,56 @@
+"""
+Paged fetching against the local FirebaseStub.
+
+fetch_users_pages follows a startAt cursor computed client-side; these tests
+page through a users tree mixing integer-like and string keys and check that
+every user arrives exactly once, in orderBy="$key" order, and that a failure
+after the first page is raised rather than taken for the end of the data.
+
+Usage (needs pytest):
+    python -m pytest tests/test_paged_fetch.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import MorphRunnerRealtimeAnalytics
+from firebase_stub import FirebaseStub
+
+# The order the Realtime Database returns these keys in with orderBy="$key":
+# 32-bit integer keys numerically, then everything else as strings
+ORDERED_KEYS = [
+    '-2147483648', '-5', '0', '3', '10', '2147483647',
+    '-', '-2147483649', '-MxYz0000000000000000', '1.5', '2147483648', 'Abc', 'abc',
+    'b3f1c2d4-0000-4000-8000-000000000000', '²',
+]
+
+
+@pytest.fixture(scope='module')
+def stub():
+    users = {key: {'username': f'Player {key}'} for key in reversed(ORDERED_KEYS)}
+    with FirebaseStub({'users': users}) as server:
+        yield server
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 7, len(ORDERED_KEYS), 100])
+def test_pages_cover_every_user_in_key_order(stub, page_size):
+    analytics = MorphRunnerRealtimeAnalytics(stub.url)
+    pages = list(analytics.fetch_users_pages(page_size))
+    keys = [key for page in pages for key in page]
+    assert keys == ORDERED_KEYS
+    assert all(len(page) <= page_size for page in pages)
+
+
+def test_failure_after_the_first_page_raises(stub):
+    analytics = MorphRunnerRealtimeAnalytics(stub.url, max_retries=0)
+    pages = analytics.fetch_users_pages(5)
+    assert len(next(pages)) == 5
+    stub.failure_rate = 1.0
+    try:
+        with pytest.raises(RuntimeError, match='page 2'):
+            next(pages)
+    finally:
+        stub.failure_rate = 0.0
@@ -0,0 +1,147 @@
+"""
+Correctness checks for the report service.
+
+Covers single-flight report builds, ETag revalidation, 503 while no report
+could be built, and shutting down with idle keep-alive connections open.
+The reports are built by stub functions, so no data source is needed.
+
+Usage (needs pytest):
+    python -m pytest tests/test_report_service.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_service import Report, ReportCache, ReportService
+
+
+def _report():
+    return Report({'players': {'total': 0}}, [], {}, '{"data": []}', 0.0)
+
+
+def _slow_build(calls, seconds=0.2):
+    def build():
+        calls.append(threading.get_ident())
+        time.sleep(seconds)
+        return _report()
+    return build
+
+
+async def _request(port, path, headers=None, connection=None):
+    """(status, {header: value}) of one GET, on a new or the given keep-alive (reader, writer)"""
+    reader, writer = connection or await asyncio.open_connection('127.0.0.1', port)
+    lines = [f"GET {path} HTTP/1.1", 'Host: localhost']
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(response_headers.get('content-length', 0)))
+    if connection is None:
+        writer.close()
+    return status, response_headers
+
+
+def test_concurrent_requests_share_one_build():
+    async def run():
+        calls = []
+        cache = ReportCache(_slow_build(calls), ttl=60)
+        reports = await asyncio.gather(*(cache.get() for _ in range(20)))
+        cache.close()
+        return calls, cache, reports
+
+    calls, cache, reports = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.builds == 1 and cache.coalesced == 19
+    assert all(report is reports[0] for report in reports)
+
+
+def test_stale_report_is_served_while_one_refresh_runs():
+    async def run():
+        calls = []
+        cache = ReportCache(_slow_build(calls), ttl=0.05)
+        first = await cache.get()
+        await asyncio.sleep(0.1)
+        served = await asyncio.gather(*(cache.get() for _ in range(10)))
+        await cache.refresh()
+        cache.close()
+        return calls, first, served, cache
+
+    calls, first, served, cache = asyncio.run(run())
+    assert all(report is first for report in served)
+    assert len(calls) == 2 and cache.report is not first
+
+
+def test_etag_revalidation_returns_304():
+    async def run():
+        service = await ReportService(ReportCache(_report, ttl=60), port=0).start()
+        try:
+            status, headers = await _request(service.port, '/summary.json')
+            revalidated = await _request(service.port, '/summary.json', {'If-None-Match': headers['etag']})
+            changed = await _request(service.port, '/summary.json', {'If-None-Match': '"0"'})
+        finally:
+            await service.stop()
+        return status, revalidated, changed
+
+    status, revalidated, changed = asyncio.run(run())
+    assert status == 200
+    assert revalidated[0] == 304 and 'content-length' not in revalidated[1]
+    assert changed[0] == 200
+
+
+def test_failed_build_returns_503_until_retry():
+    calls = []
+
+    def failing_build():
+        calls.append(1)
+        raise OSError('source unavailable')
+
+    async def run():
+        service = await ReportService(ReportCache(failing_build, ttl=60), port=0).start()
+        try:
+            first = await _request(service.port, '/leaderboard.json')
+            second = await _request(service.port, '/dashboard.json')
+            status = service.cache.status()
+        finally:
+            await service.stop()
+        return first, second, status
+
+    first, second, status = asyncio.run(run())
+    assert first[0] == 503 and first[1]['retry-after'] == '60'
+    # Within the retry period the failure is reported without another build
+    assert second[0] == 503
+    assert len(calls) == 1 and status['builds'] == 0
+    assert 'source unavailable' in status['last_error']
+
+
+def test_stop_closes_idle_keep_alive_connections():
+    async def run():
+        service = await ReportService(ReportCache(_report, ttl=60), port=0).start()
+        connection = await asyncio.open_connection('127.0.0.1', service.port)
+        status, _ = await _request(service.port, '/status.json', connection=connection)
+        await asyncio.wait_for(service.stop(), 5)
+        closed = await asyncio.wait_for(connection[0].read(), 5) == b''
+        connection[1].close()
+        return status, closed
+
+    status, closed = asyncio.run(run())
+    assert status == 200 and closed
+
+
+def test_idle_connections_time_out():
+    async def run():
+        service = await ReportService(ReportCache(_report, ttl=60), port=0, idle_timeout=0.1).start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+        try:
+            return await asyncio.wait_for(reader.read(), 5) == b''
+        finally:
+            writer.close()
+            await service.stop()
+
+    assert asyncio.run(run())
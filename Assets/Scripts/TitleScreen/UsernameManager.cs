@@ -18,7 +18,6 @@ public class UsernameManager : MonoBehaviour
     public int minUsernameLength = 3;
     public int maxUsernameLength = 15;
     
-    private const string firebaseURL = "https://morphrunneranalytics3107-default-rtdb.firebaseio.com/";
     private string playerUsername = "";
     private string userId;
     
@@ -134,7 +133,7 @@ public class UsernameManager : MonoBehaviour
     private IEnumerator SaveUsernameToFirebase(string username)
     {
         // Save username to Firebase under the user's ID
-        string url = $"{firebaseURL}users/{userId}/username.json";
+        string url = $"{AnalyticsConfig.BaseURL}users/{userId}/username.json";
         string jsonData = $"\"{username}\""; // JSON string format
         
         UnityWebRequest request = UnityWebRequest.Put(url, jsonData);
@@ -163,7 +162,7 @@ public class UsernameManager : MonoBehaviour
     
     private IEnumerator SaveRegistrationTimestamp()
     {
-        string url = $"{firebaseURL}users/{userId}/registration_time.json";
+        string url = $"{AnalyticsConfig.BaseURL}users/{userId}/registration_time.json";
         string timestamp = System.DateTime.UtcNow.ToString("yyyy-MM-ddTHH:mm:ssZ");
         string jsonData = $"\"{timestamp}\"";
         